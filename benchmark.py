@@ -0,0 +1,128 @@
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from src import diagnostics
+from src.core import SingleStageCore, FiveStageCore, FunctionalCore, DualIssueCore, OutOfOrderCore
+from src.memory import InstructionMemory, DataMemory
+from src.simulation import CORES
+from src.trace_writer import TracePolicy
+from src.workloads import WORKLOADS
+
+
+def instruction_count(core):
+    """Instructions executed, HALT included, as in the performance metrics."""
+    if isinstance(core, SingleStageCore):
+        return core.cycle - 1
+    if isinstance(core, (FiveStageCore, DualIssueCore, OutOfOrderCore)):
+        return core.retired + 1
+    return core.retired
+
+
+def measure(workload, core_name, trace_policy, repeat):
+    """
+    Simulate a workload on one core `repeat` times and keep the fastest run.
+
+    Only the simulation is timed (stepping to HALT and flushing the traces), not the setup.
+    """
+    best = None
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as io_dir:
+            io_dir = Path(io_dir)
+            workload.write(io_dir)
+            imem = InstructionMemory("Imem", io_dir)
+            dmem = DataMemory(core_name, io_dir)
+            core = CORES[core_name](io_dir, imem, dmem, trace_policy=trace_policy)
+
+            start = time.perf_counter()
+            if isinstance(core, FunctionalCore):
+                core.run()
+            while not core.halted:
+                core.step()
+            core.close()
+            elapsed = time.perf_counter() - start
+        if best is None or elapsed < best[0]:
+            best = (elapsed, core.cycle, instruction_count(core))
+
+    elapsed, cycles, instructions = best
+    return {
+        "workload": workload.name,
+        "parameters": workload.parameters,
+        "core": core_name,
+        "cycles": cycles,
+        "instructions": instructions,
+        "seconds": elapsed,
+        "cycles_per_second": cycles / elapsed,
+        "instructions_per_second": instructions / elapsed,
+    }
+
+
+def current_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_setting(setting):
+    """`workload.parameter=value`, e.g. `alu_loop.iterations=5000`."""
+    key, _, value = setting.partition("=")
+    workload, _, parameter = key.partition(".")
+    if workload not in WORKLOADS or not parameter or not value:
+        raise argparse.ArgumentTypeError(f"expected WORKLOAD.PARAMETER=VALUE, got {setting}")
+    return workload, parameter, int(value)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Measure simulator throughput on generated workloads')
+    parser.add_argument('--workloads', default=list(WORKLOADS), nargs='+', choices=list(WORKLOADS),
+                        help='Workloads to run (default: all of them).')
+    parser.add_argument('--cores', default=["SS", "FS"], nargs='+', choices=list(CORES),
+                        help='Cores to measure (default: SS FS).')
+    parser.add_argument('--set', default=[], action='append', type=parse_setting, dest='settings',
+                        help='Override a workload parameter: WORKLOAD.PARAMETER=VALUE, e.g. alu_loop.iterations=5000.')
+    parser.add_argument('--repeat', default=3, type=int, help='Runs per measurement, the fastest one is kept.')
+    parser.add_argument('--trace', default=TracePolicy("none"), type=TracePolicy.parse,
+                        help='Per-cycle dumps during the measurement (default: none), see main.py --trace.')
+    parser.add_argument('--log-mode', default="fast", choices=["verbose", "fast"],
+                        help='Per-cycle logging during the measurement (default: fast).')
+    parser.add_argument('--output', default=None, type=Path, help='Write the JSON report to this file.')
+    args = parser.parse_args()
+
+    diagnostics.set_verbose(args.log_mode == "verbose")
+
+    parameters = {name: {} for name in WORKLOADS}
+    for workload_name, parameter, value in args.settings:
+        parameters[workload_name][parameter] = value
+
+    results = []
+    for workload_name in args.workloads:
+        try:
+            workload = WORKLOADS[workload_name](**parameters[workload_name])
+        except TypeError as error:
+            parser.error(f"{workload_name}: {error}")
+        for core_name in args.cores:
+            result = measure(workload, core_name, args.trace, max(1, args.repeat))
+            results.append(result)
+            print(f"{workload_name:<18} {core_name}  {result['cycles']:>9} cycles  "
+                  f"{result['cycles_per_second']:>12,.0f} cycles/s  "
+                  f"{result['instructions_per_second']:>12,.0f} instructions/s", file=sys.stderr)
+
+    report = {
+        "commit": current_commit(),
+        "python": platform.python_version(),
+        "trace": args.trace.mode,
+        "log_mode": args.log_mode,
+        "repeat": args.repeat,
+        "results": results,
+    }
+    if args.output is not None:
+        args.output.write_text(json.dumps(report, indent=2) + "\n")
+    else:
+        print(json.dumps(report, indent=2))
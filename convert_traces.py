@@ -0,0 +1,27 @@
+import argparse
+import sys
+from pathlib import Path
+
+from src.binary_trace import convert_trace
+
+
+def binary_traces(path: Path) -> list:
+    """The binary traces to convert: the file itself, or every RFResult.npy and StateResult_*.npy under a directory."""
+    if path.is_file():
+        return [path]
+    return sorted(list(path.rglob("RFResult.npy")) + list(path.rglob("StateResult_*.npy")))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Regenerate the text traces of binary traces (--trace-format binary)')
+    parser.add_argument('paths', nargs='+', type=Path,
+                        help='Binary traces, or directories searched for RFResult.npy and StateResult_*.npy.')
+    parser.add_argument('--chunk', default=4096, type=int, help='Rows converted at a time (default: 4096).')
+    args = parser.parse_args()
+
+    traces = [trace for path in args.paths for trace in binary_traces(path)]
+    if not traces:
+        parser.error("No binary trace found")
+    for trace in traces:
+        text_path = convert_trace(trace, chunk=max(1, args.chunk))
+        print(f"{trace} -> {text_path}", file=sys.stderr)
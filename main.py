@@ -3,9 +3,20 @@ from pathlib import Path
 
 from loguru import logger
 
-from src.core import SingleStageCore, FiveStageCore
-from src.generate_metrics import generate_metrics
+from src import diagnostics
+from src.branch_predictor import PredictorConfig
+from src.cache import CacheConfig, INSTRUCTION_CACHE, DATA_CACHE
+from src.core import FunctionalCore
+from src.cosim import CosimMismatch
+from src.generate_metrics import generate_metrics, generate_counters, generate_cache_metrics, generate_batch_metrics
 from src.memory import InstructionMemory, DataMemory
+from src.sampling import fast_forward, window_instructions
+from src.multicore import MultiCoreConfig
+from src.simulation import CORES, core_caches, run_cores_in_parallel, run_pipeline, run_multi_core, \
+    run_cosimulation
+from src.tomasulo import OutOfOrderConfig
+from src.trace_writer import DEFAULT_FLUSH_INTERVAL, TracePolicy
+from src.verifier import TraceDivergence, expected_traces
 
 if __name__ == "__main__":
     # logger.remove()
@@ -15,41 +26,164 @@ if __name__ == "__main__":
     # parse arguments for input file location
     parser = argparse.ArgumentParser(description='RV32I processor')
     parser.add_argument('--iodir', default="iodir", type=str, help='Directory containing the input files.')
+    parser.add_argument('--mode', default="pipeline",
+                        choices=["pipeline", "functional", "sampled", "multicore", "batch", "cosim"],
+                        help='pipeline runs the single and five stage cores, functional only runs the '
+                             'architectural FunctionalCore (FN_ outputs), sampled fast-forwards with the '
+                             'FunctionalCore then runs a window on the five stage core (FS_ outputs), multicore '
+                             'runs several five stage cores on one shared data memory (core{i}/ and MC_ outputs), '
+                             'batch runs imem.txt against the dmem.txt of every subdirectory of --iodir at once '
+                             '(FN_ outputs in each subdirectory), cosim checks every register write and store of '
+                             '--dut against --reference in lockstep, without traces.')
+    parser.add_argument('--fast-forward', default=None, type=int,
+                        help='sampled mode: number of instructions to fast-forward.')
+    parser.add_argument('--stop-pc', default=None, type=lambda pc: int(pc, 0),
+                        help='sampled mode: fast-forward until the PC first reaches this address.')
+    parser.add_argument('--window', default=None, type=int,
+                        help='sampled mode: number of cycles simulated in detail (default: until HALT).')
+    parser.add_argument('--log-mode', default="verbose", choices=["verbose", "fast"],
+                        help='verbose logs every component invocation, fast skips all per-cycle log messages.')
+    parser.add_argument('--trace', default=TracePolicy(), type=TracePolicy.parse,
+                        help='Per-cycle RF/state dumps: full (default), none (final RF only), every:N, '
+                             'or cycles:A-B,C-D,...')
+    parser.add_argument('--trace-format', default="text", choices=["text", "binary"],
+                        help='pipeline and multicore modes: text RFResult.txt / StateResult_*.txt (default), or '
+                             'binary RFResult.npy / StateResult_*.npy (NumPy arrays, a column per register and '
+                             'pipeline field), converted back to the text files by convert_traces.py.')
+    parser.add_argument('--flush-interval', default=DEFAULT_FLUSH_INTERVAL, type=int,
+                        help='Number of cycles of trace output buffered before it is written to disk.')
+    parser.add_argument('--dmem-dump', default="window", choices=["window", "pages"],
+                        help='Dump the legacy 1000-byte data memory window, or only the populated pages.')
+    parser.add_argument('--checkpoint-interval', default=0, type=int,
+                        help='pipeline mode: save SS_checkpoint.bin / FS_checkpoint.bin every N cycles (0: never).')
+    parser.add_argument('--restore', action='store_true',
+                        help='pipeline mode: resume the cores from the checkpoint files in --iodir.')
+    parser.add_argument('--verify', default=None, type=Path,
+                        help='pipeline mode: directory of expected results (SS_RFResult.txt, StateResult_SS.txt, '
+                             'FS_RFResult.txt, StateResult_FS.txt, those that exist). Each trace is compared with '
+                             'them as it is written and the run stops at the first divergence. With --parallel, '
+                             'the SS and FS cores are verified.')
+    parser.add_argument('--parallel', action='store_true',
+                        help='pipeline mode: run each core in its own worker process.')
+    parser.add_argument('--cores', default=["SS", "FS"], nargs='+', choices=list(CORES),
+                        help='pipeline mode with --parallel: the cores to run (default: SS FS). DI is the '
+                             'two-wide dual issue variant of the five stage core (DI_ outputs), OO the '
+                             'out-of-order core (OO_ outputs).')
+    parser.add_argument('--profile', action='store_true',
+                        help='pipeline mode: report wall time and call counts per stage and component at halt '
+                             '(SS_/Profile.txt, FS_/Profile.txt).')
+    parser.add_argument('--predictor', default=PredictorConfig(), type=PredictorConfig.parse,
+                        help='Branch predictor of the five stage, dual issue and out-of-order cores: static (not '
+                             'taken, the default), backward[:btb=N], or 1bit, 2bit, gshare with [:bht=N,btb=N] '
+                             '(power of two sizes).')
+    parser.add_argument('--icache', default=None, type=CacheConfig.parse,
+                        help='L1 instruction cache of the five stage, dual issue and out-of-order cores '
+                             '(default: ideal memory), '
+                             'e.g. size=4096,assoc=2,line=16,replace=lru,write=back,hit=1,miss=10; '
+                             '"default" uses those values.')
+    parser.add_argument('--dcache', default=None, type=CacheConfig.parse,
+                        help='L1 data cache of the five stage, dual issue and out-of-order cores (default: ideal '
+                             'memory), same settings as --icache, replace: lru, fifo or random, write: back or '
+                             'through.')
+    parser.add_argument('--multicore', default=MultiCoreConfig(), type=MultiCoreConfig.parse,
+                        help='multicore mode: cores=N (default 2), arbitration=round-robin or fixed, ports=N '
+                             '(shared data memory accesses per cycle, default 1). Core i runs core{i}/imem.txt, '
+                             'or the shared imem.txt, and starts with its index in a0 (x10).')
+    parser.add_argument('--batch-window', default=0, type=int,
+                        help='batch mode: bytes of each data memory simulated in the batch (default: the largest '
+                             'dmem.txt, rounded up to 4 KiB pages). An instance accessing beyond it finishes on '
+                             'its own FunctionalCore.')
+    parser.add_argument('--dut', default="FS", choices=["FS", "DI", "OO"],
+                        help='cosim mode: the core under test, with --predictor, --icache, --dcache and --ooo '
+                             '(default: FS).')
+    parser.add_argument('--reference', default="FN", choices=["FN", "SS"],
+                        help='cosim mode: the architectural reference (default: FN).')
+    parser.add_argument('--ooo', default=OutOfOrderConfig(), type=OutOfOrderConfig.parse,
+                        help='Sizes of the out-of-order core: rob=N (reorder buffer entries, default 16), rs=N '
+                             '(reservation station entries, default 8), width=N (instructions fetched, dispatched, '
+                             'executed on the ALUs and committed per cycle, default 1), e.g. rob=32,rs=16,width=2.')
     args = parser.parse_args()
+    if args.window is not None and args.window < 1:
+        parser.error("--window must be positive")
+    if args.verify is not None and args.trace_format == "binary":
+        parser.error("--verify compares text traces, it cannot be combined with --trace-format binary")
+    if args.parallel and "OO" in args.cores and (args.checkpoint_interval or args.restore):
+        parser.error("The out-of-order core does not support checkpoints, --checkpoint-interval and --restore "
+                     "cannot be combined with --cores OO")
+    binary_trace = args.trace_format == "binary"
 
     ioDir = Path(args.iodir)
+    diagnostics.set_verbose(args.log_mode == "verbose")
 
     logger.info(f"List IO Directory: {list(ioDir.iterdir())}")
 
-    imem = InstructionMemory("Imem", ioDir)
-
-    dmem_ss = DataMemory("SS", ioDir)
-    dmem_fs = DataMemory("FS", ioDir)
-
-    ssCore = SingleStageCore(ioDir, imem, dmem_ss)
-    fsCore = FiveStageCore(ioDir, imem, dmem_fs)
-
-    while (True):
-        if not ssCore.halted:
-            ssCore.step()
-
-        if not fsCore.halted:
-            fsCore.step()
-
-        if ssCore.halted and fsCore.halted:
-            break
-
-        # if ssCore.halted or fsCore.halted:
-        #     break
-
-        # test only
-        # if fsCore.cycle > 100:
-        #     logger.error("Five Stage Core is taking too long to execute. Exiting...")
-        #     break
-
-    # dump SS and FS data mem.
-    dmem_ss.output_data_memory()
-    dmem_fs.output_data_memory()
-
-    generate_metrics("w", "Single Stage Core Performance Metrics", ssCore.cycle, ssCore.cycle - 1, ioDir)
-    generate_metrics("a", "Five Stage Core Performance Metrics", fsCore.cycle, ssCore.cycle - 1, ioDir)
+    if args.mode == "functional":
+        imem = InstructionMemory("Imem", ioDir)
+        dmem_fn = DataMemory("FN", ioDir)
+        fnCore = FunctionalCore(ioDir, imem, dmem_fn, args.flush_interval)
+        try:
+            fnCore.run()
+        finally:
+            fnCore.close()
+        dmem_fn.output_data_memory(populated_pages_only=args.dmem_dump == "pages")
+        logger.info(f"Functional Core retired {fnCore.retired} instructions")
+    elif args.mode == "sampled":
+        imem = InstructionMemory("Imem", ioDir)
+        dmem_fs = DataMemory("FS", ioDir)
+        fnCore, fsCore = fast_forward(ioDir, imem, dmem_fs, args.fast_forward, args.stop_pc, args.window,
+                                      args.flush_interval, args.trace, args.predictor.build(),
+                                      args.icache.build(INSTRUCTION_CACHE) if args.icache is not None else None,
+                                      args.dcache.build(DATA_CACHE) if args.dcache is not None else None)
+        dmem_fs.output_data_memory(populated_pages_only=args.dmem_dump == "pages")
+
+        window = f"(window of {fsCore.cycle} cycles after {fnCore.retired} fast-forwarded instructions)"
+        instructions = window_instructions(fsCore)
+        if instructions:
+            generate_metrics("w", f"Five Stage Core Performance Metrics {window}", fsCore.cycle, instructions, ioDir)
+            logger.info(f"Window CPI: {fsCore.cycle / instructions:.6}")
+        else:
+            logger.warning(f"No instruction completed in the {fsCore.cycle} cycle window")
+        generate_cache_metrics(core_caches(fsCore), ioDir)
+        generate_counters(f"Five Stage Core Performance Counters {window}", fsCore.cycle, fsCore.retired,
+                          fsCore.counters, fsCore.predictor, ioDir)
+    elif args.mode == "batch":
+        from src.batch import BatchSimulator  # NumPy is only needed by the batch mode
+
+        batch = BatchSimulator(ioDir, window_size=args.batch_window, flush_interval=args.flush_interval)
+        batch.run()
+        batch.output(populated_pages_only=args.dmem_dump == "pages")
+        generate_batch_metrics(batch, ioDir)
+        logger.info(f"Batch of {len(batch.instance_dirs)} instances took {batch.steps} steps")
+    elif args.mode == "multicore":
+        if args.dcache is not None:
+            parser.error("--dcache is not supported in multicore mode, the cores share an uncached data memory")
+        cores = run_multi_core(ioDir, args.multicore, args.flush_interval, args.trace, args.dmem_dump == "pages",
+                               args.predictor, args.icache, binary_trace)
+        logger.info(f"{len(cores)} cores retired {sum(core.retired for core in cores)} instructions")
+    elif args.mode == "cosim":
+        try:
+            cosimulation = run_cosimulation(ioDir, args.dut, args.reference, args.flush_interval, args.predictor,
+                                            args.icache, args.dcache, args.ooo)
+        except CosimMismatch as mismatch:
+            logger.error(str(mismatch))
+            raise SystemExit(1)
+        logger.info(f"{args.dut} matches {args.reference}: {cosimulation.compared} register writes and stores "
+                    f"of {cosimulation.instructions} instructions in {cosimulation.dut.cycle} cycles")
+    else:
+        expected = None
+        if args.verify is not None:
+            expected = {name: expected_traces(args.verify, name) for name in ("SS", "FS")}
+        try:
+            if args.parallel:
+                run_cores_in_parallel(ioDir, args.cores, args.flush_interval, args.trace, args.dmem_dump == "pages",
+                                      args.checkpoint_interval, args.restore, args.profile, args.predictor,
+                                      args.icache, args.dcache, args.ooo, expected, binary_trace)
+            else:
+                run_pipeline(ioDir, args.flush_interval, args.trace, args.dmem_dump == "pages",
+                             args.checkpoint_interval, args.restore, args.profile, args.predictor, args.icache,
+                             args.dcache, expected, binary_trace)
+        except TraceDivergence as divergence:
+            logger.error(str(divergence))
+            raise SystemExit(1)
+        if expected is not None:
+            logger.info(f"The traces match the expected ones in {args.verify}")
@@ -47,6 +47,8 @@ class PipelineGUI:
             return
         try:
             io_dir = Path(file_path).parent
+            if self.core:
+                self.core.close()  # flush the traces of the previous run
             instruction_memory = InstructionMemory("imem", io_dir)
             data_memory = DataMemory("dmem", io_dir)
             self.core = FiveStageCore(io_dir, instruction_memory, data_memory)
@@ -0,0 +1,248 @@
+"""
+Batch simulation: one program run against many data memories, all instances stepped together with NumPy.
+
+The instances execute the program architecturally, with the semantics of the FunctionalCore.
+Their register files are one array of shape (32, instances) and the low end of their data
+memories, the batch window, one array of shape (instances, window bytes). Every step decodes the
+instruction at the lowest PC any running instance is at and applies it to every instance at that
+PC, so instances that took different branches run apart and join again where their PCs meet.
+
+An instance that loads or stores outside the batch window leaves the batch: its state is handed
+off to a FunctionalCore that runs it to HALT on its own.
+"""
+from pathlib import Path
+
+import numpy as np
+from loguru import logger
+
+from src import diagnostics
+from src.core import FunctionalCore
+from src.decoder import ProgramTable
+from src.generate_metrics import generate_metrics
+from src.memory import InstructionMemory, DataMemory, PAGE_BITS, PAGE_SIZE
+from src.register_file import RegisterFile
+from src.trace_writer import DEFAULT_FLUSH_INTERVAL
+
+BYTE_SHIFTS = np.array([24, 16, 8, 0], dtype=np.uint32)
+""" Shift of each byte of a word, most significant byte first as in DataMemory """
+
+BYTE_OFFSETS = np.arange(4, dtype=np.uint32)
+
+ALU_FUNCTIONS = {
+    0b0000: np.bitwise_and,
+    0b0001: np.bitwise_or,
+    0b0010: np.add,
+    0b0110: np.subtract,
+    0b0111: np.bitwise_xor,
+    0b1100: lambda a, b: np.invert(np.bitwise_or(a, b)),
+}
+""" ALU control code -> operation on uint32 arrays, the table of arithmetic_logic_unit (undefined codes give 0) """
+
+
+def _alu(alu_control, a, b):
+    function = ALU_FUNCTIONS.get(alu_control)
+    return function(a, b) if function is not None else np.zeros_like(a)
+
+
+def batch_instances(io_dir: Path) -> list:
+    """The instance directories of a batch: every subdirectory of `io_dir` holding a dmem.txt, sorted by name."""
+    return sorted(path for path in io_dir.iterdir() if (path / "dmem.txt").is_file())
+
+
+class BatchSimulator(object):
+    """
+    BatchSimulator runs the program of `io_dir`/imem.txt once per instance directory.
+
+    Each instance directory gets the files `--mode functional` writes there, FN_/RFResult.txt
+    (the final register file) and FN_DMEMResult.txt, and the PerformanceMetrics_Result.txt of
+    the single stage core, whose timing is one cycle per instruction.
+    """
+
+    def __init__(self, io_dir: Path, instance_dirs=None, window_size: int = 0,
+                 flush_interval: int = DEFAULT_FLUSH_INTERVAL):
+        """
+        Initialize the BatchSimulator.
+
+        Args:
+            io_dir (Path): Directory holding imem.txt and, by default, the instance directories.
+            instance_dirs (list[Path]): The instance directories, each holding a dmem.txt, None uses batch_instances.
+            window_size (int): Bytes of each data memory held in the batch, rounded up to whole pages.
+                At least the largest dmem.txt, 0 uses exactly that.
+            flush_interval (int): Number of cycles buffered by the trace writers of the handed off instances.
+        """
+        self.io_dir = io_dir
+        self.instance_dirs = list(instance_dirs) if instance_dirs is not None else batch_instances(io_dir)
+        if not self.instance_dirs:
+            raise ValueError(f"No instance directory with a dmem.txt in {io_dir}")
+        self.flush_interval = flush_interval
+        self.instruction_memory = InstructionMemory("Imem", io_dir)
+        if self.instruction_memory.program is None:
+            self.instruction_memory.program = ProgramTable(self.instruction_memory)
+        self.program = self.instruction_memory.program
+
+        self.data_memories = [DataMemory("FN", instance_dir) for instance_dir in self.instance_dirs]
+        """ The DataMemory of each instance, written back from the batch window at the end """
+        size = max([window_size] + [data_memory.window_size for data_memory in self.data_memories])
+        pages = -(-size // PAGE_SIZE)
+        self.window_size = pages * PAGE_SIZE
+        count = len(self.instance_dirs)
+        self.memory = np.zeros((count, self.window_size), dtype=np.uint8)
+        self.allocated = np.zeros((count, pages), dtype=bool)
+        """ The window pages each instance's DataMemory would have allocated """
+        for index, data_memory in enumerate(self.data_memories):
+            for page_number, page in data_memory.pages.items():
+                self.memory[index, page_number << PAGE_BITS: (page_number + 1) << PAGE_BITS] = \
+                    np.frombuffer(page, dtype=np.uint8)
+                self.allocated[index, page_number] = True
+
+        self.registers = np.zeros((32, count), dtype=np.uint32)
+        self.pc = np.zeros(count, dtype=np.uint32)
+        self.retired = np.zeros(count, dtype=np.int64)
+        """ Executed instructions of each instance, HALT included """
+        self.running = np.ones(count, dtype=bool)
+        """ Instances still executing in the batch """
+        self.handed_off = {}
+        """ Instance index -> the FunctionalCore that finished it outside the batch """
+        self.errors = {}
+        """ Instance index -> the ValueError that stopped it, an instruction the cores cannot decode """
+
+        self.steps = 0
+        """ Instructions applied to the batch, one per step """
+        self.lanes = 0
+        """ Instance instructions executed in the batch, summed over the steps """
+
+    def run(self):
+        """
+        Step the batch until every instance halted, left the batch or failed.
+        """
+        while self.running.any():
+            self.step()
+        if diagnostics.VERBOSE:
+            logger.info(f"Batch of {len(self.instance_dirs)} instances done after {self.steps} steps, "
+                        f"{len(self.handed_off)} handed off, {len(self.errors)} failed")
+
+    def step(self):
+        """
+        Apply the instruction at the lowest running PC to every running instance at that PC.
+        """
+        pc = int(self.pc[self.running].min())
+        lanes = np.flatnonzero(self.running & (self.pc == pc))
+        try:
+            decoded = self.program.at(pc)
+        except ValueError as error:
+            for index in lanes:
+                self.errors[int(index)] = error
+                logger.error(f"{self.instance_dirs[index]}: {error}")
+            self.running[lanes] = False
+            return
+
+        registers = self.registers
+        opcode = decoded.opcode
+        next_pc = np.full(len(lanes), (pc + 4) & 0xFFFFFFFF, dtype=np.uint32)
+        imm = np.uint32(decoded.imm & 0xFFFFFFFF)
+
+        if opcode in (0b0000011, 0b0100011):  # Load, store
+            address = registers[decoded.rs1, lanes] + imm
+            outside = address > self.window_size - 4
+            if outside.any():
+                for index in lanes[outside]:
+                    self.hand_off(int(index))
+                lanes, address, next_pc = lanes[~outside], address[~outside], next_pc[~outside]
+            byte_addresses = address[:, None] + BYTE_OFFSETS
+            if opcode == 0b0000011:
+                data = self.memory[lanes[:, None], byte_addresses].astype(np.uint32) << BYTE_SHIFTS
+                if decoded.rd:
+                    registers[decoded.rd, lanes] = np.bitwise_or.reduce(data, axis=1)
+            else:
+                data = registers[decoded.rs2, lanes]
+                self.memory[lanes[:, None], byte_addresses] = (data[:, None] >> BYTE_SHIFTS).astype(np.uint8)
+                self.allocated[lanes, address >> PAGE_BITS] = True
+                self.allocated[lanes, (address + 3) >> PAGE_BITS] = True
+        elif opcode == 0b0110011:  # R-type
+            result = _alu(decoded.alu_control, registers[decoded.rs1, lanes], registers[decoded.rs2, lanes])
+            if decoded.rd:
+                registers[decoded.rd, lanes] = result
+        elif opcode == 0b0010011:  # I-type
+            result = _alu(decoded.alu_control, registers[decoded.rs1, lanes], imm)
+            if decoded.rd:
+                registers[decoded.rd, lanes] = result
+        elif opcode == 0b1100011:  # Branch, BEQ / BNE
+            taken = (registers[decoded.rs1, lanes] == registers[decoded.rs2, lanes]) ^ bool(decoded.bne_func)
+            next_pc[taken] = (pc + decoded.imm) & 0xFFFFFFFF
+        elif opcode == 0b1101111:  # JAL, the link value goes through the ALU as PC op 4
+            if decoded.rd:
+                registers[decoded.rd, lanes] = _alu(decoded.alu_control, np.uint32(pc), np.uint32(4))
+            next_pc[:] = (pc + decoded.imm) & 0xFFFFFFFF
+        elif decoded.halt:
+            self.running[lanes] = False
+            next_pc[:] = pc
+
+        self.pc[lanes] = next_pc
+        self.retired[lanes] += 1
+        self.steps += 1
+        self.lanes += len(lanes)
+
+    def hand_off(self, index: int):
+        """
+        Finish an instance outside the batch, on a FunctionalCore, from its current state.
+
+        Args:
+            index (int): The instance.
+        """
+        if diagnostics.VERBOSE:
+            logger.warning(f"{self.instance_dirs[index]} leaves the batch window at PC {int(self.pc[index])}")
+        self.running[index] = False
+        data_memory = self.write_back(index)
+        core = FunctionalCore(self.instance_dirs[index], self.instruction_memory, data_memory, self.flush_interval)
+        core.load_architectural_state(self.registers[:, index].tolist(), int(self.pc[index]))
+        core.retired = int(self.retired[index])
+        try:
+            core.run()
+        except ValueError as error:
+            self.errors[index] = error
+            logger.error(f"{self.instance_dirs[index]}: {error}")
+        finally:
+            core.close()
+        self.handed_off[index] = core
+
+    def write_back(self, index: int) -> DataMemory:
+        """
+        Copy the batch window of an instance into its DataMemory.
+
+        Args:
+            index (int): The instance.
+
+        Returns:
+            DataMemory: The data memory of the instance.
+        """
+        data_memory = self.data_memories[index]
+        for page_number in np.flatnonzero(self.allocated[index]):
+            data_memory.page(int(page_number))[:] = \
+                self.memory[index, page_number << PAGE_BITS: (page_number + 1) << PAGE_BITS].tobytes()
+        return data_memory
+
+    def instructions(self, index: int) -> int:
+        """Executed instructions of an instance, HALT included."""
+        core = self.handed_off.get(index)
+        return core.retired if core is not None else int(self.retired[index])
+
+    def output(self, populated_pages_only: bool = False):
+        """
+        Write the result files of every instance that halted.
+
+        Args:
+            populated_pages_only (bool): Dump the populated data memory pages instead of the legacy window.
+        """
+        for index, instance_dir in enumerate(self.instance_dirs):
+            if index in self.errors:
+                continue
+            if index not in self.handed_off:
+                self.write_back(index)
+                register_file = RegisterFile(instance_dir / "FN_", self.flush_interval)
+                register_file.Registers[:] = self.registers[:, index].tolist()
+                register_file.output(int(self.retired[index]))  # the final RF, labelled like the functional core
+                register_file.close()
+            self.data_memories[index].output_data_memory(populated_pages_only=populated_pages_only)
+            instructions = self.instructions(index)
+            generate_metrics("w", "Single Stage Core Performance Metrics", instructions + 1, instructions,
+                             instance_dir)
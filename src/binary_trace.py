@@ -0,0 +1,321 @@
+"""
+Binary traces: RFResult and StateResult records stored as fixed-width integer columns in a
+NumPy .npy file (one structured array, one field per register or pipeline register field, one
+row per dumped cycle), about an order of magnitude smaller than the text files, plus the
+conversion back to the exact legacy text.
+
+The files load with `np.load`, memory-mapped with `mmap_mode="r"`, e.g.
+`np.load("FS_/RFResult.npy", mmap_mode="r")["x5"]` is x5 after every dumped cycle and
+`np.load("StateResult_FS.npy")["EX.Imm"]` the ID/EX immediate.
+
+The layouts mirror what the cores print: RegisterFile.output, SingleStageCore.print_state and
+format_pipeline_registers (FiveStageCore.printState, DualIssueCore.printState). The state of the
+OutOfOrderCore has a line per reorder buffer entry in flight, not a fixed set of fields, and
+stays a text file.
+"""
+import warnings
+from operator import getitem
+from pathlib import Path
+
+import numpy as np
+
+from src.core import SingleStageCore, FiveStageCore, DualIssueCore
+from src.trace_writer import TraceWriter, DEFAULT_FLUSH_INTERVAL
+
+SEPARATOR = "-" * 70
+""" The line every trace record starts with """
+
+PIPELINE_REGISTER_FIELDS = {
+    "IF": (("nop", "bool"), ("PC", "int")),
+    "ID": (("nop", "bool"), ("Instr", 32)),
+    "EX": (("nop", "bool"), ("instr", 32), ("Read_data1", 32), ("Read_data2", 32), ("Imm", 12), ("Rs", 5),
+           ("Rt", 5), ("Wrt_reg_addr", 5), ("is_I_type", "flag"), ("rd_mem", "flag"), ("wrt_mem", "flag"),
+           ("alu_op", 2), ("wrt_enable", "flag")),
+    "MEM": (("nop", "bool"), ("ALUresult", 32), ("Store_data", 32), ("Rs", 5), ("Rt", 5), ("Wrt_reg_addr", 5),
+            ("rd_mem", "flag"), ("wrt_mem", "flag"), ("wrt_enable", "flag")),
+    "WB": (("nop", "bool"), ("Wrt_data", 32), ("Rs", 5), ("Rt", 5), ("Wrt_reg_addr", 5), ("wrt_enable", "flag")),
+}
+"""
+The fields format_pipeline_registers prints, in print order, with how each is printed:
+`bool` True/False, `int` a decimal up to 32 bits, `flag` a decimal up to 8 bits, or the width of its binary form
+"""
+
+BOOLEANS = {"True\n": "1", "False\n": "0"}
+""" Printed True/False (newline included) -> the digit stored in a bool column """
+
+
+def column_type(kind) -> str:
+    """The NumPy type of a column printed as `kind`, see PIPELINE_REGISTER_FIELDS."""
+    if kind == "bool":
+        return "|b1"
+    if kind == "int":
+        return "<u4"
+    if kind == "flag" or kind <= 8:
+        return "|u1"
+    return "<u4"
+
+
+class TraceLayout(object):
+    """
+    TraceLayout is the fixed line structure of the records of one kind of trace file.
+
+    A record is the separator line, the header line ending with the cycle, then one line per
+    column, the column's label followed by its value.
+    """
+
+    def __init__(self, header: str, columns):
+        """
+        Initialize the TraceLayout.
+
+        Args:
+            header (str): The header line up to the cycle number.
+            columns (list[tuple[str, str, str | int]]): (name, label, kind) of each line after the header,
+                the name is the field of the structured array.
+        """
+        self.header = header
+        self.columns = list(columns)
+        self.dtype = np.dtype([("cycle", "<u8")] + [(name, column_type(kind)) for name, _, kind in self.columns])
+        self.values = [slice(len(header), None)] + [slice(len(label), None) for _, label, _ in self.columns]
+        """ Where the value is in the header line and in the line of each column """
+        self.bases = [10] + [10 if kind in ("bool", "int", "flag") else 2 for _, _, kind in self.columns]
+        self.booleans = [index + 1 for index, (_, _, kind) in enumerate(self.columns) if kind == "bool"]
+        """ Positions of the True/False columns in a row """
+
+    def check(self, lines):
+        """
+        Check that a record has this layout, line by line.
+
+        Args:
+            lines (list[str]): The lines of the record, as given to TraceWriter.write.
+
+        Raises:
+            ValueError: The record does not have this layout.
+        """
+        if len(lines) != len(self.columns) + 2 or lines[0] != SEPARATOR + "\n" or \
+                not lines[1].startswith(self.header):
+            raise ValueError(f"Record does not match the binary trace layout {self.header!r}: {lines[:2]}")
+        for line, (name, label, _) in zip(lines[2:], self.columns):
+            if not line.startswith(label):
+                raise ValueError(f"Expected the {name} line, got {line!r}")
+
+    def parse(self, lines) -> tuple:
+        """
+        The row of a record of this layout, see `check`. The values are not range checked.
+
+        Args:
+            lines (list[str]): The lines of the record, one line per item as the cores write them.
+
+        Returns:
+            tuple: The cycle and the value of each column.
+
+        Raises:
+            ValueError: The record has the wrong number of lines, or a value is not printed as its column is.
+        """
+        if len(lines) != len(self.columns) + 2:
+            raise ValueError(f"Record does not match the binary trace layout {self.header!r}: {lines[:2]}")
+        values = list(map(getitem, lines[1:], self.values))
+        try:
+            for index in self.booleans:
+                values[index] = BOOLEANS[values[index]]
+        except KeyError as error:
+            raise ValueError(f"Not True or False in the record {lines[1].strip()!r}: {error}")
+        return tuple(map(int, values, self.bases))
+
+    def format(self, row) -> list:
+        """
+        The lines of the record of a row, as the core writes them.
+
+        Args:
+            row (tuple): The cycle and the value of each column.
+
+        Returns:
+            list[str]: The lines, each ending with a newline.
+        """
+        lines = [SEPARATOR + "\n", f"{self.header}{row[0]}\n"]
+        for value, (_, label, kind) in zip(row[1:], self.columns):
+            if kind in ("bool", "int", "flag"):
+                lines.append(f"{label}{value}\n")
+            else:
+                lines.append(f"{label}{value:0{kind}b}\n")
+        return lines
+
+
+def pipeline_columns(stages, lanes=("",)) -> list:
+    """
+    The columns of a five stage state trace.
+
+    Args:
+        stages (list[str]): The pipeline registers, keys of PIPELINE_REGISTER_FIELDS.
+        lanes (tuple[str]): The lane suffixes of the stage names, `0` and `1` for the dual issue core.
+
+    Returns:
+        list[tuple[str, str, str | int]]: (name, label, kind) of each field of each lane, in print order.
+    """
+    return [(f"{stage}{lane}.{field}", f"{stage}{lane}.{field}: ", kind)
+            for stage in stages for lane in lanes for field, kind in PIPELINE_REGISTER_FIELDS[stage]]
+
+
+REGISTER_FILE_LAYOUT = TraceLayout("State of RF after executing cycle:",
+                                   [(f"x{register}", "", 32) for register in range(32)])
+
+STATE_LAYOUTS = {
+    SingleStageCore: TraceLayout("State after executing cycle: ", [("IF.PC", "IF.PC: ", "int"),
+                                                                   ("IF.nop", "IF.nop: ", "bool")]),
+    FiveStageCore: TraceLayout("State after executing cycle: ", pipeline_columns(PIPELINE_REGISTER_FIELDS)),
+    DualIssueCore: TraceLayout("State after executing cycle: ",
+                               pipeline_columns(["IF"]) + pipeline_columns(["ID", "EX", "MEM", "WB"], ("0", "1"))),
+}
+""" Core class -> the layout of its StateResult file """
+
+LAYOUTS = [REGISTER_FILE_LAYOUT] + list(STATE_LAYOUTS.values())
+
+
+def layout_of(dtype) -> TraceLayout:
+    """
+    The layout a binary trace was written with, recognized by its columns.
+
+    Args:
+        dtype (np.dtype): The dtype of the trace array.
+
+    Returns:
+        TraceLayout: The layout.
+    """
+    for layout in LAYOUTS:
+        if layout.dtype == dtype:
+            return layout
+    raise ValueError(f"Not a binary trace: {dtype}")
+
+
+def _npy_header(dtype, records: int, length: int = 0) -> bytes:
+    """
+    The .npy (version 1.0) header of a one-dimensional array.
+
+    Args:
+        dtype (np.dtype): The dtype of the array.
+        records (int): The length of the array.
+        length (int): Pad the header to this many bytes, 0 pads it to a multiple of 64.
+
+    Returns:
+        bytes: The header, the data follows it.
+    """
+    fields = f"{{'descr': {np.lib.format.dtype_to_descr(dtype)!r}, 'fortran_order': False, 'shape': ({records},), }}"
+    if not length:
+        length = -(-(len(fields) + 11) // 64) * 64
+    return b"\x93NUMPY\x01\x00" + (length - 10).to_bytes(2, "little") + fields.ljust(length - 11).encode() + b"\n"
+
+
+class BinaryTraceWriter(TraceWriter):
+    """
+    BinaryTraceWriter takes the records of a trace like TraceWriter and writes them as rows of a .npy file.
+
+    The header is written with the first record and rewritten with the number of rows every time
+    the file is closed, so a trace is complete once its core closed it. The rows are buffered
+    and written every `flush_interval` records, on `flush` and on `close`.
+    """
+
+    def __init__(self, file_path: Path, layout: TraceLayout, flush_interval: int = DEFAULT_FLUSH_INTERVAL):
+        """
+        Initialize the BinaryTraceWriter.
+
+        Args:
+            file_path (Path): The .npy file.
+            layout (TraceLayout): The records written to it.
+            flush_interval (int): Number of records buffered before writing, 1 writes every record.
+        """
+        super(BinaryTraceWriter, self).__init__(file_path, flush_interval)
+        self.layout = layout
+        self.header_length = len(_npy_header(layout.dtype, np.iinfo(np.uint64).max))
+        """ Room for the header of the longest trace """
+
+    def write(self, lines):
+        if not self.started:
+            self.layout.check(lines)  # the cores print a fixed layout, its labels are only checked once
+            self.started = True
+            self.file = open(self.file_path, "wb")
+            self.file.write(_npy_header(self.layout.dtype, 0, self.header_length))
+        self.buffer.append(self.layout.parse(lines))
+        if len(self.buffer) >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        if self.file is None:
+            self.file = open(self.file_path, "r+b")
+            self.file.seek(0, 2)
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", DeprecationWarning)  # NumPy 1.x wraps out of range integers with a warning
+            try:
+                rows = np.array(self.buffer, dtype=self.layout.dtype)
+            except (OverflowError, DeprecationWarning) as error:
+                raise ValueError(f"A value of {self.file_path.name} does not fit its column: {error}")
+        self.file.write(rows.tobytes())
+        self.file.flush()
+        self.buffer.clear()
+
+    def close(self):
+        self.flush()
+        if self.file is not None:
+            records = (self.file.tell() - self.header_length) // self.layout.dtype.itemsize
+            self.file.seek(0)
+            self.file.write(_npy_header(self.layout.dtype, records, self.header_length))
+            self.file.close()
+            self.file = None
+
+
+def binary_path(text_path: Path) -> Path:
+    """The binary trace written in place of a text trace, RFResult.npy for RFResult.txt."""
+    return text_path.with_suffix(".npy")
+
+
+def attach_binary_trace(core):
+    """
+    Write the traces of a core as binary traces. Must be called before the first step.
+
+    The register file is written to RFResult.npy, the state of the single stage, five stage and
+    dual issue cores to StateResult_*.npy; the out-of-order core's state stays StateResult_OO.txt.
+
+    Args:
+        core (Core): The core.
+    """
+    register_file = core.register_file
+    register_file.trace = BinaryTraceWriter(binary_path(register_file.outputFile), REGISTER_FILE_LAYOUT,
+                                            core.flush_interval)
+    layout = STATE_LAYOUTS.get(type(core))
+    if layout is not None:
+        core.state_trace = BinaryTraceWriter(binary_path(core.state_trace.file_path), layout, core.flush_interval)
+
+
+def load_trace(path: Path, mmap: bool = False):
+    """
+    Load a binary trace.
+
+    Args:
+        path (Path): The .npy file.
+        mmap (bool): Memory-map the file instead of reading it.
+
+    Returns:
+        np.ndarray: One row per dumped cycle, a field per column and `cycle`.
+    """
+    return np.load(path, mmap_mode="r" if mmap else None)
+
+
+def convert_trace(path: Path, text_path: Path = None, chunk: int = 4096) -> Path:
+    """
+    Write the legacy text file of a binary trace, identical to the one the core would have written.
+
+    Args:
+        path (Path): The .npy file.
+        text_path (Path): The text file, None writes it next to the binary trace with a .txt suffix.
+        chunk (int): Number of rows converted at a time.
+
+    Returns:
+        Path: The text file.
+    """
+    trace = load_trace(path, mmap=True)
+    layout = layout_of(trace.dtype)
+    text_path = text_path if text_path is not None else path.with_suffix(".txt")
+    with open(text_path, "w") as text:
+        for start in range(0, len(trace), chunk):
+            text.write("".join(line for row in trace[start: start + chunk].tolist() for line in layout.format(row)))
+    return text_path
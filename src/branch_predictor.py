@@ -0,0 +1,304 @@
+class BranchTargetBuffer(object):
+    """
+    BranchTargetBuffer is a direct-mapped table of the targets of taken branches and JALs, indexed by PC.
+
+    Each entry holds the full PC as its tag, so a hit is always the instruction that was recorded.
+    """
+
+    def __init__(self, entries=64):
+        """
+        Initialize the BranchTargetBuffer.
+
+        Args:
+            entries (int): Number of entries, a power of two.
+        """
+        if entries < 1 or entries & (entries - 1):
+            raise ValueError(f"The number of BTB entries must be a power of two: {entries}")
+        self.mask = entries - 1
+        self.tags = [-1] * entries
+        """ PC of the instruction held by each entry, -1 when empty """
+        self.targets = [0] * entries
+        self.unconditional = [False] * entries
+        """ Whether each entry holds a JAL, which is always taken """
+
+    def lookup(self, pc: int):
+        """
+        Args:
+            pc (int): The fetch address.
+
+        Returns:
+            tuple[int, bool] | None: The target and whether the instruction is a JAL, None on a miss.
+        """
+        index = (pc >> 2) & self.mask
+        if self.tags[index] != pc:
+            return None
+        return self.targets[index], self.unconditional[index]
+
+    def insert(self, pc: int, target: int, unconditional: bool):
+        index = (pc >> 2) & self.mask
+        self.tags[index] = pc
+        self.targets[index] = target
+        self.unconditional[index] = unconditional
+
+
+class BranchPredictor(object):
+    """
+    BranchPredictor guesses, at fetch, the address of the next instruction to fetch.
+
+    The five stage core asks `predict` for every fetched PC and tells `update` the outcome of every
+    branch and JAL once ID has resolved it. A taken prediction needs the target, so every
+    predictor but the static not-taken one keeps a BranchTargetBuffer; the subclasses only decide
+    the direction of the conditional branches found in it.
+    """
+
+    name = None
+
+    def __init__(self, btb_entries=64):
+        self.btb = BranchTargetBuffer(btb_entries)
+
+    def predict(self, pc: int):
+        """
+        Args:
+            pc (int): The fetch address.
+
+        Returns:
+            int | None: The predicted next fetch address, None to fall through to PC + 4.
+        """
+        entry = self.btb.lookup(pc)
+        if entry is None:
+            return None
+        target, unconditional = entry
+        if unconditional or self.predict_taken(pc, target):
+            return target
+        return None
+
+    def update(self, pc: int, taken: bool, target: int, unconditional: bool):
+        """
+        Train the predictor with a resolved branch or JAL.
+
+        Args:
+            pc (int): Address of the branch.
+            taken (bool): Whether it was taken.
+            target (int): Its target address.
+            unconditional (bool): Whether it is a JAL.
+        """
+        if taken:
+            self.btb.insert(pc, target, unconditional)
+        if not unconditional:
+            self.train(pc, taken)
+
+    def predict_taken(self, pc: int, target: int) -> bool:
+        raise NotImplementedError
+
+    def train(self, pc: int, taken: bool):
+        pass
+
+    def get_state(self) -> list:
+        """
+        Returns:
+            list[int]: Everything the predictor has learned, for checkpoints.
+        """
+        return self.btb.tags + self.btb.targets + [int(flag) for flag in self.btb.unconditional]
+
+    def set_state(self, values):
+        """
+        Restore what get_state returned.
+
+        Args:
+            values (list[int]): The predictor state.
+        """
+        entries = len(self.btb.tags)
+        self.btb.tags = list(values[:entries])
+        self.btb.targets = list(values[entries:2 * entries])
+        self.btb.unconditional = [bool(flag) for flag in values[2 * entries:3 * entries]]
+
+    def describe(self) -> str:
+        return f"{self.name} (BTB: {len(self.btb.tags)} entries)"
+
+
+class StaticNotTaken(BranchPredictor):
+    """
+    Always fetch PC + 4, the fetch path of the original five stage core: every taken branch or JAL is a misprediction.
+    """
+
+    name = "static"
+
+    def __init__(self):
+        super(StaticNotTaken, self).__init__(btb_entries=1)
+
+    def predict(self, pc: int):
+        return None
+
+    def update(self, pc: int, taken: bool, target: int, unconditional: bool):
+        pass
+
+    def get_state(self) -> list:
+        return []
+
+    def set_state(self, values):
+        pass
+
+    def describe(self) -> str:
+        return self.name
+
+
+class BackwardTaken(BranchPredictor):
+    """
+    Predict backward branches (loops) taken and forward branches not taken.
+    """
+
+    name = "backward"
+
+    def predict_taken(self, pc: int, target: int) -> bool:
+        return target < pc
+
+
+class _PatternTable(BranchPredictor):
+    """
+    Direction predictors indexed by PC, each table entry is a saturating counter of `bits` bits.
+    """
+
+    bits = 1
+
+    def __init__(self, btb_entries=64, bht_entries=1024):
+        super(_PatternTable, self).__init__(btb_entries)
+        if bht_entries < 1 or bht_entries & (bht_entries - 1):
+            raise ValueError(f"The number of BHT entries must be a power of two: {bht_entries}")
+        self.bht_mask = bht_entries - 1
+        self.threshold = 1 << (self.bits - 1)
+        """ Counter values from `threshold` up predict taken """
+        self.maximum = (1 << self.bits) - 1
+        self.counters = [self.threshold - 1] * bht_entries
+        """ Branch history table, every entry starts as (weakly) not taken """
+
+    def index(self, pc: int) -> int:
+        return (pc >> 2) & self.bht_mask
+
+    def predict_taken(self, pc: int, target: int) -> bool:
+        return self.counters[self.index(pc)] >= self.threshold
+
+    def train(self, pc: int, taken: bool):
+        index = self.index(pc)
+        counter = self.counters[index]
+        if taken:
+            self.counters[index] = min(counter + 1, self.maximum)
+        else:
+            self.counters[index] = max(counter - 1, 0)
+
+    def get_state(self) -> list:
+        return super(_PatternTable, self).get_state() + self.counters
+
+    def set_state(self, values):
+        super(_PatternTable, self).set_state(values)
+        self.counters = list(values[3 * len(self.btb.tags):])
+
+    def describe(self) -> str:
+        return f"{self.name} (BHT: {len(self.counters)} entries, BTB: {len(self.btb.tags)} entries)"
+
+
+class OneBit(_PatternTable):
+    """
+    Predict that each branch goes the way it went last time.
+    """
+
+    name = "1bit"
+    bits = 1
+
+
+class TwoBit(_PatternTable):
+    """
+    A 2-bit saturating counter per branch, a loop branch costs one misprediction per loop exit.
+    """
+
+    name = "2bit"
+    bits = 2
+
+
+class GShare(_PatternTable):
+    """
+    2-bit saturating counters indexed by the PC XORed with the outcomes of the last conditional branches.
+
+    The global history is updated when branches resolve, not speculatively at fetch.
+    """
+
+    name = "gshare"
+    bits = 2
+
+    def __init__(self, btb_entries=64, bht_entries=1024):
+        super(GShare, self).__init__(btb_entries, bht_entries)
+        self.history = 0
+        """ Outcomes of the most recent conditional branches, the newest in bit 0 """
+
+    def index(self, pc: int) -> int:
+        return ((pc >> 2) ^ self.history) & self.bht_mask
+
+    def train(self, pc: int, taken: bool):
+        super(GShare, self).train(pc, taken)
+        self.history = ((self.history << 1) | int(taken)) & self.bht_mask
+
+    def get_state(self) -> list:
+        return super(GShare, self).get_state() + [self.history]
+
+    def set_state(self, values):
+        super(GShare, self).set_state(values[:-1])
+        self.history = values[-1]
+
+
+PREDICTORS = {
+    StaticNotTaken.name: StaticNotTaken,
+    BackwardTaken.name: BackwardTaken,
+    OneBit.name: OneBit,
+    TwoBit.name: TwoBit,
+    GShare.name: GShare,
+}
+""" Branch predictors by the name used on the command line """
+
+
+class PredictorConfig(object):
+    """
+    PredictorConfig describes the branch predictor of a five stage core, each core builds its own from it.
+    """
+
+    def __init__(self, kind="static", **sizes):
+        """
+        Initialize the PredictorConfig.
+
+        Args:
+            kind (str): One of PREDICTORS.
+            **sizes (int): `btb` and, for the table predictors, `bht`: number of entries.
+        """
+        if kind not in PREDICTORS:
+            raise ValueError(f"Unsupported branch predictor: {kind}")
+        allowed = () if kind == StaticNotTaken.name else ("btb",) if kind == BackwardTaken.name else ("btb", "bht")
+        for name in sizes:
+            if name not in allowed:
+                raise ValueError(f"Branch predictor {kind} takes no {name} size")
+        self.kind = kind
+        self.sizes = sizes
+
+    @classmethod
+    def parse(cls, spec: str):
+        """
+        Build a PredictorConfig from its command line form.
+
+        `static`, `backward[:btb=N]`, or `1bit`, `2bit`, `gshare` followed by `[:bht=N,btb=N]`.
+
+        Args:
+            spec (str): The predictor specification.
+
+        Returns:
+            PredictorConfig: The configuration.
+        """
+        kind, _, argument = spec.partition(":")
+        sizes = {}
+        for setting in filter(None, argument.split(",")):
+            name, _, value = setting.partition("=")
+            sizes[name] = int(value)
+        return cls(kind, **sizes)
+
+    def build(self) -> BranchPredictor:
+        """
+        Returns:
+            BranchPredictor: A new, untrained predictor.
+        """
+        return PREDICTORS[self.kind](**{f"{name}_entries": value for name, value in self.sizes.items()})
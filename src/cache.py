@@ -0,0 +1,238 @@
+REPLACEMENT_POLICIES = ("lru", "fifo", "random")
+WRITE_POLICIES = ("back", "through")
+
+INSTRUCTION_CACHE = "L1 Instruction Cache"
+DATA_CACHE = "L1 Data Cache"
+""" The names of the caches of the five stage core """
+
+STATISTICS = ("reads", "writes", "read_misses", "write_misses", "writebacks", "memory_writes", "stall_cycles")
+""" The counters of a Cache, in the order they are checkpointed """
+
+
+def _power_of_two(value) -> bool:
+    return value >= 1 and not value & (value - 1)
+
+
+class Cache(object):
+    """
+    Cache is a timing model of a set-associative L1 cache.
+
+    It tracks which memory lines are present, and which are dirty, and tells the core how many
+    cycles each access stalls it. The data itself stays in the memory behind the cache, so a cache
+    changes the cycle count of a program but never what it computes.
+
+    Write-back caches allocate on write misses and write a dirty line back to memory when it is
+    evicted, which adds a miss latency to the access causing the eviction. Write-through caches
+    do not allocate on write misses, every store goes to memory through a write buffer that never
+    stalls the core.
+    """
+
+    def __init__(self, name, size=4096, associativity=2, line_size=16, replacement="lru", write_policy="back",
+                 hit_latency=1, miss_latency=10):
+        """
+        Initialize the Cache.
+
+        Args:
+            name (str): The name in the metrics, e.g. `L1 Data Cache`.
+            size (int): Capacity in bytes.
+            associativity (int): Number of lines per set.
+            line_size (int): Line size in bytes.
+            replacement (str): One of REPLACEMENT_POLICIES.
+            write_policy (str): One of WRITE_POLICIES.
+            hit_latency (int): Cycles an access takes on a hit, 1 is the single cycle memory the pipeline assumes.
+            miss_latency (int): Cycles a miss adds to go to memory.
+        """
+        if replacement not in REPLACEMENT_POLICIES:
+            raise ValueError(f"Unsupported replacement policy: {replacement}")
+        if write_policy not in WRITE_POLICIES:
+            raise ValueError(f"Unsupported write policy: {write_policy}")
+        if not _power_of_two(line_size) or line_size < 4:
+            raise ValueError(f"The line size must be a power of two of at least 4 bytes: {line_size}")
+        if associativity < 1 or size % (associativity * line_size) or not _power_of_two(
+                size // (associativity * line_size)):
+            raise ValueError(f"{size} bytes do not make a power of two number of {associativity}-way sets "
+                             f"of {line_size} byte lines")
+        if hit_latency < 1 or miss_latency < 0:
+            raise ValueError(f"Invalid cache latencies: hit {hit_latency}, miss {miss_latency}")
+        self.name = name
+        self.size = size
+        self.associativity = associativity
+        self.line_size = line_size
+        self.replacement = replacement
+        self.write_policy = write_policy
+        self.hit_latency = hit_latency
+        self.miss_latency = miss_latency
+
+        self.line_bits = line_size.bit_length() - 1
+        self.set_mask = size // (associativity * line_size) - 1
+        self.sets = [[] for _ in range(self.set_mask + 1)]
+        """ The line numbers (address >> line_bits) held by each set, the next one to evict first """
+        self.dirty = set()
+        """ Line numbers written since they were filled, write-back only """
+        self.random_state = 0x2545F491
+        """ xorshift32 state of the random replacement policy, so runs are reproducible """
+
+        self.reads = 0
+        self.writes = 0
+        self.read_misses = 0
+        self.write_misses = 0
+        self.writebacks = 0
+        """ Dirty lines written back to memory on eviction """
+        self.memory_writes = 0
+        """ Stores sent to memory by a write-through cache """
+        self.stall_cycles = 0
+        """ Cycles the accesses took beyond the single cycle of an ideal memory """
+
+    def access(self, address: int, write: bool = False) -> int:
+        """
+        Look up an address, filling its line on a miss.
+
+        Args:
+            address (int): The byte address.
+            write (bool): True for a store, False for a load or an instruction fetch.
+
+        Returns:
+            int: Number of cycles the access stalls the core, 0 for a hit with a latency of 1.
+        """
+        line = (address & 0xFFFFFFFF) >> self.line_bits
+        lines = self.sets[line & self.set_mask]
+        latency = self.hit_latency
+        if write:
+            self.writes += 1
+        else:
+            self.reads += 1
+
+        if line in lines:
+            if self.replacement == "lru":
+                lines.remove(line)
+                lines.append(line)
+            if write:
+                if self.write_policy == "back":
+                    self.dirty.add(line)
+                else:
+                    self.memory_writes += 1
+        elif write and self.write_policy == "through":
+            # no write allocate, the store is posted to memory
+            self.write_misses += 1
+            self.memory_writes += 1
+        else:
+            if write:
+                self.write_misses += 1
+            else:
+                self.read_misses += 1
+            latency += self.miss_latency
+            if len(lines) == self.associativity:
+                victim = lines.pop(self.next_random() % len(lines) if self.replacement == "random" else 0)
+                if victim in self.dirty:
+                    self.dirty.discard(victim)
+                    self.writebacks += 1
+                    latency += self.miss_latency
+            lines.append(line)
+            if write:
+                self.dirty.add(line)
+
+        self.stall_cycles += latency - 1
+        return latency - 1
+
+    def next_random(self) -> int:
+        state = self.random_state
+        state ^= (state << 13) & 0xFFFFFFFF
+        state ^= state >> 17
+        state ^= (state << 5) & 0xFFFFFFFF
+        self.random_state = state
+        return state
+
+    @property
+    def accesses(self) -> int:
+        return self.reads + self.writes
+
+    @property
+    def misses(self) -> int:
+        return self.read_misses + self.write_misses
+
+    def describe(self) -> str:
+        return (f"{self.size} B, {self.associativity}-way, {self.line_size} B lines, {self.replacement}, "
+                f"write-{self.write_policy}, hit {self.hit_latency} / miss {self.miss_latency} cycles")
+
+    def get_state(self) -> list:
+        """
+        Returns:
+            list[int]: The cache contents, replacement state and statistics, for checkpoints.
+        """
+        values = [self.random_state] + [getattr(self, name) for name in STATISTICS]
+        for lines in self.sets:
+            values.append(len(lines))
+            values.extend(lines)
+        values.append(len(self.dirty))
+        values.extend(sorted(self.dirty))
+        return values
+
+    def set_state(self, values):
+        """
+        Restore what get_state returned.
+
+        Args:
+            values (list[int]): The cache state.
+        """
+        values = iter(values)
+        self.random_state = next(values)
+        for name in STATISTICS:
+            setattr(self, name, next(values))
+        for lines in self.sets:
+            lines[:] = [next(values) for _ in range(next(values))]
+        self.dirty = {next(values) for _ in range(next(values))}
+
+
+class CacheConfig(object):
+    """
+    CacheConfig describes an L1 cache, each core builds its own from it.
+    """
+
+    KEYS = {"size": "size", "assoc": "associativity", "line": "line_size", "replace": "replacement",
+            "write": "write_policy", "hit": "hit_latency", "miss": "miss_latency"}
+    """ Command line key -> Cache argument """
+
+    def __init__(self, **parameters):
+        """
+        Initialize the CacheConfig.
+
+        Args:
+            **parameters: Cache arguments, the others keep their defaults.
+        """
+        Cache("check", **parameters)
+        self.parameters = parameters
+
+    @classmethod
+    def parse(cls, spec: str):
+        """
+        Build a CacheConfig from its command line form.
+
+        Comma separated `key=value` settings, any of `size=4096,assoc=2,line=16,replace=lru,write=back,
+        hit=1,miss=10` (replace: lru, fifo or random; write: back or through). An empty spec or
+        `default` keeps every default.
+
+        Args:
+            spec (str): The cache specification.
+
+        Returns:
+            CacheConfig: The configuration.
+        """
+        parameters = {}
+        for setting in filter(None, spec.split(",")):
+            if setting == "default":
+                continue
+            key, _, value = setting.partition("=")
+            if key not in cls.KEYS:
+                raise ValueError(f"Unknown cache setting: {key}")
+            parameters[cls.KEYS[key]] = value if key in ("replace", "write") else int(value)
+        return cls(**parameters)
+
+    def build(self, name: str) -> Cache:
+        """
+        Args:
+            name (str): The name of the cache in the metrics.
+
+        Returns:
+            Cache: A new, empty cache.
+        """
+        return Cache(name, **self.parameters)
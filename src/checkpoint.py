@@ -0,0 +1,290 @@
+import os
+import struct
+import zlib
+from pathlib import Path
+
+from loguru import logger
+
+from src.core import SingleStageCore, FiveStageCore, FunctionalCore, DualIssueCore
+from src.memory import PAGE_SIZE
+
+MAGIC = b"RVCP"
+VERSION = 4
+
+HEADER = struct.Struct(">4sBB")
+""" magic, format version, core kind; followed by the zlib compressed body """
+
+CORE_KINDS = {SingleStageCore: 1, FiveStageCore: 2, FunctionalCore: 3, DualIssueCore: 4}
+
+CORE_SCALARS = {
+    SingleStageCore: ("cycle", "halted"),
+    FiveStageCore: ("cycle", "halted", "halt_detected", "retired", "memory_stall"),
+    FunctionalCore: ("cycle", "halted", "pc", "retired"),
+    DualIssueCore: ("cycle", "halted", "halt_detected", "retired", "memory_stall"),
+}
+""" The attributes of each core, besides the register file, data memory and pipeline registers, that make up its state """
+
+INT64 = struct.Struct(">q")
+UINT32 = struct.Struct(">I")
+
+
+class _Encoder(object):
+    """
+    Appends the values of a checkpoint to a byte buffer.
+
+    Pipeline register fields are ints, bools or None, each is written as a one byte tag and its value.
+    """
+
+    def __init__(self):
+        self.data = bytearray()
+
+    def value(self, value):
+        if value is None:
+            self.data += b"N"
+        elif value is True or value is False:
+            self.data += b"T" if value else b"F"
+        elif -(1 << 63) <= value < (1 << 63):
+            self.data += b"q"
+            self.data += INT64.pack(value)
+        else:
+            raw = value.to_bytes((value.bit_length() + 8) // 8, "big", signed=True)
+            self.data += b"L"
+            self.data += UINT32.pack(len(raw))
+            self.data += raw
+
+    def uint32(self, value):
+        self.data += UINT32.pack(value)
+
+    def text(self, value):
+        raw = value.encode()
+        self.uint32(len(raw))
+        self.data += raw
+
+    def raw(self, data):
+        self.data += data
+
+
+class _Decoder(object):
+    """
+    Reads back the values written by _Encoder.
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self.offset = 0
+
+    def value(self):
+        tag = self.data[self.offset: self.offset + 1]
+        self.offset += 1
+        if tag == b"N":
+            return None
+        if tag == b"T":
+            return True
+        if tag == b"F":
+            return False
+        if tag == b"q":
+            value = INT64.unpack_from(self.data, self.offset)[0]
+            self.offset += INT64.size
+            return value
+        if tag == b"L":
+            length = self.uint32()
+            return int.from_bytes(self.raw(length), "big", signed=True)
+        raise ValueError(f"Corrupted checkpoint: unknown value tag {tag!r} at offset {self.offset - 1}")
+
+    def uint32(self):
+        value = UINT32.unpack_from(self.data, self.offset)[0]
+        self.offset += UINT32.size
+        return value
+
+    def raw(self, size):
+        data = self.data[self.offset: self.offset + size]
+        self.offset += size
+        return data
+
+    def text(self):
+        return bytes(self.raw(self.uint32())).decode()
+
+
+def _pipeline_registers(state):
+    """The pipeline registers of a state in checkpoint order, both lanes of each stage of a DualIssueState."""
+    for stage in (state.IF, state.ID, state.EX, state.MEM, state.WB):
+        if isinstance(stage, tuple):
+            yield from stage
+        else:
+            yield stage
+
+
+def _trace_writers(core):
+    return [core.register_file.trace] + ([core.state_trace] if core.state_trace is not None else [])
+
+
+def save_checkpoint(core, file_path: Path):
+    """
+    Save the complete state of a core to a compact binary file.
+
+    The file holds the core's scalar state (cycle, HALT flags, ...), the five stage and dual issue cores'
+    performance counters, branch predictor tables and caches, the register file, the current and
+    next pipeline registers, the populated pages of the data memory and the length of the trace
+    files. The trace files are flushed first, so the recorded lengths cover exactly the cycles
+    simulated so far. The file is replaced atomically, an interrupted save keeps the
+    previous checkpoint.
+
+    Args:
+        core (Core): A SingleStageCore, FiveStageCore, DualIssueCore or FunctionalCore.
+        file_path (Path): The checkpoint file.
+    """
+    kind = CORE_KINDS.get(type(core))
+    if kind is None:
+        raise ValueError(f"Checkpointing is not supported for {type(core).__name__}")
+
+    body = _Encoder()
+    body.uint32(zlib.crc32(core.ext_instruction_memory.i_mem))
+    for name in CORE_SCALARS[type(core)]:
+        body.value(getattr(core, name))
+    if hasattr(core, "counters"):
+        for value in core.counters.values():
+            body.value(value)
+        body.text(core.predictor.name)
+        predictor_state = core.predictor.get_state()
+        body.uint32(len(predictor_state))
+        for value in predictor_state:
+            body.value(value)
+        for cache in (core.instruction_cache, core.data_cache):
+            body.value(cache is not None)
+            if cache is not None:
+                body.text(cache.describe())
+                cache_state = cache.get_state()
+                body.uint32(len(cache_state))
+                for value in cache_state:
+                    body.value(value)
+    for value in core.register_file.Registers:
+        body.value(value)
+
+    if hasattr(core, "state"):
+        # SingleStageCore aliases next_state to state after its first cycle, keep it that way on restore
+        body.value(core.next_state is core.state)
+        for state in (core.state, core.next_state):
+            for stage in _pipeline_registers(state):
+                for name in stage.__slots__:
+                    body.value(getattr(stage, name))
+
+    data_memory = core.ext_data_memory
+    body.uint32(data_memory.window_size)
+    body.uint32(len(data_memory.pages))
+    for page_number in sorted(data_memory.pages):
+        body.uint32(page_number)
+        body.raw(data_memory.pages[page_number])
+
+    for trace in _trace_writers(core):
+        trace.flush()
+        body.value(trace.file_path.stat().st_size if trace.started else None)
+
+    file_path = Path(file_path)
+    temp_path = file_path.with_name(file_path.name + ".tmp")
+    with open(temp_path, "wb") as cf:
+        cf.write(HEADER.pack(MAGIC, VERSION, kind))
+        cf.write(zlib.compress(bytes(body.data)))
+    os.replace(temp_path, file_path)
+
+
+def load_checkpoint(core, file_path: Path, resume_traces: bool = True):
+    """
+    Restore a core from a checkpoint written by save_checkpoint.
+
+    `core` must be a freshly constructed core of the same kind, built on the same program.
+    Its data memory is replaced by the checkpointed one.
+
+    Args:
+        core (Core): The core to restore into.
+        file_path (Path): The checkpoint file.
+        resume_traces (bool): True continues the trace files of the checkpointed run (they are cut
+            back to the checkpointed cycle), False starts new trace files at the restored cycle.
+    """
+    with open(file_path, "rb") as cf:
+        content = cf.read()
+    magic, version, kind = HEADER.unpack_from(content)
+    if magic != MAGIC:
+        raise ValueError(f"{file_path} is not a checkpoint")
+    if version != VERSION:
+        raise ValueError(f"Unsupported checkpoint version {version} in {file_path}")
+    if kind != CORE_KINDS.get(type(core)):
+        raise ValueError(f"{file_path} does not hold the state of a {type(core).__name__}")
+
+    body = _Decoder(zlib.decompress(content[HEADER.size:]))
+    if body.uint32() != zlib.crc32(core.ext_instruction_memory.i_mem):
+        raise ValueError(f"{file_path} was taken on a different program")
+    for name in CORE_SCALARS[type(core)]:
+        setattr(core, name, body.value())
+    if hasattr(core, "counters"):
+        core.counters.restore([body.value() for _ in core.counters.fields])
+        name = body.text()
+        if name != core.predictor.name:
+            raise ValueError(f"{file_path} was taken with the {name} branch predictor, not {core.predictor.name}")
+        predictor_state = [body.value() for _ in range(body.uint32())]
+        if len(predictor_state) != len(core.predictor.get_state()):
+            raise ValueError(f"{file_path} was taken with {name} branch predictor tables of another size")
+        core.predictor.set_state(predictor_state)
+        for cache in (core.instruction_cache, core.data_cache):
+            if not body.value():
+                if cache is not None:
+                    raise ValueError(f"{file_path} was taken without the {cache.name}")
+                continue
+            if cache is None or body.text() != cache.describe():
+                raise ValueError(f"{file_path} was taken with another cache configuration")
+            cache.set_state([body.value() for _ in range(body.uint32())])
+    core.register_file.Registers[:] = [body.value() for _ in core.register_file.Registers]
+
+    if hasattr(core, "state"):
+        aliased = body.value()
+        for state in (core.state, core.next_state):
+            for stage in _pipeline_registers(state):
+                for name in stage.__slots__:
+                    setattr(stage, name, body.value())
+        if aliased:
+            core.next_state = core.state
+
+    data_memory = core.ext_data_memory
+    data_memory.window_size = body.uint32()
+    data_memory.pages = {}
+    for _ in range(body.uint32()):
+        page_number = body.uint32()
+        data_memory.pages[page_number] = bytearray(body.raw(PAGE_SIZE))
+
+    for trace in _trace_writers(core):
+        size = body.value()
+        trace.buffer.clear()
+        trace.close()
+        trace.started = False
+        if resume_traces and size is not None and trace.file_path.exists():
+            with open(trace.file_path, "r+") as tf:
+                tf.truncate(size)
+            trace.started = True  # append to the checkpointed trace instead of starting it over
+    logger.info(f"Restored {type(core).__name__} at cycle {core.cycle} from {file_path}")
+
+
+class AutoCheckpoint(object):
+    """
+    AutoCheckpoint saves a core every `interval` cycles, so a long run can be resumed after an interruption.
+    """
+
+    def __init__(self, core, file_path: Path, interval: int):
+        """
+        Initialize the AutoCheckpoint.
+
+        Args:
+            core (Core): The core to checkpoint.
+            file_path (Path): The checkpoint file, overwritten by every checkpoint.
+            interval (int): Number of cycles between checkpoints.
+        """
+        if interval < 1:
+            raise ValueError(f"Checkpoint interval must be positive: {interval}")
+        self.core = core
+        self.file_path = file_path
+        self.interval = interval
+
+    def after_step(self):
+        """
+        Save a checkpoint if the core just completed a multiple of `interval` cycles. Call after every step.
+        """
+        if not self.core.halted and self.core.cycle % self.interval == 0:
+            save_checkpoint(self.core, self.file_path)
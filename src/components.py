@@ -1,5 +1,7 @@
 from loguru import logger
 
+from src import diagnostics
+
 
 def alu_control_unit(alu_op, func_code):
     """ALU Control logic for RISC-V simulator.
@@ -21,26 +23,33 @@ def alu_control_unit(alu_op, func_code):
 
     if alu_op == 0b00:
         alu_control = 0b0010  # add for lw/sw
-        logger.debug(f"ALU Control: {alu_control} (Load/Store)")
+        if diagnostics.VERBOSE:
+            logger.debug(f"ALU Control: {alu_control} (Load/Store)")
     elif alu_op == 0b01:
         alu_control = 0b0110  # subtract for branch
-        logger.debug(f"ALU Control: {alu_control} (Branch)")
+        if diagnostics.VERBOSE:
+            logger.debug(f"ALU Control: {alu_control} (Branch)")
     elif alu_op == 0b10:
         if func_code == 0b0000:
             alu_control = 0b0010  # ADD
-            logger.info(f"ALU Control: {alu_control} (ADD)")
+            if diagnostics.VERBOSE:
+                logger.info(f"ALU Control: {alu_control} (ADD)")
         elif func_code == 0b1000:
             alu_control = 0b0110  # SUB
-            logger.info(f"ALU Control: {alu_control} (SUB)")
+            if diagnostics.VERBOSE:
+                logger.info(f"ALU Control: {alu_control} (SUB)")
         elif func_code == 0b0111:
             alu_control = 0b0000  # AND
-            logger.info(f"ALU Control: {alu_control} (AND)")
+            if diagnostics.VERBOSE:
+                logger.info(f"ALU Control: {alu_control} (AND)")
         elif func_code == 0b0110:
             alu_control = 0b0001  # OR
-            logger.info(f"ALU Control: {alu_control} (OR)")
+            if diagnostics.VERBOSE:
+                logger.info(f"ALU Control: {alu_control} (OR)")
         elif func_code == 0b0100:
             alu_control = 0b0111  # XOR
-            logger.info(f"ALU Control: {alu_control} (XOR)")
+            if diagnostics.VERBOSE:
+                logger.info(f"ALU Control: {alu_control} (XOR)")
         else:
             alu_control = 0b1111  # Should not happen
             logger.error(f"ALU Control: {alu_control} (Undefined)")
@@ -76,8 +85,9 @@ def arithmetic_logic_unit(alu_control, a, b):
     # Zero is True if alu_result is 0
     zero = (alu_result == 0)
 
-    logger.info(f"ALU Input: {a}, {b}")
-    logger.info(f"ALU Result: {alu_result}, Zero: {zero}")
+    if diagnostics.VERBOSE:
+        logger.info(f"ALU Input: {a}, {b}")
+        logger.info(f"ALU Result: {alu_result}, Zero: {zero}")
 
     return zero, alu_result
 
@@ -112,7 +122,8 @@ def control_unit(opcode: int):
     halt = False
 
     if opcode == 0b0110011:  # R-type
-        logger.debug(f"Opcode: {opcode} (R-type)")
+        if diagnostics.VERBOSE:
+            logger.debug(f"Opcode: {opcode} (R-type)")
         control_signals.update({
             "ALUSrcB": 0,
             "MemtoReg": 0,
@@ -123,7 +134,8 @@ def control_unit(opcode: int):
             "ALUOp": 0b10
         })
     elif opcode == 0b0010011:  # I-type
-        logger.debug(f"Opcode: {opcode} (I-type)")
+        if diagnostics.VERBOSE:
+            logger.debug(f"Opcode: {opcode} (I-type)")
         control_signals.update({
             "ALUSrcB": 0b10,
             "MemtoReg": 0,
@@ -134,7 +146,8 @@ def control_unit(opcode: int):
             "ALUOp": 0b10
         })
     elif opcode == 0b0000011:  # Load
-        logger.debug(f"Opcode: {opcode} (Load)")
+        if diagnostics.VERBOSE:
+            logger.debug(f"Opcode: {opcode} (Load)")
         control_signals.update({
             "ALUSrcB": 0b10,
             "MemtoReg": 1,
@@ -145,7 +158,8 @@ def control_unit(opcode: int):
             "ALUOp": 0b00
         })
     elif opcode == 0b0100011:  # Store
-        logger.debug(f"Opcode: {opcode} (Store)")
+        if diagnostics.VERBOSE:
+            logger.debug(f"Opcode: {opcode} (Store)")
         control_signals.update({
             "ALUSrcB": 0b10,
             "MemtoReg": 0,
@@ -156,7 +170,8 @@ def control_unit(opcode: int):
             "ALUOp": 0b00
         })
     elif opcode == 0b1100011:  # Branch
-        logger.debug(f"Opcode: {opcode} (Branch)")
+        if diagnostics.VERBOSE:
+            logger.debug(f"Opcode: {opcode} (Branch)")
         control_signals.update({
             "ALUSrcB": 0,
             "MemtoReg": 0,
@@ -167,7 +182,8 @@ def control_unit(opcode: int):
             "ALUOp": 0b01
         })
     elif opcode == 0b1101111:  # JAL
-        logger.debug(f"Opcode: {opcode} (JAL)")
+        if diagnostics.VERBOSE:
+            logger.debug(f"Opcode: {opcode} (JAL)")
         control_signals.update({
             "JAL": 1,
             "ALUSrcA": 1,
@@ -180,7 +196,8 @@ def control_unit(opcode: int):
             "ALUOp": 0b10
         })
     elif opcode == 0b1111111:  # HALT
-        logger.debug(f"Opcode: {opcode} (HALT)")
+        if diagnostics.VERBOSE:
+            logger.debug(f"Opcode: {opcode} (HALT)")
         halt = True
     elif opcode == 0b0000000:  # 0
         pass
@@ -206,7 +223,8 @@ def control_unit_for_single_stage(opcode: int):
     halt = False
 
     if opcode == 0b0110011:  # R-type
-        logger.debug(f"Opcode: {opcode} (R-type)")
+        if diagnostics.VERBOSE:
+            logger.debug(f"Opcode: {opcode} (R-type)")
         control_signals.update({
             "ALUSrcA": 0,
             "ALUSrcB": 0,
@@ -218,7 +236,8 @@ def control_unit_for_single_stage(opcode: int):
             "ALUOp": 0b10
         })
     elif opcode == 0b0010011:  # I-type
-        logger.debug(f"Opcode: {opcode} (I-type)")
+        if diagnostics.VERBOSE:
+            logger.debug(f"Opcode: {opcode} (I-type)")
         control_signals.update({
             "ALUSrcA": 0,
             "ALUSrcB": 0b10,
@@ -230,7 +249,8 @@ def control_unit_for_single_stage(opcode: int):
             "ALUOp": 0b10
         })
     elif opcode == 0b0000011:  # Load
-        logger.debug(f"Opcode: {opcode} (Load)")
+        if diagnostics.VERBOSE:
+            logger.debug(f"Opcode: {opcode} (Load)")
         control_signals.update({
             "ALUSrcA": 0,
             "ALUSrcB": 0b10,
@@ -242,7 +262,8 @@ def control_unit_for_single_stage(opcode: int):
             "ALUOp": 0b00
         })
     elif opcode == 0b0100011:  # Store
-        logger.debug(f"Opcode: {opcode} (Store)")
+        if diagnostics.VERBOSE:
+            logger.debug(f"Opcode: {opcode} (Store)")
         control_signals.update({
             "ALUSrcA": 0,
             "ALUSrcB": 0b10,
@@ -254,7 +275,8 @@ def control_unit_for_single_stage(opcode: int):
             "ALUOp": 0b00
         })
     elif opcode == 0b1100011:  # Branch
-        logger.debug(f"Opcode: {opcode} (Branch)")
+        if diagnostics.VERBOSE:
+            logger.debug(f"Opcode: {opcode} (Branch)")
         control_signals.update({
             "ALUSrcA": 0,
             "ALUSrcB": 0,
@@ -266,7 +288,8 @@ def control_unit_for_single_stage(opcode: int):
             "ALUOp": 0b01
         })
     elif opcode == 0b1101111:  # JAL
-        logger.debug(f"Opcode: {opcode} (JAL)")
+        if diagnostics.VERBOSE:
+            logger.debug(f"Opcode: {opcode} (JAL)")
         control_signals.update({
             "JAL": 1,
             "ALUSrcA": 1,
@@ -279,7 +302,8 @@ def control_unit_for_single_stage(opcode: int):
             "ALUOp": 0b10
         })
     elif opcode == 0b1111111:  # HALT
-        logger.debug(f"Opcode: {opcode} (HALT)")
+        if diagnostics.VERBOSE:
+            logger.debug(f"Opcode: {opcode} (HALT)")
         halt = True
     elif opcode == 0b0000000:  # 0
         pass
@@ -302,7 +326,8 @@ def imm_gen(opcode: int, instr: int) -> int:
         imm = (instr >> 20) & 0xFFF  # Extract 12 bits
         if imm & 0x800:  # Check if sign bit (bit 11) is set
             imm |= 0xFFFFF000  # Sign extend to 32 bits
-        logger.debug(f"I-type Immediate: {imm:032b} ({imm})")
+        if diagnostics.VERBOSE:
+            logger.debug(f"I-type Immediate: {imm:032b} ({imm})")
         return imm
 
     elif opcode == 0b0100011:  # S-type (e.g., sw)
@@ -310,7 +335,8 @@ def imm_gen(opcode: int, instr: int) -> int:
         imm = ((instr >> 25) << 5) | ((instr >> 7) & 0x1F)  # Combine bits
         if imm & 0x800:  # Check if sign bit (bit 11) is set
             imm |= 0xFFFFF000  # Sign extend to 32 bits
-        logger.debug(f"S-type Immediate: {imm:032b} ({imm})")
+        if diagnostics.VERBOSE:
+            logger.debug(f"S-type Immediate: {imm:032b} ({imm})")
         return imm
 
     elif opcode == 0b1100011:  # B-type (e.g., beq)
@@ -322,13 +348,15 @@ def imm_gen(opcode: int, instr: int) -> int:
 
         if imm & 0x1000:  # Check if sign bit (bit 12) is set
             imm |= 0xFFFFE000  # Sign extend to 32 bits
-        logger.debug(f"B-type Immediate: {imm:032b} ({imm})")
+        if diagnostics.VERBOSE:
+            logger.debug(f"B-type Immediate: {imm:032b} ({imm})")
         return imm
 
     elif opcode == 0b0110111 or opcode == 0b0010111:  # U-type (e.g., lui, auipc)
         # Immediate is in bits [31:12]
         imm = (instr & 0xFFFFF000)  # Upper 20 bits, zero-extended
-        logger.debug(f"U-type Immediate: {imm:032b} ({imm})")
+        if diagnostics.VERBOSE:
+            logger.debug(f"U-type Immediate: {imm:032b} ({imm})")
         return imm
 
     elif opcode == 0b1101111:  # J-type (e.g., jal)
@@ -337,11 +365,13 @@ def imm_gen(opcode: int, instr: int) -> int:
               (((instr >> 20) & 0x1) << 11) | ((instr >> 21) & 0x3FF) << 1
         if imm & 0x100000:  # Check if sign bit (bit 20) is set
             imm |= 0xFFE00000  # Sign extend to 32 bits
-        logger.debug(f"J-type Immediate: {imm:032b} ({imm})")
+        if diagnostics.VERBOSE:
+            logger.debug(f"J-type Immediate: {imm:032b} ({imm})")
         return imm
 
     else:
-        logger.debug(f"Immediate: 0 (No Imm)")
+        if diagnostics.VERBOSE:
+            logger.debug(f"Immediate: 0 (No Imm)")
         return 0  # Default immediate (shouldn't reach here for valid instructions)
 
 
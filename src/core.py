@@ -1,22 +1,36 @@
-import copy
+from collections import deque
 from pathlib import Path
 
 from loguru import logger
 
-from src.components import arithmetic_logic_unit, alu_control_unit, adder, control_unit, imm_gen, multiplexer, and_gate, \
-    xor_gate, or_gate, control_unit_for_single_stage
-from src.hazard_handler import forwarding_unit, hazard_detection_unit, forwarding_unit_for_branch
+from src import diagnostics
+from src.branch_predictor import StaticNotTaken
+from src.components import arithmetic_logic_unit, adder, multiplexer, and_gate, xor_gate, or_gate
+from src.counters import PerformanceCounters, DualIssueCounters, OutOfOrderCounters
+from src.decoder import ProgramTable
+from src.hazard_handler import forwarding_unit, hazard_detection_unit, forwarding_unit_for_branch, \
+    forwarding_unit_dual_issue, hazard_detection_unit_dual_issue
 from src.memory import InstructionMemory, DataMemory
 from src.register_file import RegisterFile
-from src.state import State, SingleStageState
+from src.state import State, SingleStageState, DualIssueState
+from src.tomasulo import ReorderBufferEntry, ReservationStationEntry, FetchQueueEntry
+from src.translator import BlockCache
+from src.trace_writer import TraceWriter, TracePolicy, DEFAULT_FLUSH_INTERVAL
 
 
 class Core(object):
     def __init__(self,
                  ioDir,
                  instruction_memory: InstructionMemory,
-                 data_memory: DataMemory):
-        self.register_file = RegisterFile(ioDir)
+                 data_memory: DataMemory,
+                 flush_interval: int = DEFAULT_FLUSH_INTERVAL,
+                 trace_policy: TracePolicy = None):
+        self.register_file = RegisterFile(ioDir, flush_interval)
+        self.flush_interval = flush_interval
+        self.trace_policy = trace_policy if trace_policy is not None else TracePolicy()
+        """ Which cycles are dumped to RFResult.txt and StateResult_*.txt """
+        self.state_trace = None
+        """ TraceWriter of the StateResult file, set by the subclass """
         self.cycle = 0
         self.halted = False
         """ A flag to indicate STOP """
@@ -25,13 +39,41 @@ class Core(object):
         self.ext_instruction_memory = instruction_memory
         self.ext_data_memory = data_memory
 
+        # Decode-once program table, shared by every core fetching from the same instruction memory
+        if instruction_memory.program is None:
+            instruction_memory.program = ProgramTable(instruction_memory)
+        self.program = instruction_memory.program
+
+    def close(self):
+        """
+        Flush and close the trace files. Called on halt, and by the caller if the run is interrupted.
+        """
+        self.register_file.close()
+        if self.state_trace is not None:
+            self.state_trace.close()
+
+    def load_architectural_state(self, registers, pc):
+        """
+        Hand off architectural state from another core: the register file and the PC.
+
+        The data memory is handed off by constructing this core with the other core's DataMemory.
+        Must be called before the first step.
+
+        Args:
+            registers (list[int]): The 32 register values.
+            pc (int): The address of the next instruction to execute.
+        """
+        self.register_file.Registers[:] = registers
+        self.state.IF.PC = pc
+
 
 class SingleStageCore(Core):
     """
     SingleStageCore simulates a single-stage pipeline processor core.
     """
 
-    def __init__(self, io_dir, instruction_memory, data_memory):
+    def __init__(self, io_dir, instruction_memory, data_memory, flush_interval=DEFAULT_FLUSH_INTERVAL,
+                 trace_policy=None):
         """
         Initialize the SingleStageCore.
 
@@ -39,11 +81,15 @@ class SingleStageCore(Core):
             io_dir (Path): Directory for input/output files.
             instruction_memory (InstructionMemory): The instruction memory.
             data_memory (DataMemory): The data memory.
+            flush_interval (int): Number of cycles buffered by the trace writers before writing.
+            trace_policy (TracePolicy): Which cycles are traced, every cycle by default.
         """
         self.state = SingleStageState()
         self.next_state = SingleStageState()
-        super(SingleStageCore, self).__init__(io_dir / "SS_", instruction_memory, data_memory)
+        super(SingleStageCore, self).__init__(io_dir / "SS_", instruction_memory, data_memory, flush_interval,
+                                              trace_policy)
         self.op_file_path = io_dir / "StateResult_SS.txt"
+        self.state_trace = TraceWriter(self.op_file_path, flush_interval)
 
     def step(self):
         """
@@ -52,187 +98,198 @@ class SingleStageCore(Core):
         # Your implementation
 
         # --------------------- IF stage ---------------------
-        logger.debug(f"--------------------- IF stage ")
+        if diagnostics.VERBOSE:
+            logger.debug(f"--------------------- IF stage ")
 
         # "The PC address is incremented by 4 and then written
         # back into the PC to be ready for the next clock cycle. This PC is also saved
         # in the IF/ID pipeline register in case it is needed later for an instruction,
         # such as beq." Comp.Org P.300
-        if_pc_adder_result = adder(4, self.state.IF["PC"])
-        self.state.ID["nop"] = self.state.IF["nop"]
-        logger.opt(colors=True).info(f"<green>PC: {self.state.IF['PC']}</green>")
+        if_pc_adder_result = adder(4, self.state.IF.PC)
+        self.state.ID.nop = self.state.IF.nop
+        if diagnostics.VERBOSE:
+            logger.opt(colors=True).info(f"<green>PC: {self.state.IF.PC}</green>")
 
-        self.state.ID["Instr"] = self.ext_instruction_memory.read(
-            self.state.IF["PC"])
-        program_counter = self.state.IF["PC"]
+        self.state.ID.Instr = self.program.fetch(self.state.IF.PC)
+        program_counter = self.state.IF.PC
 
-        logger.debug(f"Instruction: +.....-+...-+...-+.-+...-+.....-")
-        logger.debug(f"Instruction: func7.|rs2.|rs1.|3.|rd..|opcode|")
-        logger.debug(f"Instruction: {self.state.ID['Instr']:032b}")
+        if diagnostics.VERBOSE:
+            logger.debug(f"Instruction: +.....-+...-+...-+.-+...-+.....-")
+            logger.debug(f"Instruction: func7.|rs2.|rs1.|3.|rd..|opcode|")
+            logger.debug(f"Instruction: {self.state.ID.Instr:032b}")
 
         # --------------------- ID stage ---------------------
-        logger.debug(f"--------------------- ID stage ")
+        if diagnostics.VERBOSE:
+            logger.debug(f"--------------------- ID stage ")
 
-        opcode = self.state.ID["Instr"] & 0x7F
+        decoded = self.program.decode(program_counter, self.state.ID.Instr)
 
-        self.state.EX["nop"] = self.state.ID["nop"]
+        self.state.EX.nop = self.state.ID.nop
 
-        control_signals, halt = control_unit_for_single_stage(opcode)
+        control_signals, halt = decoded.single_stage_control_signals, decoded.halt
         if halt:
-            self.state.IF["nop"] = True
+            self.state.IF.nop = True
 
-        logger.debug(f"Control Signals: {control_signals}")
-        self.state.EX["alu_op"] = control_signals["ALUOp"]  # EX stage
-        self.state.EX["is_I_type"] = control_signals["ALUSrcB"]  # EX stage
+        if diagnostics.VERBOSE:
+            logger.debug(f"Control Signals: {control_signals}")
+        self.state.EX.alu_op = control_signals["ALUOp"]  # EX stage
+        self.state.EX.is_I_type = control_signals["ALUSrcB"]  # EX stage
         alu_src_a = control_signals["ALUSrcA"]
 
         branch = control_signals["Branch"]  # MEM stage, but not found for Single Stage Machine
         jal = control_signals["JAL"]
-        self.state.EX["rd_mem"] = control_signals["MemRead"]  # MEM stage
-        self.state.EX["wrt_mem"] = control_signals["MemWrite"]  # MEM stage
+        self.state.EX.rd_mem = control_signals["MemRead"]  # MEM stage
+        self.state.EX.wrt_mem = control_signals["MemWrite"]  # MEM stage
 
         mem_to_reg = control_signals["MemtoReg"]  # WB stage, but not found for Single Stage Machine
-        self.state.EX["wrt_enable"] = control_signals["RegWrite"]  # WB stage
+        self.state.EX.wrt_enable = control_signals["RegWrite"]  # WB stage
 
         # See comments in state.py to see more information
-        self.state.EX["Rs"] = (self.state.ID["Instr"] >> 15) & 0x1F  # bits [19:15]
-        self.state.EX["Rt"] = (self.state.ID["Instr"] >> 20) & 0x1F  # bits [24:20]
-        self.state.EX["Wrt_reg_addr"] = (self.state.ID["Instr"] >> 7) & 0x1F  # bits [11:7]
+        self.state.EX.Rs = decoded.rs1  # bits [19:15]
+        self.state.EX.Rt = decoded.rs2  # bits [24:20]
+        self.state.EX.Wrt_reg_addr = decoded.rd  # bits [11:7]
 
         # Ref: Comp.Org P.282.e5 Figure e4.5.4
-        self.state.EX["Read_data1"] = self.register_file.read(self.state.EX["Rs"])
-        self.state.EX["Read_data2"] = self.register_file.read(self.state.EX["Rt"])
+        self.state.EX.Read_data1 = self.register_file.read(self.state.EX.Rs)
+        self.state.EX.Read_data2 = self.register_file.read(self.state.EX.Rt)
 
-        # an always true condition so I can collapse the block
-        if logger.level("DEBUG"):
+        # the register table is only built in verbose mode
+        if diagnostics.VERBOSE:
             logger.opt(colors=True).info(
                 f"+-----------------------------+---------------------------------+-----------------------------+")
             logger.opt(colors=True).info(f"| Register      | Mem Addr  | \t\t\tValue Bin (Dec) \t\t  |")
             logger.opt(colors=True).info(
-                f"| Rs / Rd1      | {self.state.EX['Rs']:05b} ({self.state.EX['Rs']}) | {self.state.EX['Read_data1']:032b} ({self.state.EX['Read_data1']}) |")
+                f"| Rs / Rd1      | {self.state.EX.Rs:05b} ({self.state.EX.Rs}) | {self.state.EX.Read_data1:032b} ({self.state.EX.Read_data1}) |")
             logger.opt(colors=True).info(
-                f"| Rt / Rd2      | {self.state.EX['Rt']:05b} ({self.state.EX['Rt']}) | {self.state.EX['Read_data2']:032b} ({self.state.EX['Read_data2']}) |")
+                f"| Rt / Rd2      | {self.state.EX.Rt:05b} ({self.state.EX.Rt}) | {self.state.EX.Read_data2:032b} ({self.state.EX.Read_data2}) |")
             logger.opt(colors=True).info(
-                f"| Wrt_reg_addr  | {self.state.EX['Wrt_reg_addr']:05b} ({self.state.EX['Wrt_reg_addr']}) |")
+                f"| Wrt_reg_addr  | {self.state.EX.Wrt_reg_addr:05b} ({self.state.EX.Wrt_reg_addr}) |")
             logger.opt(colors=True).info(
                 f"+-----------------------------+---------------------------------+-----------------------------+")
 
         # Imm Gen
-        self.state.EX["Imm"] = imm_gen(opcode=opcode, instr=self.state.ID["Instr"])
-
-        func7_bit = (self.state.ID["Instr"] >> 30) & 0b1
-        func3 = (self.state.ID["Instr"] >> 12) & 0b111
-        alu_control_func_code = (func7_bit << 3) | func3
+        self.state.EX.Imm = decoded.imm
 
-        # special ALU handling, if I-type, omit the func7 bit
-        # I didn't find this in the book, without this, ALU cannot work on I-type
-        if opcode == 19:  # I-type
-            alu_control_func_code = alu_control_func_code & 0b111
+        # I-type already has the func7 bit omitted by the decoder
+        alu_control_func_code = decoded.alu_control_func
 
         # --------------------- EX stage ---------------------
-        logger.debug(f"--------------------- EX stage ")
+        if diagnostics.VERBOSE:
+            logger.debug(f"--------------------- EX stage ")
 
         # Passing data to subsequent pipeline registers
-        self.state.MEM["nop"] = self.state.EX["nop"]
-        self.state.MEM["Rs"] = self.state.EX["Rs"]
-        self.state.MEM["Rt"] = self.state.EX["Rt"]
-        self.state.MEM["Wrt_reg_addr"] = self.state.EX["Wrt_reg_addr"]
+        self.state.MEM.nop = self.state.EX.nop
+        self.state.MEM.Rs = self.state.EX.Rs
+        self.state.MEM.Rt = self.state.EX.Rt
+        self.state.MEM.Wrt_reg_addr = self.state.EX.Wrt_reg_addr
 
         # Passing control signal to subsequent pipeline registers
         # (see Comp.Org p.313 Figure 4.52)
-        self.state.MEM["rd_mem"] = self.state.EX["rd_mem"]
-        self.state.MEM["wrt_mem"] = self.state.EX["wrt_mem"]
-        self.state.MEM["wrt_enable"] = self.state.EX["wrt_enable"]
+        self.state.MEM.rd_mem = self.state.EX.rd_mem
+        self.state.MEM.wrt_mem = self.state.EX.wrt_mem
+        self.state.MEM.wrt_enable = self.state.EX.wrt_enable
 
-        alu_input_b = multiplexer(self.state.EX["is_I_type"],
-                                  self.state.EX["Read_data2"],
+        alu_input_b = multiplexer(self.state.EX.is_I_type,
+                                  self.state.EX.Read_data2,
                                   4,
-                                  self.state.EX["Imm"])  # extract the least significant bit
+                                  self.state.EX.Imm)  # extract the least significant bit
 
-        alu_input_a = multiplexer(alu_src_a, self.state.EX["Read_data1"], program_counter)
+        alu_input_a = multiplexer(alu_src_a, self.state.EX.Read_data1, program_counter)
 
         # ALUOp 2-bit, generated from the Main Control Unit
         # indicates whether the operation to be performed should be
         # add (00) for loads and stores, subtract and
         # test if zero (01) for beq, or
         # be determined by the operation encoded in the funct7 and funct3 fields (10).
-        alu_control = alu_control_unit(self.state.EX["alu_op"],
-                                       alu_control_func_code)
+        alu_control = decoded.alu_control
 
         # ALU control 4-bit
-        zero, self.state.MEM["ALUresult"] = arithmetic_logic_unit(
+        zero, self.state.MEM.ALUresult = arithmetic_logic_unit(
             alu_control=alu_control,
             a=alu_input_a,
             b=alu_input_b)
 
-        bne_func = (alu_control_func_code & 0x1)
-        logger.debug(f"PC Handling debug: alu_control_func_code: {alu_control_func_code}, bne_func: {bne_func}")
+        bne_func = decoded.bne_func
+        if diagnostics.VERBOSE:
+            logger.debug(f"PC Handling debug: alu_control_func_code: {alu_control_func_code}, bne_func: {bne_func}")
 
         # PC handling
-        ex_pc_adder_result = adder(program_counter, self.state.EX["Imm"])
+        ex_pc_adder_result = adder(program_counter, self.state.EX.Imm)
         # Branch handling, BEQ, BNE handling, JAL handling
         pc_src = or_gate(jal, and_gate(branch, xor_gate(zero, bne_func)))
-        logger.debug(f"PC Handling debug: pc_src: {pc_src}, branch: {branch}, zero: {zero}, bne_func: {bne_func}")
+        if diagnostics.VERBOSE:
+            logger.debug(f"PC Handling debug: pc_src: {pc_src}, branch: {branch}, zero: {zero}, bne_func: {bne_func}")
         program_counter = multiplexer(pc_src, if_pc_adder_result, ex_pc_adder_result)
-        logger.debug(f"PC Handling debug: PC: {program_counter}")
+        if diagnostics.VERBOSE:
+            logger.debug(f"PC Handling debug: PC: {program_counter}")
 
         # --------------------- MEM stage --------------------
-        logger.debug(f"--------------------- MEM stage ")
+        if diagnostics.VERBOSE:
+            logger.debug(f"--------------------- MEM stage ")
 
         # Passing data to subsequent pipeline registers
-        self.state.WB["nop"] = self.state.MEM["nop"]
-        self.state.WB["Wrt_data"] = self.state.MEM["ALUresult"]
-        self.state.WB["Rs"] = self.state.MEM["Rs"]
-        self.state.WB["Rt"] = self.state.MEM["Rt"]
+        self.state.WB.nop = self.state.MEM.nop
+        self.state.WB.Wrt_data = self.state.MEM.ALUresult
+        self.state.WB.Rs = self.state.MEM.Rs
+        self.state.WB.Rt = self.state.MEM.Rt
 
         # Passing control signal to subsequent pipeline registers
         # (see Comp.Org p.313 Figure 4.52)
-        self.state.WB["Wrt_reg_addr"] = self.state.MEM["Wrt_reg_addr"]
-        self.state.WB["wrt_enable"] = self.state.MEM["wrt_enable"]
+        self.state.WB.Wrt_reg_addr = self.state.MEM.Wrt_reg_addr
+        self.state.WB.wrt_enable = self.state.MEM.wrt_enable
 
         # Data Memory Unit
-        if self.state.MEM["wrt_mem"] == 1:
-            logger.debug("Write data")
-            self.ext_data_memory.write(self.state.MEM["ALUresult"], self.state.EX["Read_data2"])
+        if self.state.MEM.wrt_mem == 1:
+            if diagnostics.VERBOSE:
+                logger.debug("Write data")
+            self.ext_data_memory.write(self.state.MEM.ALUresult, self.state.EX.Read_data2)
         data_memory_output = None  # not found in state machine
-        if self.state.MEM["rd_mem"] == 1:
-            logger.debug("Read data")
-            data_memory_output = self.ext_data_memory.read(self.state.MEM["ALUresult"])
+        if self.state.MEM.rd_mem == 1:
+            if diagnostics.VERBOSE:
+                logger.debug("Read data")
+            data_memory_output = self.ext_data_memory.read(self.state.MEM.ALUresult)
 
         # --------------------- WB stage ---------------------
-        logger.debug(f"--------------------- WB stage ")
+        if diagnostics.VERBOSE:
+            logger.debug(f"--------------------- WB stage ")
 
-        self.state.WB["Wrt_data"] = multiplexer(mem_to_reg, self.state.WB["Wrt_data"], data_memory_output)
+        self.state.WB.Wrt_data = multiplexer(mem_to_reg, self.state.WB.Wrt_data, data_memory_output)
 
-        if self.state.WB["wrt_enable"] == 1:
-            self.register_file.write(self.state.WB["Wrt_reg_addr"], self.state.WB["Wrt_data"])
+        if self.state.WB.wrt_enable == 1:
+            self.register_file.write(self.state.WB.Wrt_reg_addr, self.state.WB.Wrt_data)
 
-        if not self.state.IF["nop"]:
-            self.next_state.IF["PC"] = program_counter
+        if not self.state.IF.nop:
+            self.next_state.IF.PC = program_counter
         else:
             # When nop, keep PC unchanged
-            self.next_state.IF["PC"] = self.state.IF["PC"]
+            self.next_state.IF.PC = self.state.IF.PC
 
         # ----------------------- End ------------------------
-        logger.opt(colors=True).debug(f"<green>-------------------- stage end ---------------------</green>")
-        logger.opt(colors=True).info(
-            f"<green>-------------- ↑ {self.cycle} cycle |  {self.cycle + 1} cycle ↓ --------------</green>")
-        logger.opt(colors=True).debug(f"<green>-------------------- stage end ---------------------</green>")
+        if diagnostics.VERBOSE:
+            logger.opt(colors=True).debug(f"<green>-------------------- stage end ---------------------</green>")
+            logger.opt(colors=True).info(
+                f"<green>-------------- ↑ {self.cycle} cycle |  {self.cycle + 1} cycle ↓ --------------</green>")
+            logger.opt(colors=True).debug(f"<green>-------------------- stage end ---------------------</green>")
 
         # self.halted = True
-        # if self.state.IF["nop"]:
+        # if self.state.IF.nop:
         #     self.halted = True
-        if self.state.WB["nop"]:
+        if self.state.WB.nop:
             self.halted = True
 
-        self.register_file.output(self.cycle)  # dump RF
-        self.print_state(self.next_state, self.cycle)  # print states after executing cycle 0, cycle 1, cycle 2 ...
+        if self.trace_policy.traces_register_file(self.cycle, self.halted):
+            self.register_file.output(self.cycle)  # dump RF
+        if self.trace_policy.traces(self.cycle):
+            self.print_state(self.next_state, self.cycle)  # print states after executing cycle 0, cycle 1, cycle 2 ...
 
         # The end of the cycle
         # and updates the current state with the values calculated in this cycle
         self.state = self.next_state
         self.cycle += 1
 
+        if self.halted:
+            self.close()
+
     def print_state(self, state, cycle):
         """
         Print the state of the processor after each cycle.
@@ -242,15 +299,202 @@ class SingleStageCore(Core):
             cycle (int): The current cycle number.
         """
         printstate = ["-" * 70 + "\n", "State after executing cycle: " + str(cycle) + "\n"]
-        printstate.append("IF.PC: " + str(state.IF["PC"]) + "\n")
-        printstate.append("IF.nop: " + str(state.IF["nop"]) + "\n")
+        printstate.append("IF.PC: " + str(state.IF.PC) + "\n")
+        printstate.append("IF.nop: " + str(state.IF.nop) + "\n")
 
-        if (cycle == 0):
-            perm = "w"
-        else:
-            perm = "a"
-        with open(self.op_file_path, perm) as wf:
-            wf.writelines(printstate)
+        self.state_trace.write(printstate)
+
+
+class FunctionalCore(Core):
+    """
+    FunctionalCore executes the program purely architecturally, one instruction per step.
+
+    There are no pipeline registers and no datapath components: each instruction reads the
+    register file, computes its result and updates the register file, the data memory and the PC.
+    The semantics are exactly those of SingleStageCore, so the final data memory and register
+    file match it, which makes this core a fast golden model for the other two.
+
+    By default `run` executes whole basic blocks, translated once into Python functions by a
+    BlockCache, and only interprets instruction by instruction where a block would run past
+    `max_instructions` or `stop_pc`.
+    """
+
+    def __init__(self, io_dir, instruction_memory, data_memory, flush_interval=DEFAULT_FLUSH_INTERVAL,
+                 trace_policy=None, block_cache=True):
+        """
+        Initialize the FunctionalCore.
+
+        Args:
+            io_dir (Path): Directory for input/output files.
+            instruction_memory (InstructionMemory): The instruction memory.
+            data_memory (DataMemory): The data memory.
+            flush_interval (int): Number of cycles buffered by the trace writers before writing.
+            trace_policy (TracePolicy): Unused, only the final register file is dumped.
+            block_cache (bool): Execute translated basic blocks, False interprets every instruction.
+        """
+        super(FunctionalCore, self).__init__(io_dir / "FN_", instruction_memory, data_memory, flush_interval,
+                                             trace_policy)
+        self.blocks = BlockCache(instruction_memory, self.program) if block_cache else None
+        self.pc = 0
+        self.retired = 0
+        """ Number of executed instructions, HALT included (as in the single stage metrics) """
+
+    def step(self):
+        """
+        Execute one instruction.
+        """
+        self.run(max_instructions=self.retired + 1)
+
+    def load_architectural_state(self, registers, pc):
+        self.register_file.Registers[:] = registers
+        self.pc = pc
+
+    def run(self, max_instructions=None, stop_pc=None):
+        """
+        Execute instructions until HALT, until `max_instructions` have retired in total,
+        or until the PC reaches `stop_pc`.
+
+        Args:
+            max_instructions (int): Stop once this many instructions have retired, None runs to HALT.
+            stop_pc (int): Stop before executing the instruction at this address, None runs to HALT.
+        """
+        regs = self.register_file.Registers
+        program = self.program
+        data_memory = self.ext_data_memory
+        blocks = self.blocks
+        read, write = data_memory.read, data_memory.write
+        pc = self.pc
+        retired = self.retired
+        limit = max_instructions if max_instructions is not None else -1
+
+        while not self.halted and retired != limit and pc != stop_pc:
+            if blocks is not None:
+                block = blocks.lookup(pc)
+                # Run the whole block unless it would overshoot a stop condition, then interpret the tail
+                if (limit < 0 or retired + block.length <= limit) and not block.contains(stop_pc):
+                    pc, halted = block.function(regs, read, write)
+                    retired += block.length
+                    if halted:
+                        self.halted = True
+                    continue
+
+            decoded = program.at(pc)
+            opcode = decoded.opcode
+            retired += 1
+            next_pc = (pc + 4) & 0xFFFFFFFF
+
+            if opcode == 0b0110011:  # R-type
+                result = ALU_OPERATIONS.get(decoded.alu_control, _alu_zero)(regs[decoded.rs1], regs[decoded.rs2])
+                if decoded.rd:
+                    regs[decoded.rd] = result & 0xFFFFFFFF
+            elif opcode == 0b0010011:  # I-type
+                result = ALU_OPERATIONS.get(decoded.alu_control, _alu_zero)(regs[decoded.rs1], decoded.imm)
+                if decoded.rd:
+                    regs[decoded.rd] = result & 0xFFFFFFFF
+            elif opcode == 0b0000011:  # Load
+                data = data_memory.read((regs[decoded.rs1] + decoded.imm) & 0xFFFFFFFF)
+                if decoded.rd:
+                    regs[decoded.rd] = data
+            elif opcode == 0b0100011:  # Store
+                data_memory.write((regs[decoded.rs1] + decoded.imm) & 0xFFFFFFFF, regs[decoded.rs2])
+            elif opcode == 0b1100011:  # Branch, BEQ / BNE
+                zero = ((regs[decoded.rs1] - regs[decoded.rs2]) & 0xFFFFFFFF) == 0
+                if zero ^ decoded.bne_func:
+                    next_pc = (pc + decoded.imm) & 0xFFFFFFFF
+            elif opcode == 0b1101111:  # JAL, the link value goes through the ALU as PC op 4
+                result = ALU_OPERATIONS.get(decoded.alu_control, _alu_zero)(pc, 4)
+                if decoded.rd:
+                    regs[decoded.rd] = result & 0xFFFFFFFF
+                next_pc = (pc + decoded.imm) & 0xFFFFFFFF
+            elif decoded.halt:
+                self.halted = True
+                next_pc = pc
+
+            pc = next_pc
+
+        self.pc = pc
+        self.retired = retired
+        self.cycle = retired
+
+        if self.halted:
+            self.register_file.output(self.cycle)  # dump the final RF, labelled like the single stage core
+            self.close()
+
+
+def _alu_zero(a, b):
+    return 0
+
+
+ALU_OPERATIONS = {
+    0b0000: lambda a, b: a & b,
+    0b0001: lambda a, b: a | b,
+    0b0010: lambda a, b: a + b,
+    0b0110: lambda a, b: a - b,
+    0b0111: lambda a, b: a ^ b,
+    0b1100: lambda a, b: ~(a | b),
+}
+""" ALU control code -> operation, the same table as arithmetic_logic_unit (undefined codes give 0) """
+
+
+def format_binary(val, bits=32):
+    """Format the value as a binary string and pad it to the specified length."""
+    if isinstance(val, int):
+        return f"{val:0{bits}b}"
+    return str(val)
+
+
+def format_pipeline_registers(IF, ID, EX, MEM, WB) -> dict:
+    """
+    The fields of the five stage pipeline registers printed to StateResult_FS.txt, formatted as required.
+
+    Args:
+        IF (IFRegister): The IF register.
+        ID (IDRegister): The IF/ID register.
+        EX (EXRegister): The ID/EX register.
+        MEM (MEMRegister): The EX/MEM register.
+        WB (WBRegister): The MEM/WB register.
+
+    Returns:
+        dict[str, dict[str, str]]: {stage: {field: formatted value}}, in print order.
+    """
+    return {
+        "IF": {"nop": IF.nop, "PC": IF.PC},
+        "ID": {"nop": ID.nop, "Instr": format_binary(ID.Instr)},
+        "EX": {
+            "nop": EX.nop,
+            "instr": format_binary(EX.instr),
+            "Read_data1": format_binary(EX.Read_data1),
+            "Read_data2": format_binary(EX.Read_data2),
+            "Imm": format_binary(EX.Imm, 12),
+            "Rs": format_binary(EX.Rs, 5),
+            "Rt": format_binary(EX.Rt, 5),
+            "Wrt_reg_addr": format_binary(EX.Wrt_reg_addr, 5),
+            "is_I_type": EX.is_I_type,
+            "rd_mem": EX.rd_mem,
+            "wrt_mem": EX.wrt_mem,
+            "alu_op": format_binary(EX.alu_op, 2),
+            "wrt_enable": EX.wrt_enable,
+        },
+        "MEM": {
+            "nop": MEM.nop,
+            "ALUresult": format_binary(MEM.ALUresult),
+            "Store_data": format_binary(MEM.Store_data),
+            "Rs": format_binary(MEM.Rs, 5),
+            "Rt": format_binary(MEM.Rt, 5),
+            "Wrt_reg_addr": format_binary(MEM.Wrt_reg_addr, 5),
+            "rd_mem": MEM.rd_mem,
+            "wrt_mem": MEM.wrt_mem,
+            "wrt_enable": MEM.wrt_enable,
+        },
+        "WB": {
+            "nop": WB.nop,
+            "Wrt_data": format_binary(WB.Wrt_data),
+            "Rs": format_binary(WB.Rs, 5),
+            "Rt": format_binary(WB.Rt, 5),
+            "Wrt_reg_addr": format_binary(WB.Wrt_reg_addr, 5),
+            "wrt_enable": WB.wrt_enable,
+        },
+    }
 
 
 class FiveStageCore(Core):
@@ -259,45 +503,66 @@ class FiveStageCore(Core):
     pc_src = 0
     halt_detected = False
 
-    def __init__(self, io_dir, instruction_memory, data_memory):
-        super(FiveStageCore, self).__init__(io_dir / "FS_", instruction_memory, data_memory)
+    def __init__(self, io_dir, instruction_memory, data_memory, flush_interval=DEFAULT_FLUSH_INTERVAL,
+                 trace_policy=None, branch_predictor=None, instruction_cache=None, data_cache=None):
+        super(FiveStageCore, self).__init__(io_dir / "FS_", instruction_memory, data_memory, flush_interval,
+                                            trace_policy)
         self.state = State()
         self.next_state = State()
         self.opFilePath = io_dir / "StateResult_FS.txt"
+        self.state_trace = TraceWriter(self.opFilePath, flush_interval)
+        self.retired = 0
+        """ Number of completed instructions: BEQ/BNE complete in ID, the others in WB. HALT is never issued """
+        self.counters = PerformanceCounters()
+        """ Stall, flush, drain and forwarding counts """
+        self.predictor = branch_predictor if branch_predictor is not None else StaticNotTaken()
+        """ Chooses the next fetch address in IF, a wrong guess is flushed when ID resolves the instruction """
+        self.instruction_cache = instruction_cache
+        """ Cache timing model in front of the instruction memory, None for an ideal single cycle memory """
+        self.data_cache = data_cache
+        """ Cache timing model in front of the data memory, None for an ideal single cycle memory """
+        self.memory_stall = 0
+        """ Cycles the pipeline stays frozen until the pending cache miss is served """
 
     def step(self):
         # Set the nop states based on the cycle number, REQUIRED by the assignment
         self.set_init_nop_state()
 
+        if self.memory_stall:
+            self.memory_stall_cycle()
+            return
+
         if (self.halt_detected and
-                self.state.ID["nop"] and
-                self.state.EX["nop"] and
-                self.state.MEM["nop"] and
-                self.state.WB["nop"]):
+                self.state.ID.nop and
+                self.state.EX.nop and
+                self.state.MEM.nop and
+                self.state.WB.nop):
             self.halted = True
+        if self.halt_detected:
+            self.counters.drain_cycles += 1
         # Your implementation
         # --------------------- WB stage ---------------------
 
         self.wb_stage()
-        self.next_state.WB["nop"] = self.update_nop_state(prev_stage_nop=self.state.MEM["nop"],
+        self.next_state.WB.nop = self.update_nop_state(prev_stage_nop=self.state.MEM.nop,
                                                           halt_detected=self.halt_detected)
 
         # --------------------- MEM stage --------------------
 
         self.mem_stage()
-        self.next_state.MEM["nop"] = self.update_nop_state(prev_stage_nop=self.state.EX["nop"],
+        self.next_state.MEM.nop = self.update_nop_state(prev_stage_nop=self.state.EX.nop,
                                                            halt_detected=self.halt_detected)
 
         # --------------------- EX stage ---------------------
 
         self.ex_stage()
-        self.next_state.EX["nop"] = self.update_nop_state(prev_stage_nop=self.state.ID["nop"],
+        self.next_state.EX.nop = self.update_nop_state(prev_stage_nop=self.state.ID.nop,
                                                           halt_detected=self.halt_detected)
 
         # --------------------- ID stage ---------------------
 
         self.id_stage()
-        self.next_state.ID["nop"] = self.update_nop_state(prev_stage_nop=self.state.IF["nop"],
+        self.next_state.ID.nop = self.update_nop_state(prev_stage_nop=self.state.IF.nop,
                                                           halt_detected=self.halt_detected)
 
         # --------------------- IF stage ---------------------
@@ -305,374 +570,462 @@ class FiveStageCore(Core):
         # Only fetch new instructions if HALT hasn't been detected
         if not self.halt_detected:
             self.if_stage()
-            logger.info(f"next_state: {self.next_state.IF}")
+            if diagnostics.VERBOSE:
+                logger.info(f"next_state: {self.next_state.IF}")
         else:
-            logger.warning(f"IF stage No Operation")
-            self.next_state.IF["nop"] = True
+            if diagnostics.VERBOSE:
+                logger.warning(f"IF stage No Operation")
+            self.next_state.IF.nop = True
 
         # ----------------------- End ------------------------
 
-        logger.opt(colors=True).debug(f"<green>-------------------- stage end ---------------------</green>")
-        logger.opt(colors=True).info(
-            f"<green>-------------- ↑ {self.cycle} cycle |  {self.cycle + 1} cycle ↓ --------------</green>")
-        logger.opt(colors=True).debug(f"<green>-------------------- stage end ---------------------</green>")
+        if diagnostics.VERBOSE:
+            logger.opt(colors=True).debug(f"<green>-------------------- stage end ---------------------</green>")
+            logger.opt(colors=True).info(
+                f"<green>-------------- ↑ {self.cycle} cycle |  {self.cycle + 1} cycle ↓ --------------</green>")
+            logger.opt(colors=True).debug(f"<green>-------------------- stage end ---------------------</green>")
+
+        if self.trace_policy.traces_register_file(self.cycle, self.halted):
+            self.register_file.output(self.cycle)  # dump RF
 
-        self.register_file.output(self.cycle)  # dump RF
+        # Latch: copy the next state into the current pipeline registers in place
+        self.state.latch(self.next_state)
+        if self.trace_policy.traces(self.cycle):
+            self.printState(self.state, self.cycle)  # print states after executing cycle 0, cycle 1, cycle 2 ...
 
-        self.state = copy.deepcopy(self.next_state)
-        self.printState(self.state, self.cycle)  # print states after executing cycle 0, cycle 1, cycle 2 ...
+        self.cycle += 1
+
+        if self.halted:
+            self.close()
 
+    def memory_stall_cycle(self):
+        """
+        A cycle spent waiting for a cache miss: every pipeline register holds its value.
+        """
+        self.memory_stall -= 1
+        self.counters.memory_stall_cycles += 1
+        if diagnostics.VERBOSE:
+            logger.warning(f"Cache miss, pipeline stalled ({self.memory_stall} cycles left)")
+        if self.trace_policy.traces_register_file(self.cycle, self.halted):
+            self.register_file.output(self.cycle)
+        if self.trace_policy.traces(self.cycle):
+            self.printState(self.state, self.cycle)
         self.cycle += 1
 
     def if_stage(self):
-        logger.debug(f"--------------------- IF stage ")
-        logger.info(f"state: {self.state.IF}")
+        if diagnostics.VERBOSE:
+            logger.debug(f"--------------------- IF stage ")
+            logger.info(f"state: {self.state.IF}")
 
         """Condition Handlers, will not fetch instruction"""
         # When branch is taken, flush IF
-        if self.state.IF["Flush"]:
-            logger.warning(f"IF stage detected branch, Flush")
-            self.next_state.ID["nop"] = True
+        if self.state.IF.Flush:
+            if diagnostics.VERBOSE:
+                logger.warning(f"IF stage detected branch, Flush")
+            self.next_state.ID.nop = True
             return
 
         # Conform to the assignment hidden requirements
         # HALT the machine when the instruction is 0xFFFFFFFF
-        if (self.ext_instruction_memory.read(self.state.IF["PC"]) == 0b11111111111111111111111111111111
-                and not self.next_state.IF["PCSrc"]):
+        if (self.program.fetch(self.state.IF.PC) == 0b11111111111111111111111111111111
+                and not self.next_state.IF.PCSrc):
             self.halt_detected = True
-            self.next_state.IF["nop"] = True
-            self.next_state.ID["nop"] = True
-            logger.warning(f"HALT detected")
+            self.next_state.IF.nop = True
+            self.next_state.ID.nop = True
+            if diagnostics.VERBOSE:
+                logger.warning(f"HALT detected")
             return
 
-        if self.state.IF["nop"]:
-            logger.warning(f"IF stage No Operation")
+        if self.state.IF.nop:
+            if diagnostics.VERBOSE:
+                logger.warning(f"IF stage No Operation")
             return
 
         """Decide which PC to use"""
 
         # Decide PC depends on whether Branch happen (PCSrc=1) or not
-        self.state.IF["PC"] = multiplexer(self.next_state.IF["PCSrc"],
-                                          self.state.IF["PC"],
-                                          self.next_state.IF["BranchPC"])
+        self.state.IF.PC = multiplexer(self.next_state.IF.PCSrc,
+                                          self.state.IF.PC,
+                                          self.next_state.IF.BranchPC)
 
-        logger.info(f"PC: {self.state.IF["PC"]}")
+        if diagnostics.VERBOSE:
+            logger.info(f"PC: {self.state.IF.PC}")
 
         # Basically a MUX but lazy version
         # if Hazard happen (IFIDWrite=0), the Instr is not updated
-        if self.next_state.IF["IFIDWrite"]:
-            self.next_state.ID["Instr"] = self.ext_instruction_memory.read(self.state.IF["PC"])
-            self.next_state.ID["PC"] = self.state.IF["PC"]
+        if self.next_state.IF.IFIDWrite:
+            self.next_state.ID.Instr = self.program.fetch(self.state.IF.PC)
+            self.next_state.ID.PC = self.state.IF.PC
+            if self.instruction_cache is not None:
+                self.memory_stall = max(self.memory_stall, self.instruction_cache.access(self.state.IF.PC))
         else:
-            logger.warning(f"Hazard happen (IFIDWrite=0), Instruction not updated")
-            self.next_state.ID["Instr"] = self.state.ID["Instr"]
-            self.next_state.ID["PC"] = self.state.ID["PC"]
+            if diagnostics.VERBOSE:
+                logger.warning(f"Hazard happen (IFIDWrite=0), Instruction not updated")
+            self.next_state.ID.Instr = self.state.ID.Instr
+            self.next_state.ID.PC = self.state.ID.PC
+            self.next_state.ID.PredictedPC = self.state.ID.PredictedPC
 
-        self.logger_instruction()
+        if diagnostics.VERBOSE:
+            self.logger_instruction()
 
         """Next PC"""
         # Decide PC depends on whether Hazard happen (PCWrite=0) or not
         # if PCWrite is 0, the PC is not updated
-        if_stage_pc_result = multiplexer(self.next_state.IF["PCWrite"],
-                                         self.state.IF["PC"],
-                                         adder(4, self.state.IF["PC"]))
-        self.next_state.IF["PC"] = if_stage_pc_result
-        logger.debug(f"PC Handling debug: Next PC: {self.next_state.IF["PC"]}")
+        if_stage_pc_result = multiplexer(self.next_state.IF.PCWrite,
+                                         self.state.IF.PC,
+                                         adder(4, self.state.IF.PC))
+        if self.next_state.IF.PCWrite:
+            # The branch predictor may redirect the fetch, ID checks the guess when it resolves this instruction
+            predicted_pc = self.predictor.predict(self.state.IF.PC)
+            if predicted_pc is not None:
+                if_stage_pc_result = predicted_pc
+            self.next_state.ID.PredictedPC = if_stage_pc_result
+        self.next_state.IF.PC = if_stage_pc_result
+        if diagnostics.VERBOSE:
+            logger.debug(f"PC Handling debug: Next PC: {self.next_state.IF.PC}")
 
     def id_stage(self):
-        logger.debug(f"--------------------- ID stage ")
-        logger.info(f"state: {self.state.ID}")
-        logger.info(f"next_state: {self.next_state.ID}")
-        if self.state.ID["nop"]:
-            logger.warning(f"ID stage No Operation")
+        if diagnostics.VERBOSE:
+            logger.debug(f"--------------------- ID stage ")
+            logger.info(f"state: {self.state.ID}")
+            logger.info(f"next_state: {self.next_state.ID}")
+        if self.state.ID.nop:
+            if diagnostics.VERBOSE:
+                logger.warning(f"ID stage No Operation")
 
             # Zero out the Register File output
-            self.next_state.EX = {key: 0 for key in self.next_state.EX}
-            self.next_state.EX["nop"] = True
-            self.state.IF["BranchPC"] = 0
-            self.state.IF["PCSrc"] = 0
+            self.next_state.EX.clear()
+            self.next_state.EX.nop = True
+            self.state.IF.BranchPC = 0
+            self.state.IF.PCSrc = 0
             return
 
         # This will stop the stage in the next cycle
-        if self.state.IF["nop"] and self.halt_detected:
-            self.next_state.ID["nop"] = True
+        if self.state.IF.nop and self.halt_detected:
+            self.next_state.ID.nop = True
 
         """Instruction Fields Extracting"""
-        opcode = self.state.ID["Instr"] & 0x7F
-        # See comments in state.py to see more information
-        rs1 = (self.state.ID["Instr"] >> 15) & 0x1F  # bits [19:15]
-        rs2 = (self.state.ID["Instr"] >> 20) & 0x1F  # bits [24:20]
-
-        # Instruction [30, 14-12] handling
-        func7_bit = (self.state.ID["Instr"] >> 30) & 0b1
-        func3 = (self.state.ID["Instr"] >> 12) & 0b111
-        alu_control_func_code = (func7_bit << 3) | func3
-
-        write_register = (self.state.ID["Instr"] >> 7) & 0x1F  # bits [11:7]
+        # Fields, immediate and control signals come from the decode-once program table
+        decoded = self.program.decode(self.state.ID.PC, self.state.ID.Instr)
+        opcode = decoded.opcode
+        rs1 = decoded.rs1  # bits [19:15]
+        rs2 = decoded.rs2  # bits [24:20]
+        write_register = decoded.rd  # bits [11:7]
 
         """Forward to next pipeline register"""
-        self.next_state.EX["Rs"] = rs1
-        self.next_state.EX["Rt"] = rs2
+        self.next_state.EX.Rs = rs1
+        self.next_state.EX.Rt = rs2
         # According to the assignment testcase, the naming IS MEANT TO BE DIFFERENT
-        self.next_state.EX["instr"] = self.state.ID["Instr"]
+        self.next_state.EX.instr = self.state.ID.Instr
 
         """Hazard Detection Unit"""
         # todo: IF["PCWrite"] and IF["IFIDWrite"] would be identical, maybe we can merge them
-        self.next_state.IF["PCWrite"], self.next_state.IF["IFIDWrite"], stall = hazard_detection_unit(self.next_state)
+        self.next_state.IF.PCWrite, self.next_state.IF.IFIDWrite, stall = hazard_detection_unit(self.next_state)
 
         # Forward to next pipeline register AFTER hazard detection unit
-        self.next_state.EX["Wrt_reg_addr"] = write_register
+        self.next_state.EX.Wrt_reg_addr = write_register
 
         """Control Signal mapping"""
-        control_signals, halt = control_unit(opcode)
+        control_signals, halt = decoded.control_signals, decoded.halt
         if halt:
             self.halt_detected = True
-            self.next_state.IF["nop"] = True
+            self.next_state.IF.nop = True
 
         # Mux after Control Unit
         if stall:
-            self.next_state.EX["nop"] = True
-            self.next_state.EX["alu_op"] = 0
-            self.next_state.EX["is_I_type"] = 0
+            self.counters.load_use_stall_cycles += 1
+            self.next_state.EX.nop = True
+            self.next_state.EX.alu_op = 0
+            self.next_state.EX.alu_control = 0b0010  # ALUOp 00 selects add
+            self.next_state.EX.is_I_type = 0
             branch = 0
             jal = 0
-            self.next_state.EX["rd_mem"] = 0
-            self.next_state.EX["wrt_mem"] = 0
-            self.next_state.EX["mem_to_reg"] = 0
-            self.next_state.EX["wrt_enable"] = 0
+            self.next_state.EX.rd_mem = 0
+            self.next_state.EX.wrt_mem = 0
+            self.next_state.EX.mem_to_reg = 0
+            self.next_state.EX.wrt_enable = 0
         else:
-            logger.debug(f"Control Signals: {control_signals}")
-            self.next_state.EX["alu_op"] = control_signals["ALUOp"]  # EX stage
-            self.next_state.EX["is_I_type"] = control_signals["ALUSrcB"]  # EX stage
+            if diagnostics.VERBOSE:
+                logger.debug(f"Control Signals: {control_signals}")
+            self.next_state.EX.alu_op = control_signals["ALUOp"]  # EX stage
+            self.next_state.EX.alu_control = decoded.alu_control  # EX stage
+            self.next_state.EX.is_I_type = control_signals["ALUSrcB"]  # EX stage
             branch = control_signals[
                 "Branch"]
             jal = control_signals["JAL"]
-            self.next_state.EX["rd_mem"] = control_signals["MemRead"]  # MEM stage
-            self.next_state.EX["wrt_mem"] = control_signals["MemWrite"]  # MEM stage
-            self.next_state.EX["mem_to_reg"] = control_signals[
+            self.next_state.EX.rd_mem = control_signals["MemRead"]  # MEM stage
+            self.next_state.EX.wrt_mem = control_signals["MemWrite"]  # MEM stage
+            self.next_state.EX.mem_to_reg = control_signals[
                 "MemtoReg"]  # WB stage, but not found for Single Stage Machine
-            self.next_state.EX["wrt_enable"] = control_signals["RegWrite"]  # WB stage
+            self.next_state.EX.wrt_enable = control_signals["RegWrite"]  # WB stage
 
-        self.next_state.EX["PC"] = self.state.ID["PC"]
+        # A stall bubble is not an instruction, neither is the reset value ID holds at cycle 0, nor a HALT
+        # that reached ID because it was fetched by a redirect
+        self.next_state.EX.valid = int(not stall and not halt and self.cycle > 0)
+        self.next_state.EX.PC = self.state.ID.PC
 
         """Register File"""
         # Ref: Comp.Org P.282.e5 Figure e4.5.4
-        self.next_state.EX["Read_data1"] = self.register_file.read(rs1)
-        self.next_state.EX["Read_data2"] = self.register_file.read(rs2)
+        self.next_state.EX.Read_data1 = self.register_file.read(rs1)
+        self.next_state.EX.Read_data2 = self.register_file.read(rs2)
 
         """Imm Gen"""
-        imm_gen_result = imm_gen(opcode=opcode, instr=self.next_state.EX["instr"])
-        self.next_state.EX["Imm"] = imm_gen_result
-        # special ALU handling, if I-type, omit the func7 bit
-        # I didn't find this in the book, without this, ALU cannot work on I-type
-        if opcode == 19:  # I-type
-            alu_control_func_code = alu_control_func_code & 0b111
-        # todo: see if we can merge the two if statements
+        imm_gen_result = decoded.imm
+        self.next_state.EX.Imm = imm_gen_result
+        # I-type already has the func7 bit omitted by the decoder
+        alu_control_func_code = decoded.alu_control_func
         if opcode == 19 or opcode == 3:
-            self.next_state.EX["Rt"] = 0  # I-type doesn't have Rt (prevent problem from hazard detection unit)
+            self.next_state.EX.Rt = 0  # I-type doesn't have Rt (prevent problem from hazard detection unit)
 
         # the function code to determine if the instruction is a BEQ or BNE
-        bne_func = (alu_control_func_code & 0x1)
-        self.next_state.EX["alu_control_func"] = alu_control_func_code
-        logger.debug(
-            f"PC Handling debug: alu_control_func_code: {alu_control_func_code}, bne_func: {bne_func}")
+        bne_func = decoded.bne_func
+        self.next_state.EX.alu_control_func = alu_control_func_code
+        if diagnostics.VERBOSE:
+            logger.debug(
+                f"PC Handling debug: alu_control_func_code: {alu_control_func_code}, bne_func: {bne_func}")
 
-        self.logger_data_memory_result()
+        if diagnostics.VERBOSE:
+            self.logger_data_memory_result()
 
         """Branch condition"""
         # PC adder
-        self.next_state.IF["BranchPC"] = adder(self.state.ID["PC"], imm_gen_result)
+        self.next_state.IF.BranchPC = adder(self.state.ID.PC, imm_gen_result)
 
         # Use forwarding unit to determine source for Rs1 and Rs2
         forward_a, forward_b = forwarding_unit_for_branch(rs1, rs2, self.state, self.next_state)
-        logger.debug(f"Branch forwarding debug: forward_a: {forward_a}, forward_b: {forward_b}")
+        if diagnostics.VERBOSE:
+            logger.debug(f"Branch forwarding debug: forward_a: {forward_a}, forward_b: {forward_b}")
 
         # Get the operand values for the branch instruction
         branch_operand_a = multiplexer(forward_a,
-                                       self.next_state.EX["Read_data1"],  # 00: from Register File
-                                       self.next_state.WB["Wrt_data"],  # 01: from MEM/WB
-                                       self.next_state.MEM["ALUresult"])  # 10: from EX/MEM
+                                       self.next_state.EX.Read_data1,  # 00: from Register File
+                                       self.next_state.WB.Wrt_data,  # 01: from MEM/WB
+                                       self.next_state.MEM.ALUresult)  # 10: from EX/MEM
         branch_operand_b = multiplexer(forward_b,
-                                       self.next_state.EX["Read_data2"],
-                                       self.next_state.WB["Wrt_data"],
-                                       self.next_state.MEM["ALUresult"])
+                                       self.next_state.EX.Read_data2,
+                                       self.next_state.WB.Wrt_data,
+                                       self.next_state.MEM.ALUresult)
 
         # Determine if the branch is taken (used to be ALUZero)
-        logger.debug(
-            f"Branch Handling debug: branch_operand_a: {branch_operand_a}, branch_operand_b: {branch_operand_b}")
+        if diagnostics.VERBOSE:
+            logger.debug(
+                f"Branch Handling debug: branch_operand_a: {branch_operand_a}, branch_operand_b: {branch_operand_b}")
         is_branch_taken = (branch_operand_a - branch_operand_b) == 0
 
         # Branch handling, BEQ, BNE handling, JAL handling
-        self.next_state.IF["PCSrc"] = or_gate(jal, and_gate(branch,
-                                                            xor_gate(is_branch_taken,
-                                                                     bne_func)))
-
-        # if branch taken
-        if self.next_state.IF["PCSrc"]:
-            self.state.IF["Flush"] = True
-            self.next_state.ID["nop"] = True
+        taken = or_gate(jal, and_gate(branch,
+                                      xor_gate(is_branch_taken,
+                                               bne_func)))
+
+        # Misprediction recovery: refetch from the resolved next PC when IF fetched from elsewhere
+        self.next_state.IF.PCSrc = 0
+        if self.next_state.EX.valid:
+            next_pc = self.next_state.IF.BranchPC if taken else adder(4, self.state.ID.PC)
+            self.next_state.IF.PCSrc = int(next_pc != self.state.ID.PredictedPC)
+            self.next_state.IF.BranchPC = next_pc
+            if branch or jal:
+                self.predictor.update(self.state.ID.PC, taken, next_pc, jal)
+
+        # if branch mispredicted
+        if self.next_state.IF.PCSrc:
+            self.state.IF.Flush = True
+            self.next_state.ID.nop = True
+            if jal:
+                self.counters.jal_flush_cycles += 1
+            else:
+                self.counters.branch_flush_cycles += 1
 
         # BNE, BEQ do not execute EX and the following stages, but JAL does
         if branch:
-            self.next_state.EX["nop"] = True
+            self.next_state.EX.nop = True
+            self.retired += 1  # a branch completes in ID
+            self.counters.branches += 1
+            self.counters.count_forwarding(forward_a, forward_b, branch=True)
+        if jal:
+            self.counters.jals += 1
 
         # Handle JAL calculation (to comform with the assignment, i.e., EX.Read_data1 = PC, EX.Read_data2 = 4)
         if jal:
-            self.next_state.EX["Read_data1"] = self.next_state.EX["PC"]
-            self.next_state.EX["Read_data2"] = 4
+            self.next_state.EX.Read_data1 = self.next_state.EX.PC
+            self.next_state.EX.Read_data2 = 4
 
-        logger.debug(
-            f"Branch Handling debug: pc_src: {self.next_state.IF['PCSrc']}, branch: {branch}, is_branch_taken: {is_branch_taken}, bne_func: {bne_func}, jal: {jal}")
+        if diagnostics.VERBOSE:
+            logger.debug(
+                f"Branch Handling debug: pc_src: {self.next_state.IF.PCSrc}, taken: {taken}, branch: {branch}, is_branch_taken: {is_branch_taken}, bne_func: {bne_func}, jal: {jal}")
 
         # clear EX stage if stall
         if stall:
-            self.next_state.EX["Read_data1"] = 0
-            self.next_state.EX["Read_data2"] = 0
-            self.next_state.EX["Rs"] = 0
-            self.next_state.EX["Rt"] = 0
-            self.next_state.EX["Wrt_reg_addr"] = 0
+            self.next_state.EX.Read_data1 = 0
+            self.next_state.EX.Read_data2 = 0
+            self.next_state.EX.Rs = 0
+            self.next_state.EX.Rt = 0
+            self.next_state.EX.Wrt_reg_addr = 0
 
     def ex_stage(self):
-        logger.debug(f"--------------------- EX stage ")
-        logger.info(f"state: {self.state.EX}")
-        logger.info(f"next_state: {self.next_state.EX}")
-        if self.state.EX["nop"]:
+        if diagnostics.VERBOSE:
+            logger.debug(f"--------------------- EX stage ")
+            logger.info(f"state: {self.state.EX}")
+            logger.info(f"next_state: {self.next_state.EX}")
+        if self.state.EX.nop:
             """Passing control signal to subsequent pipeline registers"""
-            self.next_state.MEM["branch"] = 0
-            self.next_state.MEM["rd_mem"] = 0
-            self.next_state.MEM["wrt_mem"] = 0
-            self.next_state.MEM["wrt_enable"] = 0
-            self.next_state.MEM["mem_to_reg"] = 0
-            self.next_state.MEM["Store_data"] = 0
-            logger.warning(f"EX stage No Operation")
+            self.next_state.MEM.branch = 0
+            self.next_state.MEM.rd_mem = 0
+            self.next_state.MEM.wrt_mem = 0
+            self.next_state.MEM.wrt_enable = 0
+            self.next_state.MEM.mem_to_reg = 0
+            self.next_state.MEM.Store_data = 0
+            self.next_state.MEM.valid = 0
+            if diagnostics.VERBOSE:
+                logger.warning(f"EX stage No Operation")
             return
         # This will stop the stage in the next cycle
-        if self.state.ID["nop"] and self.halt_detected:
-            self.next_state.EX["nop"] = True
+        if self.state.ID.nop and self.halt_detected:
+            self.next_state.EX.nop = True
 
         """Forwarding Unit"""
         forward_a, forward_b = forwarding_unit(self.state, self.next_state)
+        if forward_a or forward_b:
+            self.counters.count_forwarding(forward_a, forward_b)
 
         alu_input_a = multiplexer(forward_a,
-                                  self.state.EX["Read_data1"],  # 00
-                                  self.state.WB["Wrt_data"],  # 01
-                                  self.next_state.MEM["ALUresult"])  # 10
+                                  self.state.EX.Read_data1,  # 00
+                                  self.state.WB.Wrt_data,  # 01
+                                  self.next_state.MEM.ALUresult)  # 10
         # forwarding unit alu input b
         forward_b_result = multiplexer(forward_b,
-                                       self.state.EX["Read_data2"],
-                                       self.state.WB["Wrt_data"],
-                                       self.next_state.MEM["ALUresult"])
-        logger.debug(
-            f"forwarding mul debugger: current rd1: {self.state.EX["Read_data1"]}, current rd2: {self.state.EX["Read_data2"]},")
-        logger.debug(
-            f"current MEM ALUResult: {self.state.MEM["ALUresult"]}, next MEM ALUResult: {self.next_state.MEM["ALUresult"]},")
-        logger.debug(
-            f"current WB Wrt_data: {self.state.WB["Wrt_data"]}, next WB Wrt_data: {self.next_state.WB["Wrt_data"]}")
+                                       self.state.EX.Read_data2,
+                                       self.state.WB.Wrt_data,
+                                       self.next_state.MEM.ALUresult)
+        if diagnostics.VERBOSE:
+            logger.debug(
+                f"forwarding mul debugger: current rd1: {self.state.EX.Read_data1}, current rd2: {self.state.EX.Read_data2},")
+            logger.debug(
+                f"current MEM ALUResult: {self.state.MEM.ALUresult}, next MEM ALUResult: {self.next_state.MEM.ALUresult},")
+            logger.debug(
+                f"current WB Wrt_data: {self.state.WB.Wrt_data}, next WB Wrt_data: {self.next_state.WB.Wrt_data}")
 
         """Passing data to subsequent pipeline registers"""
-        self.next_state.MEM["Rs"] = self.state.EX["Rs"]  # todo: ?
-        self.next_state.MEM["Rt"] = self.state.EX["Rt"]  # todo: ?
-        self.next_state.MEM["Wrt_reg_addr"] = self.state.EX["Wrt_reg_addr"]
+        self.next_state.MEM.Rs = self.state.EX.Rs  # todo: ?
+        self.next_state.MEM.Rt = self.state.EX.Rt  # todo: ?
+        self.next_state.MEM.Wrt_reg_addr = self.state.EX.Wrt_reg_addr
 
         """Passing control signal to subsequent pipeline registers"""
         # (see Comp.Org p.313 Figure 4.52)
-        self.next_state.MEM["branch"] = self.state.EX["branch"]
-        self.next_state.MEM["rd_mem"] = self.state.EX["rd_mem"]
-        self.next_state.MEM["wrt_mem"] = self.state.EX["wrt_mem"]
-        self.next_state.MEM["wrt_enable"] = self.state.EX["wrt_enable"]
-        self.next_state.MEM["mem_to_reg"] = self.state.EX["mem_to_reg"]
-        self.next_state.MEM["Store_data"] = forward_b_result  # ID Register output: Read register 2 (rd2)
+        self.next_state.MEM.branch = self.state.EX.branch
+        self.next_state.MEM.rd_mem = self.state.EX.rd_mem
+        self.next_state.MEM.wrt_mem = self.state.EX.wrt_mem
+        self.next_state.MEM.wrt_enable = self.state.EX.wrt_enable
+        self.next_state.MEM.mem_to_reg = self.state.EX.mem_to_reg
+        self.next_state.MEM.Store_data = forward_b_result  # ID Register output: Read register 2 (rd2)
+        self.next_state.MEM.valid = self.state.EX.valid
 
         # rd2 or imm ALU input b
-        alu_input_b = multiplexer(self.state.EX["is_I_type"],
+        alu_input_b = multiplexer(self.state.EX.is_I_type,
                                   forward_b_result,
                                   4,  # unnecessary. but we keep this for compatibility
-                                  self.state.EX["Imm"])  # extract the least significant bit
+                                  self.state.EX.Imm)  # extract the least significant bit
 
         # ALUOp 2-bit, generated from the Main Control Unit
         # indicates whether the operation to be performed should be
         # add (00) for loads and stores, subtract and
         # test if zero (01) for beq, or
         # be determined by the operation encoded in the funct7 and funct3 fields (10).
-        alu_control = alu_control_unit(self.state.EX["alu_op"],
-                                       self.state.EX["alu_control_func"])
+        # The 4-bit code itself is produced once per static instruction by the decoder.
+        alu_control = self.state.EX.alu_control
         # ALU control 4-bit
-        zero, self.next_state.MEM["ALUresult"] = arithmetic_logic_unit(
+        zero, self.next_state.MEM.ALUresult = arithmetic_logic_unit(
             alu_control=alu_control,
             a=alu_input_a,
             b=alu_input_b)
 
     def mem_stage(self):
-        logger.debug(f"--------------------- MEM stage ")
-        logger.info(f"state: {self.state.MEM}")
-        logger.info(f"next_state: {self.next_state.MEM}")
-        if self.state.MEM["nop"]:
+        if diagnostics.VERBOSE:
+            logger.debug(f"--------------------- MEM stage ")
+            logger.info(f"state: {self.state.MEM}")
+            logger.info(f"next_state: {self.next_state.MEM}")
+        if self.state.MEM.nop:
             """Passing control signal to subsequent pipeline registers"""
-            self.next_state.WB["wrt_enable"] = 0
-            self.next_state.WB["mem_to_reg"] = 0
-            logger.warning(f"MEM stage No Operation")
+            self.next_state.WB.wrt_enable = 0
+            self.next_state.WB.mem_to_reg = 0
+            self.next_state.WB.valid = 0
+            if diagnostics.VERBOSE:
+                logger.warning(f"MEM stage No Operation")
             return
         # This will stop the stage in the next cycle
-        if self.state.EX["nop"] and self.halt_detected:
-            self.next_state.MEM["nop"] = True
+        if self.state.EX.nop and self.halt_detected:
+            self.next_state.MEM.nop = True
 
         """Passing data to subsequent pipeline registers"""
-        self.next_state.WB["ALUresult"] = self.state.MEM["ALUresult"]
-        self.next_state.WB["Rs"] = self.state.MEM["Rs"]
-        self.next_state.WB["Rt"] = self.state.MEM["Rt"]
-        self.next_state.WB["Wrt_reg_addr"] = self.state.MEM["Wrt_reg_addr"]
+        self.next_state.WB.ALUresult = self.state.MEM.ALUresult
+        self.next_state.WB.Rs = self.state.MEM.Rs
+        self.next_state.WB.Rt = self.state.MEM.Rt
+        self.next_state.WB.Wrt_reg_addr = self.state.MEM.Wrt_reg_addr
 
         """Passing control signal to subsequent pipeline registers"""
         # (see Comp.Org p.313 Figure 4.52)
-        self.next_state.WB["wrt_enable"] = self.state.MEM["wrt_enable"]
-        self.next_state.WB["mem_to_reg"] = self.state.MEM["mem_to_reg"]
+        self.next_state.WB.wrt_enable = self.state.MEM.wrt_enable
+        self.next_state.WB.mem_to_reg = self.state.MEM.mem_to_reg
+        self.next_state.WB.valid = self.state.MEM.valid
 
         """Data Memory Unit"""
-        if self.state.MEM["wrt_mem"] == 1:
-            logger.debug("Write data")
+        if self.state.MEM.wrt_mem == 1:
+            if diagnostics.VERBOSE:
+                logger.debug("Write data")
             self.ext_data_memory.write(
-                address=self.state.MEM["ALUresult"],
-                data=self.state.MEM["Store_data"])  # rd2
-        self.next_state.WB["read_data"] = None
-        if self.state.MEM["rd_mem"] == 1:
-            logger.debug("Read data")
-            self.next_state.WB["read_data"] = self.ext_data_memory.read(self.state.MEM["ALUresult"])
-
-        self.next_state.WB["Wrt_data"] = multiplexer(self.next_state.WB["mem_to_reg"],
-                                                     self.next_state.WB["ALUresult"],
-                                                     self.next_state.WB["read_data"])
+                address=self.state.MEM.ALUresult,
+                data=self.state.MEM.Store_data)  # rd2
+            if self.data_cache is not None:
+                stall = self.data_cache.access(self.state.MEM.ALUresult, write=True)
+                self.memory_stall = max(self.memory_stall, stall)
+        self.next_state.WB.read_data = None
+        if self.state.MEM.rd_mem == 1:
+            if diagnostics.VERBOSE:
+                logger.debug("Read data")
+            self.next_state.WB.read_data = self.ext_data_memory.read(self.state.MEM.ALUresult)
+            if self.data_cache is not None:
+                stall = self.data_cache.access(self.state.MEM.ALUresult)
+                self.memory_stall = max(self.memory_stall, stall)
+
+        self.next_state.WB.Wrt_data = multiplexer(self.next_state.WB.mem_to_reg,
+                                                     self.next_state.WB.ALUresult,
+                                                     self.next_state.WB.read_data)
 
     def wb_stage(self):
-        logger.debug(f"--------------------- WB stage ")
-        logger.info(f"state: {self.state.WB}")
-        logger.info(f"next_state: {self.next_state.WB}")
-        if self.state.WB["nop"]:
-            logger.warning(f"WB stage No Operation")
+        if diagnostics.VERBOSE:
+            logger.debug(f"--------------------- WB stage ")
+            logger.info(f"state: {self.state.WB}")
+            logger.info(f"next_state: {self.next_state.WB}")
+        if self.state.WB.nop:
+            if diagnostics.VERBOSE:
+                logger.warning(f"WB stage No Operation")
             return
         # This will stop the stage in the next cycle
-        if self.state.EX["nop"] and self.halt_detected:
-            logger.info(f"WB stage will nop in the next cycle")
-            self.next_state.WB["nop"] = True
+        if self.state.EX.nop and self.halt_detected:
+            if diagnostics.VERBOSE:
+                logger.info(f"WB stage will nop in the next cycle")
+            self.next_state.WB.nop = True
 
-        logger.debug(f"Write Enable: {bool(self.state.WB['wrt_enable'])}")
-        if self.state.WB["wrt_enable"] == 1:
-            self.register_file.write(self.state.WB["Wrt_reg_addr"], self.state.WB["Wrt_data"])
+        self.retired += self.state.WB.valid
+        if diagnostics.VERBOSE:
+            logger.debug(f"Write Enable: {bool(self.state.WB.wrt_enable)}")
+        if self.state.WB.wrt_enable == 1:
+            self.register_file.write(self.state.WB.Wrt_reg_addr, self.state.WB.Wrt_data)
 
     def logger_instruction(self):
         logger.debug(f"Instruction: +.....-+...-+...-+.-+...-+.....-")
         logger.debug(f"Instruction: func7.|rs2.|rs1.|3.|rd..|opcode|")
-        logger.debug(f"Instruction: {self.next_state.ID['Instr']:032b}")
+        logger.debug(f"Instruction: {self.next_state.ID.Instr:032b}")
 
     def logger_data_memory_result(self):
         logger.opt(colors=True).info(
             f"+-----------------------------+---------------------------------+-----------------------------+")
         logger.opt(colors=True).info(f"| Register      | Mem Addr  | \t\t\tValue Bin (Dec) \t\t  |")
         logger.opt(colors=True).info(
-            f"| Rs / Rd1      | {self.next_state.EX['Rs']:05b} ({self.next_state.EX['Rs']}) | {self.next_state.EX['Read_data1']:032b} ({self.next_state.EX['Read_data1']}) |")
+            f"| Rs / Rd1      | {self.next_state.EX.Rs:05b} ({self.next_state.EX.Rs}) | {self.next_state.EX.Read_data1:032b} ({self.next_state.EX.Read_data1}) |")
         logger.opt(colors=True).info(
-            f"| Rt / Rd2      | {self.next_state.EX['Rt']:05b} ({self.next_state.EX['Rt']}) | {self.next_state.EX['Read_data2']:032b} ({self.next_state.EX['Read_data2']}) |")
+            f"| Rt / Rd2      | {self.next_state.EX.Rt:05b} ({self.next_state.EX.Rt}) | {self.next_state.EX.Read_data2:032b} ({self.next_state.EX.Read_data2}) |")
         logger.opt(colors=True).info(
-            f"| Wrt_reg_addr  | {self.next_state.EX['Wrt_reg_addr']:05b} ({self.next_state.EX['Wrt_reg_addr']}) |")
+            f"| Wrt_reg_addr  | {self.next_state.EX.Wrt_reg_addr:05b} ({self.next_state.EX.Wrt_reg_addr}) |")
         logger.opt(colors=True).info(
             f"+-----------------------------+---------------------------------+-----------------------------+")
 
@@ -702,11 +1055,11 @@ class FiveStageCore(Core):
 
     def set_init_nop_state(self):
         if self.cycle == 0:
-            self.state.IF["nop"] = False
-            self.state.ID["nop"] = False
-            self.state.EX["nop"] = True
-            self.state.MEM["nop"] = True
-            self.state.WB["nop"] = True
+            self.state.IF.nop = False
+            self.state.ID.nop = False
+            self.state.EX.nop = True
+            self.state.MEM.nop = True
+            self.state.WB.nop = True
 
     def printState(self, state, cycle):
         """
@@ -719,62 +1072,813 @@ class FiveStageCore(Core):
         :param cycle:
         :return:
         """
-        def format_binary(val, bits=32):
-            """Format the value as a binary string and pad it to the specified length."""
-            if isinstance(val, int):
-                return f"{val:0{bits}b}"
-            return str(val)
-
         printstate = ["-" * 70 + "\n", f"State after executing cycle: {cycle}\n"]
 
         # Format the output of each pipeline stage as required
-        formatted_output = {
-            "IF": {"nop": state.IF.get("nop"), "PC": state.IF.get("PC")},
-            "ID": {"nop": state.ID.get("nop"), "Instr": format_binary(state.ID.get("Instr"))},
-            "EX": {
-                "nop": state.EX.get("nop"),
-                "instr": format_binary(state.EX.get("instr")),
-                "Read_data1": format_binary(state.EX.get("Read_data1")),
-                "Read_data2": format_binary(state.EX.get("Read_data2")),
-                "Imm": format_binary(state.EX.get("Imm"), 12),
-                "Rs": format_binary(state.EX.get("Rs"), 5),
-                "Rt": format_binary(state.EX.get("Rt"), 5),
-                "Wrt_reg_addr": format_binary(state.EX.get("Wrt_reg_addr"), 5),
-                "is_I_type": state.EX.get("is_I_type"),
-                "rd_mem": state.EX.get("rd_mem"),
-                "wrt_mem": state.EX.get("wrt_mem"),
-                "alu_op": format_binary(state.EX.get("alu_op"), 2),
-                "wrt_enable": state.EX.get("wrt_enable"),
-            },
-            "MEM": {
-                "nop": state.MEM.get("nop"),
-                "ALUresult": format_binary(state.MEM.get("ALUresult")),
-                "Store_data": format_binary(state.MEM.get("Store_data")),
-                "Rs": format_binary(state.MEM.get("Rs"), 5),
-                "Rt": format_binary(state.MEM.get("Rt"), 5),
-                "Wrt_reg_addr": format_binary(state.MEM.get("Wrt_reg_addr"), 5),
-                "rd_mem": state.MEM.get("rd_mem"),
-                "wrt_mem": state.MEM.get("wrt_mem"),
-                "wrt_enable": state.MEM.get("wrt_enable"),
-            },
-            "WB": {
-                "nop": state.WB.get("nop"),
-                "Wrt_data": format_binary(state.WB.get("Wrt_data")),
-                "Rs": format_binary(state.WB.get("Rs"), 5),
-                "Rt": format_binary(state.WB.get("Rt"), 5),
-                "Wrt_reg_addr": format_binary(state.WB.get("Wrt_reg_addr"), 5),
-                "wrt_enable": state.WB.get("wrt_enable"),
-            },
-        }
+        formatted_output = format_pipeline_registers(state.IF, state.ID, state.EX, state.MEM, state.WB)
 
         # Add the formatted data to printstate
         for stage, fields in formatted_output.items():
             for key, val in fields.items():
                 printstate.append(f"{stage}.{key}: {val}\n")
 
-        # Determine file open mode
-        perm = "w" if cycle == 0 else "a"
+        # Write file, the first traced cycle starts it over
+        self.state_trace.write(printstate)
+
+
+def _source_registers(decoded):
+    """The registers an instruction reads, (rs1, rs2) with 0 for an operand it does not have."""
+    opcode = decoded.opcode
+    if opcode in (0b0110011, 0b0100011, 0b1100011):  # R-type, store, branch
+        return decoded.rs1, decoded.rs2
+    if opcode in (0b0010011, 0b0000011):  # I-type, load
+        return decoded.rs1, 0
+    return 0, 0
+
+
+class DualIssueCore(Core):
+    """
+    DualIssueCore is an in-order, two-wide variant of the five stage core.
+
+    IF fetches up to two sequential instructions per cycle into a two entry fetch buffer (the ID
+    registers), ID issues up to two of them per cycle and every later stage has two lanes. As in
+    the five stage core, branches are resolved in ID, a misprediction costs the fetch of that
+    cycle, a load followed by a use of its result stalls for one cycle, and caches freeze the
+    whole pipeline on a miss.
+
+    The younger instruction of the buffer issues with the older one unless
+      - it reads a register the older one writes (there is no forwarding within a pair),
+      - it reads the result of a load in EX (the load-use hazard),
+      - both access the data memory (one memory port),
+      - both are branches or JALs (one branch unit in ID),
+      - the older one is mispredicted, then it is on the wrong path and squashed,
+      - it is HALT.
+    It then stays in the buffer and becomes the older instruction of the next cycle's pair.
+    Forwarding covers both lanes of EX/MEM and MEM/WB, the youngest producer wins.
+    """
+
+    def __init__(self, io_dir, instruction_memory, data_memory, flush_interval=DEFAULT_FLUSH_INTERVAL,
+                 trace_policy=None, branch_predictor=None, instruction_cache=None, data_cache=None):
+        """
+        Initialize the DualIssueCore.
+
+        Args:
+            io_dir (Path): Directory for input/output files.
+            instruction_memory (InstructionMemory): The instruction memory.
+            data_memory (DataMemory): The data memory.
+            flush_interval (int): Number of cycles buffered by the trace writers before writing.
+            trace_policy (TracePolicy): Which cycles are traced, every cycle by default.
+            branch_predictor (BranchPredictor): Chooses the next fetch address, None predicts not taken.
+            instruction_cache (Cache): L1 instruction cache, None for an ideal single cycle memory.
+            data_cache (Cache): L1 data cache, None for an ideal single cycle memory.
+        """
+        super(DualIssueCore, self).__init__(io_dir / "DI_", instruction_memory, data_memory, flush_interval,
+                                            trace_policy)
+        self.state = DualIssueState()
+        self.next_state = DualIssueState()
+        self.opFilePath = io_dir / "StateResult_DI.txt"
+        self.state_trace = TraceWriter(self.opFilePath, flush_interval)
+        self.halt_detected = False
+        self.retired = 0
+        """ Number of completed instructions: BEQ/BNE complete in ID, the others in WB. HALT is never issued """
+        self.counters = DualIssueCounters()
+        """ Stall, flush, drain, forwarding and issue counts """
+        self.predictor = branch_predictor if branch_predictor is not None else StaticNotTaken()
+        """ Chooses the next fetch address in IF, a wrong guess is flushed when ID resolves the instruction """
+        self.instruction_cache = instruction_cache
+        """ Cache timing model in front of the instruction memory, None for an ideal single cycle memory """
+        self.data_cache = data_cache
+        """ Cache timing model in front of the data memory, None for an ideal single cycle memory """
+        self.memory_stall = 0
+        """ Cycles the pipeline stays frozen until the pending cache miss is served """
+
+    def step(self):
+        """
+        Execute one cycle of the processor.
+        """
+        if self.memory_stall:
+            self.memory_stall_cycle()
+            return
+
+        if self.halt_detected and all(register.nop for lanes in (self.state.EX, self.state.MEM, self.state.WB)
+                                      for register in lanes):
+            self.halted = True
+        if self.halt_detected:
+            self.counters.drain_cycles += 1
+
+        self.wb_stage()
+        self.mem_stage()
+        self.ex_stage()
+        kept = self.id_stage()
+        self.if_stage(kept)
+
+        if diagnostics.VERBOSE:
+            logger.opt(colors=True).info(
+                f"<green>-------------- ↑ {self.cycle} cycle |  {self.cycle + 1} cycle ↓ --------------</green>")
+
+        if self.trace_policy.traces_register_file(self.cycle, self.halted):
+            self.register_file.output(self.cycle)  # dump RF
+
+        self.state.latch(self.next_state)
+        if self.trace_policy.traces(self.cycle):
+            self.printState(self.state, self.cycle)
+
+        self.cycle += 1
+
+        if self.halted:
+            self.close()
 
-        # Write file
-        with open(self.opFilePath, perm) as wf:
-            wf.writelines(printstate)
+    def memory_stall_cycle(self):
+        """
+        A cycle spent waiting for a cache miss: every pipeline register holds its value.
+        """
+        self.memory_stall -= 1
+        self.counters.memory_stall_cycles += 1
+        if diagnostics.VERBOSE:
+            logger.warning(f"Cache miss, pipeline stalled ({self.memory_stall} cycles left)")
+        if self.trace_policy.traces_register_file(self.cycle, self.halted):
+            self.register_file.output(self.cycle)
+        if self.trace_policy.traces(self.cycle):
+            self.printState(self.state, self.cycle)
+        self.cycle += 1
+
+    def if_stage(self, kept):
+        """
+        Fetch sequential instructions into the fetch buffer entries ID freed.
+
+        A predicted taken branch or JAL ends the fetch group, the next group starts at its predicted target.
+
+        Args:
+            kept (int): Number of fetch buffer entries ID kept, they are in the first lanes.
+        """
+        if diagnostics.VERBOSE:
+            logger.debug(f"--------------------- IF stage ")
+        pc = self.state.IF.PC
+        filled = kept
+        if self.next_state.IF.PCSrc:
+            # The instructions fetched this cycle would be on the wrong path, fetch from the resolved PC next cycle
+            pc = self.next_state.IF.BranchPC
+            filled = 0
+        elif not self.halt_detected:
+            while filled < 2:
+                entry = self.next_state.ID[filled]
+                entry.nop = False
+                entry.Instr = self.program.fetch(pc)
+                entry.PC = pc
+                if self.instruction_cache is not None:
+                    self.memory_stall = max(self.memory_stall, self.instruction_cache.access(pc))
+                predicted_pc = self.predictor.predict(pc)
+                entry.PredictedPC = predicted_pc if predicted_pc is not None else adder(4, pc)
+                pc = entry.PredictedPC
+                filled += 1
+                if predicted_pc is not None:
+                    break
+        for entry in self.next_state.ID[filled:]:
+            entry.nop = True
+        self.next_state.IF.PC = pc
+        self.next_state.IF.nop = self.halt_detected
+        if diagnostics.VERBOSE:
+            logger.debug(f"Fetched {filled - kept} instructions, next PC: {pc}")
+
+    def id_stage(self) -> int:
+        """
+        Decode the fetch buffer and issue up to two instructions, resolving branches and JALs.
+
+        Returns:
+            int: Number of fetch buffer entries kept for the next cycle, moved to the first lanes.
+        """
+        if diagnostics.VERBOSE:
+            logger.debug(f"--------------------- ID stage ")
+        self.next_state.IF.PCSrc = 0
+        issued = []
+        for entry in self.state.ID:
+            if entry.nop or self.next_state.IF.PCSrc:
+                break
+            decoded = self.program.decode(entry.PC, entry.Instr)
+            if decoded.halt:
+                if not issued:
+                    self.halt_detected = True
+                    if diagnostics.VERBOSE:
+                        logger.warning(f"HALT detected")
+                break
+            rs1, rs2 = _source_registers(decoded)
+            if hazard_detection_unit_dual_issue(self.state.EX, rs1, rs2):
+                if issued:
+                    self.counters.split_dependence += 1
+                else:
+                    self.counters.load_use_stall_cycles += 1
+                break
+            if issued:
+                conflict = self.pairing_conflict(issued[0], decoded, rs1, rs2)
+                if conflict is not None:
+                    setattr(self.counters, conflict, getattr(self.counters, conflict) + 1)
+                    break
+            self.issue(len(issued), entry, decoded, rs1, rs2)
+            issued.append(decoded)
+
+        for register in self.next_state.EX[len(issued):]:
+            register.clear()
+            register.nop = True
+        if len(issued) == 2:
+            self.counters.dual_issue_cycles += 1
+
+        if self.next_state.IF.PCSrc or self.halt_detected:
+            return 0
+        kept = 0
+        for entry in self.state.ID[len(issued):]:
+            if not entry.nop:
+                self.next_state.ID[kept].latch(entry)
+                kept += 1
+        return kept
+
+    def pairing_conflict(self, first, second, rs1, rs2):
+        """
+        Check whether the younger instruction of the fetch buffer may issue with the older one.
+
+        Args:
+            first (DecodedInstruction): The older instruction, issued this cycle.
+            second (DecodedInstruction): The younger instruction.
+            rs1 (int): The first source register of the younger instruction, 0 when it has none.
+            rs2 (int): The second source register of the younger instruction, 0 when it has none.
+
+        Returns:
+            str | None: The DualIssueCounters counter of the rule that holds it back, None if it may issue.
+        """
+        first_signals, second_signals = first.control_signals, second.control_signals
+        if first_signals["RegWrite"] and first.rd != 0 and first.rd in (rs1, rs2):
+            return "split_dependence"
+        if ((first_signals["MemRead"] or first_signals["MemWrite"]) and
+                (second_signals["MemRead"] or second_signals["MemWrite"])):
+            return "split_memory_port"
+        if ((first_signals["Branch"] or first_signals["JAL"]) and
+                (second_signals["Branch"] or second_signals["JAL"])):
+            return "split_branch_unit"
+        return None
+
+    def issue(self, lane, entry, decoded, rs1, rs2):
+        """
+        Issue an instruction to a lane of the ID/EX register, resolving it if it is a branch or JAL.
+
+        Args:
+            lane (int): The lane, 0 for the older instruction of the pair.
+            entry (IDRegister): The fetch buffer entry holding the instruction.
+            decoded (DecodedInstruction): The decoded instruction.
+            rs1 (int): Its first source register, 0 when it has none.
+            rs2 (int): Its second source register, 0 when it has none.
+        """
+        control_signals = decoded.control_signals
+        branch, jal = control_signals["Branch"], control_signals["JAL"]
+        register = self.next_state.EX[lane]
+        register.nop = False
+        register.instr = entry.Instr
+        register.PC = entry.PC
+        register.Rs = rs1
+        register.Rt = rs2
+        register.Read_data1 = self.register_file.read(rs1)
+        register.Read_data2 = self.register_file.read(rs2)
+        register.Imm = decoded.imm
+        register.Wrt_reg_addr = decoded.rd
+        register.alu_op = control_signals["ALUOp"]
+        register.alu_control = decoded.alu_control
+        register.alu_control_func = decoded.alu_control_func
+        register.is_I_type = control_signals["ALUSrcB"]
+        register.rd_mem = control_signals["MemRead"]
+        register.wrt_mem = control_signals["MemWrite"]
+        register.mem_to_reg = control_signals["MemtoReg"]
+        register.wrt_enable = control_signals["RegWrite"]
+        register.branch = branch
+        register.jal = jal
+        register.valid = 1
+
+        taken = 0
+        if branch:
+            forward_a, lane_a = forwarding_unit_dual_issue(rs1, self.next_state.MEM, self.next_state.WB)
+            forward_b, lane_b = forwarding_unit_dual_issue(rs2, self.next_state.MEM, self.next_state.WB)
+            self.counters.count_forwarding(forward_a, forward_b, branch=True)
+            branch_operand_a = multiplexer(forward_a,
+                                           register.Read_data1,  # 00: from Register File
+                                           self.next_state.WB[lane_a].Wrt_data,  # 01: from MEM/WB
+                                           self.next_state.MEM[lane_a].ALUresult)  # 10: from EX/MEM
+            branch_operand_b = multiplexer(forward_b,
+                                           register.Read_data2,
+                                           self.next_state.WB[lane_b].Wrt_data,
+                                           self.next_state.MEM[lane_b].ALUresult)
+            taken = xor_gate(int(branch_operand_a - branch_operand_b == 0), decoded.bne_func)
+            self.counters.branches += 1
+        if jal:
+            taken = 1
+            self.counters.jals += 1
+            # The link value goes through the ALU as PC + 4, like the five stage core
+            register.Rs = register.Rt = 0
+            register.Read_data1 = entry.PC
+            register.Read_data2 = 4
+
+        next_pc = adder(entry.PC, decoded.imm) if taken else adder(4, entry.PC)
+        if branch or jal:
+            self.predictor.update(entry.PC, bool(taken), next_pc, jal)
+        if next_pc != entry.PredictedPC:
+            # Misprediction: the younger entries and this cycle's fetch are on the wrong path
+            self.next_state.IF.PCSrc = 1
+            self.next_state.IF.BranchPC = next_pc
+            if jal:
+                self.counters.jal_flush_cycles += 1
+            else:
+                self.counters.branch_flush_cycles += 1
+
+        if branch:
+            # BNE, BEQ complete in ID
+            register.clear()
+            register.nop = True
+            self.retired += 1
+        if diagnostics.VERBOSE:
+            logger.debug(f"Issued {entry.PC} in lane {lane}, next PC: {next_pc}")
+
+    def ex_stage(self):
+        if diagnostics.VERBOSE:
+            logger.debug(f"--------------------- EX stage ")
+        for register, result in zip(self.state.EX, self.next_state.MEM):
+            if register.nop:
+                result.clear()
+                result.nop = True
+                continue
+
+            forward_a, lane_a = forwarding_unit_dual_issue(register.Rs, self.state.MEM, self.state.WB)
+            forward_b, lane_b = forwarding_unit_dual_issue(register.Rt, self.state.MEM, self.state.WB)
+            if forward_a or forward_b:
+                self.counters.count_forwarding(forward_a, forward_b)
+            alu_input_a = multiplexer(forward_a,
+                                      register.Read_data1,  # 00
+                                      self.state.WB[lane_a].Wrt_data,  # 01
+                                      self.state.MEM[lane_a].ALUresult)  # 10
+            forward_b_result = multiplexer(forward_b,
+                                           register.Read_data2,
+                                           self.state.WB[lane_b].Wrt_data,
+                                           self.state.MEM[lane_b].ALUresult)
+            alu_input_b = multiplexer(register.is_I_type, forward_b_result, 4, register.Imm)
+
+            result.nop = False
+            result.Rs = register.Rs
+            result.Rt = register.Rt
+            result.Wrt_reg_addr = register.Wrt_reg_addr
+            result.rd_mem = register.rd_mem
+            result.wrt_mem = register.wrt_mem
+            result.wrt_enable = register.wrt_enable
+            result.mem_to_reg = register.mem_to_reg
+            result.jal = register.jal
+            result.PC = register.PC
+            result.valid = register.valid
+            result.Store_data = forward_b_result
+            _, result.ALUresult = arithmetic_logic_unit(alu_control=register.alu_control, a=alu_input_a,
+                                                        b=alu_input_b)
+
+    def mem_stage(self):
+        if diagnostics.VERBOSE:
+            logger.debug(f"--------------------- MEM stage ")
+        for register, result in zip(self.state.MEM, self.next_state.WB):
+            if register.nop:
+                result.clear()
+                result.nop = True
+                continue
+
+            result.nop = False
+            result.ALUresult = register.ALUresult
+            result.Rs = register.Rs
+            result.Rt = register.Rt
+            result.Wrt_reg_addr = register.Wrt_reg_addr
+            result.wrt_enable = register.wrt_enable
+            result.mem_to_reg = register.mem_to_reg
+            result.valid = register.valid
+
+            # The pairing rules leave at most one memory access per stage
+            if register.wrt_mem == 1:
+                self.ext_data_memory.write(address=register.ALUresult, data=register.Store_data)
+                if self.data_cache is not None:
+                    stall = self.data_cache.access(register.ALUresult, write=True)
+                    self.memory_stall = max(self.memory_stall, stall)
+            result.read_data = None
+            if register.rd_mem == 1:
+                result.read_data = self.ext_data_memory.read(register.ALUresult)
+                if self.data_cache is not None:
+                    self.memory_stall = max(self.memory_stall, self.data_cache.access(register.ALUresult))
+
+            result.Wrt_data = multiplexer(result.mem_to_reg, result.ALUresult, result.read_data)
+
+    def wb_stage(self):
+        if diagnostics.VERBOSE:
+            logger.debug(f"--------------------- WB stage ")
+        # Lane 0 first, the younger instruction of the pair wins when both write the same register
+        for register in self.state.WB:
+            if register.nop:
+                continue
+            self.retired += register.valid
+            if register.wrt_enable == 1:
+                self.register_file.write(register.Wrt_reg_addr, register.Wrt_data)
+
+    def printState(self, state, cycle):
+        """
+        Print the pipeline registers to StateResult_DI.txt, the fields of StateResult_FS.txt for each lane.
+
+        Args:
+            state (DualIssueState): The state after the cycle.
+            cycle (int): The cycle number.
+        """
+        printstate = ["-" * 70 + "\n", f"State after executing cycle: {cycle}\n"]
+        lanes = [format_pipeline_registers(state.IF, state.ID[lane], state.EX[lane], state.MEM[lane],
+                                           state.WB[lane]) for lane in (0, 1)]
+        for key, val in lanes[0]["IF"].items():
+            printstate.append(f"IF.{key}: {val}\n")
+        for stage in ("ID", "EX", "MEM", "WB"):
+            for lane, formatted_output in enumerate(lanes):
+                for key, val in formatted_output[stage].items():
+                    printstate.append(f"{stage}{lane}.{key}: {val}\n")
+
+        # Write file, the first traced cycle starts it over
+        self.state_trace.write(printstate)
+
+
+class OutOfOrderCore(Core):
+    """
+    OutOfOrderCore is a Tomasulo-style out-of-order core with register renaming, reservation
+    stations, a reorder buffer and in-order commit.
+
+    Every cycle runs, in this order:
+      - commit: up to `width` finished instructions leave the head of the reorder buffer in
+        program order, writing the register file and, for stores, the data memory,
+      - complete: results whose latency elapsed are broadcast on the common data bus to the
+        reservation stations; a mispredicted branch squashes every younger instruction and
+        redirects the fetch,
+      - issue: the oldest ready reservation station entries execute, `width` on the ALUs and one
+        load on the data memory port,
+      - dispatch: up to `width` instructions are decoded, renamed through the register alias table
+        and placed in the reorder buffer and a reservation station,
+      - fetch: up to `width` instructions enter the fetch queue, following the branch predictor.
+
+    ALU instructions, stores and branches take one cycle, loads two (address, then memory), so a
+    dependent instruction issues the cycle after its producer completes. Stores write the memory
+    when they commit. A load issues once every older store has computed its address; it takes the
+    value of the youngest older store to the same address, or waits for an older store to another
+    overlapping address to commit. JALs are redirected at dispatch, BEQ/BNE when they execute.
+    HALT stops dispatch and the core halts when it commits.
+    """
+
+    def __init__(self, io_dir, instruction_memory, data_memory, flush_interval=DEFAULT_FLUSH_INTERVAL,
+                 trace_policy=None, branch_predictor=None, instruction_cache=None, data_cache=None,
+                 rob_entries=16, rs_entries=8, width=1):
+        """
+        Initialize the OutOfOrderCore.
+
+        Args:
+            io_dir (Path): Directory for input/output files.
+            instruction_memory (InstructionMemory): The instruction memory.
+            data_memory (DataMemory): The data memory.
+            flush_interval (int): Number of cycles buffered by the trace writers before writing.
+            trace_policy (TracePolicy): Which cycles are traced, every cycle by default.
+            branch_predictor (BranchPredictor): Chooses the next fetch address, None predicts not taken.
+            instruction_cache (Cache): L1 instruction cache, None for an ideal single cycle memory.
+            data_cache (Cache): L1 data cache, None for an ideal single cycle memory.
+            rob_entries (int): Reorder buffer entries.
+            rs_entries (int): Reservation station entries, shared by all instructions.
+            width (int): Instructions fetched, dispatched, executed on the ALUs and committed per cycle.
+        """
+        super(OutOfOrderCore, self).__init__(io_dir / "OO_", instruction_memory, data_memory, flush_interval,
+                                             trace_policy)
+        self.opFilePath = io_dir / "StateResult_OO.txt"
+        self.state_trace = TraceWriter(self.opFilePath, flush_interval)
+        self.rob_entries = rob_entries
+        self.rs_entries = rs_entries
+        self.width = width
+        self.retired = 0
+        """ Number of committed instructions, HALT excluded """
+        self.counters = OutOfOrderCounters()
+        """ Occupancy, stall, misprediction and forwarding counts """
+        self.predictor = branch_predictor if branch_predictor is not None else StaticNotTaken()
+        self.instruction_cache = instruction_cache
+        """ Cache timing model in front of the instruction memory, None for an ideal single cycle memory """
+        self.data_cache = data_cache
+        """ Cache timing model in front of the data memory, None for an ideal single cycle memory """
+
+        self.fetch_pc = 0
+        self.fetch_queue = deque()
+        """ FetchQueueEntry of the fetched instructions, oldest first, at most 2 * width """
+        self.fetch_stall = 0
+        """ Cycles fetch still waits for an instruction cache miss """
+        self.rob = deque()
+        """ ReorderBufferEntry of the instructions in flight, oldest (the head) first """
+        self.reservation_stations = []
+        """ ReservationStationEntry of the dispatched instructions not issued yet, oldest first """
+        self.executing = []
+        """ (completion cycle, ReorderBufferEntry) of the issued instructions """
+        self.register_alias_table = [None] * 32
+        """ The ReorderBufferEntry producing each register, None when the register file holds its value """
+        self.dispatch_blocked = False
+        """ A HALT (or an undecodable instruction) was dispatched, nothing after it is """
+        self.memory_port_free = 0
+        """ First cycle the data memory port accepts a load again """
+        self.commit_stall = 0
+        """ Cycles commit still waits for a data cache miss of a store """
+        self.seq = 0
+
+    def load_architectural_state(self, registers, pc):
+        self.register_file.Registers[:] = registers
+        self.fetch_pc = pc
+
+    def step(self):
+        """
+        Execute one cycle of the processor.
+        """
+        self.commit_stage()
+        if not self.halted:
+            self.complete_stage()
+            self.issue_stage()
+            self.dispatch_stage()
+            self.fetch_stage()
+        self.counters.rob_occupancy += len(self.rob)
+        self.counters.rs_occupancy += len(self.reservation_stations)
+
+        if diagnostics.VERBOSE:
+            logger.opt(colors=True).info(
+                f"<green>-------------- ↑ {self.cycle} cycle |  {self.cycle + 1} cycle ↓ --------------</green>")
+
+        if self.trace_policy.traces_register_file(self.cycle, self.halted):
+            self.register_file.output(self.cycle)  # dump RF
+        if self.trace_policy.traces(self.cycle):
+            self.printState(self.cycle)
+
+        self.cycle += 1
+
+        if self.halted:
+            self.close()
+
+    def commit_stage(self):
+        """
+        Retire finished instructions from the head of the reorder buffer, in program order.
+        """
+        if self.commit_stall:
+            self.commit_stall -= 1
+            self.counters.commit_stall_cycles += 1
+            return
+        committed = 0
+        while committed < self.width and self.rob and self.rob[0].done:
+            entry = self.rob.popleft()
+            if entry.error is not None:
+                raise entry.error
+            if entry.halt:
+                self.halted = True
+                if diagnostics.VERBOSE:
+                    logger.warning(f"HALT committed")
+                return
+            committed += 1
+            self.retired += 1
+            if entry.dest:
+                self.register_file.write(entry.dest, entry.value)
+                if self.register_alias_table[entry.dest] is entry:
+                    self.register_alias_table[entry.dest] = None
+            control_signals = entry.decoded.control_signals
+            if control_signals["MemWrite"]:
+                self.ext_data_memory.write(address=entry.address, data=entry.store_data)
+                if self.data_cache is not None:
+                    self.commit_stall = self.data_cache.access(entry.address, write=True)
+            if control_signals["Branch"] or control_signals["JAL"]:
+                taken = entry.next_pc != adder(4, entry.pc)
+                self.predictor.update(entry.pc, taken, entry.next_pc, control_signals["JAL"])
+                mispredicted = entry.next_pc != entry.predicted_pc
+                if control_signals["JAL"]:
+                    self.counters.jals += 1
+                    self.counters.jal_mispredictions += mispredicted
+                else:
+                    self.counters.branches += 1
+                    self.counters.branch_mispredictions += mispredicted
+            if diagnostics.VERBOSE:
+                logger.debug(f"Committed {entry.pc}: {entry.instr:032b}")
+            if self.commit_stall:
+                break
+        if not committed:
+            self.counters.empty_commit_cycles += 1
+
+    def complete_stage(self):
+        """
+        Broadcast the results whose latency elapsed, and recover from mispredicted branches.
+        """
+        finished = [entry for cycle, entry in self.executing if cycle == self.cycle]
+        if not finished:
+            return
+        self.executing = [(cycle, entry) for cycle, entry in self.executing if cycle != self.cycle]
+        for entry in sorted(finished, key=lambda finished_entry: finished_entry.seq):
+            if entry.squashed:
+                continue
+            entry.done = True
+            for station in self.reservation_stations:
+                station.wake_up(entry)
+            if entry.decoded.control_signals["Branch"] and entry.next_pc != entry.predicted_pc:
+                self.squash_after(entry)
+
+    def squash_after(self, entry):
+        """
+        Remove every instruction younger than a mispredicted one and fetch from its resolved next PC.
+
+        Args:
+            entry (ReorderBufferEntry): The mispredicted instruction, it stays in flight.
+        """
+        if diagnostics.VERBOSE:
+            logger.warning(f"Misprediction at {entry.pc}, fetching from {entry.next_pc}")
+        while self.rob[-1] is not entry:
+            self.rob.pop().squashed = True
+            self.counters.squashed += 1
+        self.reservation_stations = [station for station in self.reservation_stations
+                                     if not station.entry.squashed]
+        self.executing = [(cycle, executing) for cycle, executing in self.executing if not executing.squashed]
+        self.register_alias_table = [None] * 32
+        for in_flight in self.rob:
+            if in_flight.dest:
+                self.register_alias_table[in_flight.dest] = in_flight
+        self.dispatch_blocked = any(in_flight.halt or in_flight.error is not None for in_flight in self.rob)
+        self.fetch_queue.clear()
+        self.fetch_stall = 0
+        self.fetch_pc = entry.next_pc
+
+    def issue_stage(self):
+        """
+        Start executing the oldest reservation station entries whose operands are available.
+        """
+        alus = self.width
+        load_issued = False
+        for station in list(self.reservation_stations):
+            if not station.ready():
+                continue
+            entry = station.entry
+            decoded = entry.decoded
+            if decoded.control_signals["MemRead"]:
+                if load_issued or self.cycle < self.memory_port_free or not self.issue_load(station):
+                    continue
+                load_issued = True
+            elif alus:
+                alus -= 1
+                self.execute(station)
+                self.executing.append((self.cycle + 1, entry))
+            else:
+                continue
+            self.reservation_stations.remove(station)
+
+    def execute(self, station):
+        """
+        Compute the result of an ALU instruction, a store or a branch.
+
+        Args:
+            station (ReservationStationEntry): The issued instruction with its operands.
+        """
+        entry = station.entry
+        decoded = entry.decoded
+        control_signals = decoded.control_signals
+        if control_signals["Branch"]:
+            taken = xor_gate(int(station.value1 - station.value2 == 0), decoded.bne_func)
+            entry.next_pc = adder(entry.pc, decoded.imm) if taken else adder(4, entry.pc)
+        elif control_signals["MemWrite"]:
+            _, entry.address = arithmetic_logic_unit(decoded.alu_control, station.value1, decoded.imm)
+            entry.store_data = station.value2
+        elif control_signals["JAL"]:
+            # The link value goes through the ALU as PC + 4, like the other cores
+            _, entry.value = arithmetic_logic_unit(decoded.alu_control, entry.pc, 4)
+        else:
+            second = decoded.imm if control_signals["ALUSrcB"] else station.value2
+            _, entry.value = arithmetic_logic_unit(decoded.alu_control, station.value1, second)
+
+    def issue_load(self, station) -> bool:
+        """
+        Issue a load unless an older store may still write the word it reads.
+
+        Args:
+            station (ReservationStationEntry): The load with its base address operand.
+
+        Returns:
+            bool: True if the load issued.
+        """
+        entry = station.entry
+        _, address = arithmetic_logic_unit(entry.decoded.alu_control, station.value1, entry.decoded.imm)
+        forwarded_from = None
+        for older in self.rob:
+            if older is entry:
+                break
+            if not older.decoded or not older.decoded.control_signals["MemWrite"]:
+                continue
+            if not older.done:
+                return False  # its address is not known yet
+            if (older.address - address) & 0xFFFFFFFF < 4 or (address - older.address) & 0xFFFFFFFF < 4:
+                forwarded_from = older
+        if forwarded_from is not None and forwarded_from.address != address:
+            return False  # a partial overlap, the bytes are merged in memory when the store commits
+
+        entry.address = address
+        stall = 0
+        if forwarded_from is not None:
+            entry.value = forwarded_from.store_data
+            self.counters.store_forwards += 1
+        else:
+            entry.value = self.ext_data_memory.read(address)
+            if self.data_cache is not None:
+                stall = self.data_cache.access(address)
+        self.memory_port_free = self.cycle + 1 + stall
+        self.executing.append((self.cycle + 2 + stall, entry))
+        return True
+
+    def dispatch_stage(self):
+        """
+        Rename fetched instructions in program order and place them in the reorder buffer and the reservation stations.
+        """
+        for _ in range(self.width):
+            if self.dispatch_blocked or not self.fetch_queue or self.fetch_queue[0].ready_cycle > self.cycle:
+                return
+            if len(self.rob) == self.rob_entries:
+                self.counters.rob_full_cycles += 1
+                return
+            fetched = self.fetch_queue[0]
+            try:
+                decoded = self.program.decode(fetched.pc, fetched.instr)
+            except ValueError as error:
+                # Possibly on a wrong path, only an error if it commits
+                decoded = None
+                entry = ReorderBufferEntry(self.seq, fetched.pc, fetched.instr, None, fetched.predicted_pc)
+                entry.error = error
+            else:
+                if not decoded.halt and len(self.reservation_stations) == self.rs_entries:
+                    self.counters.rs_full_cycles += 1
+                    return
+                entry = ReorderBufferEntry(self.seq, fetched.pc, fetched.instr, decoded, fetched.predicted_pc)
+                entry.halt = decoded.halt
+            self.fetch_queue.popleft()
+            self.seq += 1
+            self.rob.append(entry)
+            if decoded is None or decoded.halt:
+                entry.done = True
+                self.dispatch_blocked = True
+                self.fetch_queue.clear()
+                return
+
+            control_signals = decoded.control_signals
+            rs1, rs2 = _source_registers(decoded)
+            operands = []
+            for register in (rs1, rs2):
+                producer = self.register_alias_table[register] if register else None
+                if producer is None:
+                    operands += [self.register_file.read(register), None]
+                elif producer.done:
+                    operands += [producer.value, None]
+                else:
+                    operands += [0, producer]
+            self.reservation_stations.append(
+                ReservationStationEntry(entry, operands[0], operands[2], operands[1], operands[3]))
+            if control_signals["RegWrite"] and decoded.rd:
+                entry.dest = decoded.rd
+                self.register_alias_table[decoded.rd] = entry
+
+            if not control_signals["Branch"]:
+                # The next PC of everything but BEQ/BNE is known now
+                entry.next_pc = adder(entry.pc, decoded.imm) if control_signals["JAL"] else adder(4, entry.pc)
+                if entry.next_pc != entry.predicted_pc:
+                    self.fetch_queue.clear()
+                    self.fetch_stall = 0
+                    self.fetch_pc = entry.next_pc
+                    return
+
+    def fetch_stage(self):
+        """
+        Fetch up to `width` instructions along the predicted path, a predicted taken branch ends the group.
+        """
+        if self.dispatch_blocked:
+            return
+        if self.fetch_stall:
+            self.fetch_stall -= 1
+            self.counters.fetch_stall_cycles += 1
+            return
+        for _ in range(self.width):
+            if len(self.fetch_queue) >= 2 * self.width:
+                return
+            pc = self.fetch_pc
+            stall = self.instruction_cache.access(pc) if self.instruction_cache is not None else 0
+            predicted_pc = self.predictor.predict(pc)
+            next_pc = predicted_pc if predicted_pc is not None else adder(4, pc)
+            self.fetch_queue.append(FetchQueueEntry(pc, self.program.fetch(pc), next_pc, self.cycle + 1 + stall))
+            self.fetch_pc = next_pc
+            if stall:
+                self.fetch_stall = stall
+                return
+            if predicted_pc is not None:
+                return
+
+    def printState(self, cycle):
+        """
+        Print the fetch PC and the instructions in flight to StateResult_OO.txt.
+
+        Args:
+            cycle (int): The cycle number.
+        """
+        printstate = ["-" * 70 + "\n", f"State after executing cycle: {cycle}\n",
+                      f"IF.PC: {self.fetch_pc}\n", f"IF.queue: {len(self.fetch_queue)}\n"]
+        waiting = {station.entry for station in self.reservation_stations}
+        for index, entry in enumerate(self.rob):
+            status = "done" if entry.done else "waiting" if entry in waiting else "executing"
+            printstate.append(f"ROB.{index}: PC {entry.pc} {format_binary(entry.instr)} {status} "
+                              f"x{entry.dest} = {format_binary(entry.value)}\n")
+        printstate.append(f"RS: {len(self.reservation_stations)}\n")
+
+        # Write file, the first traced cycle starts it over
+        self.state_trace.write(printstate)
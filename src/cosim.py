@@ -0,0 +1,252 @@
+"""
+Lockstep differential co-simulation: a pipelined core (the DUT) and an architectural reference
+run the same program side by side, and every register write and store of the DUT is checked
+against the reference as it happens, without writing any trace.
+
+The DUT does not retire its instructions in one place (the five stage core completes branches in
+ID and the others in WB), so the comparison is not by retirement count but by architectural
+effect. Two ordered streams are compared:
+  - the register writes the DUT makes through its register file (WB, or commit), and
+  - the stores it makes to its data memory (MEM, or commit),
+each against the same stream of the reference, stepped one instruction at a time just as far as
+needed to produce the DUT's next write. Both streams are in program order in every core of the
+simulator, so the first pair that differs is the first architectural divergence.
+"""
+from collections import deque
+
+from loguru import logger
+
+from src import diagnostics
+from src.core import FunctionalCore
+from src.memory import PAGE_SIZE
+
+
+class CosimMismatch(ValueError):
+    """
+    CosimMismatch is raised at the first register write or store of the DUT that differs from the reference.
+    """
+
+    def __init__(self, instruction: int, pc: int, instr: int, cycle: int, what: str, expected, actual):
+        """
+        Initialize the CosimMismatch.
+
+        Args:
+            instruction (int): The number of the reference instruction, from 1, whose effect differs.
+            pc (int): Its address.
+            instr (int): Its 32-bit instruction.
+            cycle (int): The DUT cycle in which the difference was found.
+            what (str): The register (`x5`), `store`, or the memory word (`memory[0x40]`) that differs.
+            expected: The reference's value, None if it has no such write.
+            actual: The DUT's value, None if it has no such write.
+        """
+        self.instruction = instruction
+        self.pc = pc
+        self.instr = instr
+        self.cycle = cycle
+        self.what = what
+        self.expected = expected
+        self.actual = actual
+        where = f"instruction {instruction} (PC {pc}, {instr:#010x})" if instr is not None else "the end of the run"
+        super(CosimMismatch, self).__init__(
+            f"First mismatch at {where}, cycle {cycle}: {what}: expected {expected}, got {actual}")
+
+
+def _register_write(register: int, value: int) -> str:
+    return f"x{register} = {value:#x}"
+
+
+def _store(address: int, data: int) -> str:
+    return f"[{address:#x}] = {data:#x}"
+
+
+class Cosimulation(object):
+    """
+    Cosimulation steps a DUT and a reference core in lockstep, see the module description.
+
+    Both cores are built on their own DataMemory loaded from the same dmem.txt, and must not have
+    been stepped yet. The DUT is a FiveStageCore, a DualIssueCore or an OutOfOrderCore, the
+    reference a FunctionalCore or a SingleStageCore.
+    """
+
+    def __init__(self, dut, reference):
+        """
+        Initialize the Cosimulation and tap the register file and data memory writes of both cores.
+
+        Args:
+            dut (Core): The core under test.
+            reference (FunctionalCore | SingleStageCore): The architectural reference.
+        """
+        self.dut = dut
+        self.reference = reference
+        self.program = reference.program
+        self.dut_writes = deque()
+        """ Register writes of the DUT not compared yet: (register, value) """
+        self.dut_stores = deque()
+        """ Stores of the DUT not compared yet: (address, data) """
+        self.reference_writes = deque()
+        """ Register writes of the reference not compared yet: (register, value, instruction, pc, instr) """
+        self.reference_stores = deque()
+        """ Stores of the reference not compared yet: (address, data, instruction, pc, instr) """
+        self.instructions = 0
+        """ Instructions the reference executed, HALT excluded """
+        self.compared = 0
+        """ Register writes and stores compared """
+
+        register_file_write = dut.register_file.write
+
+        def tap_register_write(reg_addr, write_reg_data):
+            if reg_addr:
+                self.dut_writes.append((reg_addr, write_reg_data & 0xFFFFFFFF))
+            register_file_write(reg_addr, write_reg_data)
+
+        dut.register_file.write = tap_register_write
+        self.tap_stores(dut.ext_data_memory, self.dut_stores.append)
+        self.reference_store = None
+        """ The store made by the reference instruction being stepped """
+        self.tap_stores(reference.ext_data_memory, self.record_reference_store)
+
+    @staticmethod
+    def tap_stores(data_memory, record):
+        """
+        Record every store to a data memory, before it is performed.
+
+        Args:
+            data_memory (DataMemory): The data memory of one of the cores.
+            record (callable): Called with (address, data) of each store.
+        """
+        data_memory_write = data_memory.write
+
+        def tap_store(address, data):
+            record((address & 0xFFFFFFFF, data & 0xFFFFFFFF))
+            data_memory_write(address, data)
+
+        data_memory.write = tap_store
+
+    def record_reference_store(self, store):
+        self.reference_store = store
+
+    def reference_pc(self) -> int:
+        """The address of the next instruction of the reference."""
+        if isinstance(self.reference, FunctionalCore):
+            return self.reference.pc
+        return self.reference.state.IF.PC
+
+    def step_reference(self) -> bool:
+        """
+        Execute the next instruction of the reference and queue its register write and store.
+
+        Returns:
+            bool: False if the next instruction is HALT, which is left unexecuted.
+        """
+        pc = self.reference_pc()
+        decoded = self.program.at(pc)
+        if decoded.halt:
+            return False
+        self.reference_store = None
+        self.reference.step()
+        self.instructions += 1
+        if decoded.control_signals["RegWrite"] and decoded.rd:
+            value = self.reference.register_file.Registers[decoded.rd] & 0xFFFFFFFF
+            self.reference_writes.append((decoded.rd, value, self.instructions, pc, decoded.instr))
+        if self.reference_store is not None:
+            self.reference_stores.append(self.reference_store + (self.instructions, pc, decoded.instr))
+        return True
+
+    def compare(self, actual_queue, expected_queue, name, describe):
+        """
+        Compare the DUT's writes of one stream with the reference's, stepping the reference as far as needed.
+
+        Args:
+            actual_queue (deque): The DUT's stream.
+            expected_queue (deque): The reference's stream.
+            name (str): The stream, `register` or `store`.
+            describe (callable): Formats one write of the stream.
+
+        Raises:
+            CosimMismatch: A write differs, or the DUT writes after the reference reached HALT.
+        """
+        while actual_queue:
+            if not expected_queue:
+                if not self.step_reference():
+                    actual = describe(*actual_queue[0])
+                    raise CosimMismatch(self.instructions + 1, self.reference_pc(), 0xFFFFFFFF, self.dut.cycle - 1,
+                                        f"{name} write after HALT", None, actual)
+                continue
+            actual = actual_queue.popleft()
+            expected = expected_queue.popleft()
+            if actual != expected[:2]:
+                what = f"x{expected[0]}" if name == "register" and actual[0] == expected[0] else name
+                raise CosimMismatch(expected[2], expected[3], expected[4], self.dut.cycle - 1, what,
+                                    describe(*expected[:2]), describe(*actual))
+            self.compared += 1
+
+    def step(self):
+        """
+        Execute one cycle of the DUT and check the register writes and stores it made.
+        """
+        self.dut.step()
+        self.compare(self.dut_writes, self.reference_writes, "register", _register_write)
+        self.compare(self.dut_stores, self.reference_stores, "store", _store)
+
+    def run(self) -> int:
+        """
+        Step both cores until the DUT halts, then check that the reference halts with the same state.
+
+        Returns:
+            int: Instructions executed, HALT excluded.
+
+        Raises:
+            CosimMismatch: At the first difference.
+        """
+        try:
+            while not self.dut.halted:
+                self.step()
+            self.finish()
+        finally:
+            self.dut.close()
+            self.reference.close()
+        if diagnostics.VERBOSE:
+            logger.info(f"Co-simulation matched {self.compared} register writes and stores "
+                        f"of {self.instructions} instructions in {self.dut.cycle} cycles")
+        return self.instructions
+
+    def finish(self):
+        """
+        Check the end of the run: the reference makes no further write before HALT, and the final
+        register files and data memories are equal.
+
+        Raises:
+            CosimMismatch: The reference has writes the DUT never made, or the final states differ.
+        """
+        cycle = self.dut.cycle - 1
+        while self.step_reference():
+            pass
+        for expected_queue, name, describe in ((self.reference_writes, "register", _register_write),
+                                               (self.reference_stores, "store", _store)):
+            if expected_queue:
+                expected = expected_queue[0]
+                raise CosimMismatch(expected[2], expected[3], expected[4], cycle, f"missing {name} write",
+                                    describe(*expected[:2]), None)
+        while not self.reference.halted:
+            self.reference.step()
+
+        expected_registers = self.reference.register_file.Registers
+        actual_registers = self.dut.register_file.Registers
+        for register in range(32):
+            expected, actual = expected_registers[register] & 0xFFFFFFFF, actual_registers[register] & 0xFFFFFFFF
+            if expected != actual:
+                raise CosimMismatch(self.instructions, self.reference_pc(), None, cycle, f"final x{register}",
+                                    f"{expected:#x}", f"{actual:#x}")
+
+        expected_memory, actual_memory = self.reference.ext_data_memory, self.dut.ext_data_memory
+        for page_number in sorted(set(expected_memory.pages) | set(actual_memory.pages)):
+            address = page_number * PAGE_SIZE
+            expected_page = expected_memory.read_bytes(address, PAGE_SIZE)
+            actual_page = actual_memory.read_bytes(address, PAGE_SIZE)
+            if expected_page == actual_page:
+                continue
+            offset = next(index for index in range(0, PAGE_SIZE, 4)
+                          if expected_page[index: index + 4] != actual_page[index: index + 4])
+            raise CosimMismatch(self.instructions, self.reference_pc(), None, cycle,
+                                f"final memory[{address + offset:#x}]", f"0x{expected_page[offset: offset + 4].hex()}",
+                                f"0x{actual_page[offset: offset + 4].hex()}")
@@ -0,0 +1,138 @@
+class PerformanceCounters(object):
+    """
+    PerformanceCounters attributes the cycles of the five stage core.
+
+    The retired instruction count is the core's own `retired` attribute, the counters here say
+    where the other cycles go. Every counter is a plain int, incremented by the stage that sees
+    the event.
+    """
+
+    fields = ("load_use_stall_cycles", "branch_flush_cycles", "jal_flush_cycles", "drain_cycles",
+              "memory_stall_cycles", "branches", "jals", "ex_forward_ex_mem", "ex_forward_mem_wb",
+              "branch_forward_ex_mem", "branch_forward_mem_wb")
+    __slots__ = fields
+
+    def __init__(self):
+        self.load_use_stall_cycles = 0
+        """ Cycles ID is held by hazard_detection_unit, a load is followed by a use of its result """
+        self.branch_flush_cycles = 0
+        """ Fetches discarded because ID found a BEQ/BNE mispredicted """
+        self.jal_flush_cycles = 0
+        """ Fetches discarded because ID found a JAL mispredicted """
+        self.drain_cycles = 0
+        """ Cycles after HALT was fetched, while the pipeline empties """
+        self.memory_stall_cycles = 0
+        """ Cycles the whole pipeline waits for an instruction or data cache miss """
+        self.branches = 0
+        """ BEQ/BNE resolved in ID, each is either predicted right or costs one branch flush cycle """
+        self.jals = 0
+        """ JALs resolved in ID """
+        self.ex_forward_ex_mem = 0
+        """ EX operands taken from the EX/MEM register (forwarding_unit, 0b10) """
+        self.ex_forward_mem_wb = 0
+        """ EX operands taken from the MEM/WB register (forwarding_unit, 0b01) """
+        self.branch_forward_ex_mem = 0
+        """ Branch comparison operands taken from the EX/MEM register (forwarding_unit_for_branch, 0b10) """
+        self.branch_forward_mem_wb = 0
+        """ Branch comparison operands taken from the MEM/WB register (forwarding_unit_for_branch, 0b01) """
+
+    def count_forwarding(self, forward_a, forward_b, branch=False):
+        """
+        Count the operands a forwarding unit took from a pipeline register.
+
+        Args:
+            forward_a (int): The forwarding unit's selection for the first operand.
+            forward_b (int): The forwarding unit's selection for the second operand.
+            branch (bool): The selection was made for a branch comparison in ID, not for EX.
+        """
+        for forward in (forward_a, forward_b):
+            if forward == 0b10:
+                if branch:
+                    self.branch_forward_ex_mem += 1
+                else:
+                    self.ex_forward_ex_mem += 1
+            elif forward == 0b01:
+                if branch:
+                    self.branch_forward_mem_wb += 1
+                else:
+                    self.ex_forward_mem_wb += 1
+
+    def values(self):
+        return [getattr(self, name) for name in self.fields]
+
+    def restore(self, values):
+        for name, value in zip(self.fields, values):
+            setattr(self, name, value)
+
+
+class DualIssueCounters(PerformanceCounters):
+    """
+    DualIssueCounters adds the issue statistics of the two-wide DualIssueCore.
+
+    The counters inherited from PerformanceCounters keep their meaning; load-use stall cycles are
+    the cycles ID issues nothing because the older instruction waits for a load.
+    """
+
+    fields = PerformanceCounters.fields + ("dual_issue_cycles", "split_dependence", "split_memory_port",
+                                           "split_branch_unit")
+    __slots__ = fields[len(PerformanceCounters.fields):]
+
+    def __init__(self):
+        super(DualIssueCounters, self).__init__()
+        self.dual_issue_cycles = 0
+        """ Cycles ID issued two instructions """
+        self.split_dependence = 0
+        """ Younger instructions held back because they read a result of the older one, or of a load in EX """
+        self.split_memory_port = 0
+        """ Younger instructions held back because both are loads or stores, there is one data memory port """
+        self.split_branch_unit = 0
+        """ Younger instructions held back because both are branches or JALs, ID resolves one per cycle """
+
+
+class OutOfOrderCounters(object):
+    """
+    OutOfOrderCounters describes where the cycles of the out-of-order core go, and how full its buffers are.
+
+    The retired instruction count is the core's own `retired` attribute. The occupancies are sums
+    over all cycles, divided by the cycle count in the report.
+    """
+
+    fields = ("rob_occupancy", "rs_occupancy", "rob_full_cycles", "rs_full_cycles", "empty_commit_cycles",
+              "branches", "jals", "branch_mispredictions", "jal_mispredictions", "squashed", "store_forwards",
+              "fetch_stall_cycles", "commit_stall_cycles")
+    __slots__ = fields
+
+    def __init__(self):
+        self.rob_occupancy = 0
+        """ Reorder buffer entries in use, summed over the cycles """
+        self.rs_occupancy = 0
+        """ Reservation station entries in use, summed over the cycles """
+        self.rob_full_cycles = 0
+        """ Cycles dispatch stopped because the reorder buffer was full """
+        self.rs_full_cycles = 0
+        """ Cycles dispatch stopped because every reservation station was in use """
+        self.empty_commit_cycles = 0
+        """ Cycles nothing committed """
+        self.branches = 0
+        """ BEQ/BNE committed """
+        self.jals = 0
+        """ JALs committed """
+        self.branch_mispredictions = 0
+        """ Committed BEQ/BNE fetched with a wrong prediction, each squashed the younger instructions """
+        self.jal_mispredictions = 0
+        """ Committed JALs fetched with a wrong prediction, each redirected the fetch at dispatch """
+        self.squashed = 0
+        """ Instructions removed from the reorder buffer by a misprediction """
+        self.store_forwards = 0
+        """ Loads that took their value from an older store waiting to commit """
+        self.fetch_stall_cycles = 0
+        """ Cycles fetch waited for an instruction cache miss """
+        self.commit_stall_cycles = 0
+        """ Cycles commit waited for a data cache miss of a store """
+
+    def values(self):
+        return [getattr(self, name) for name in self.fields]
+
+    def restore(self, values):
+        for name, value in zip(self.fields, values):
+            setattr(self, name, value)
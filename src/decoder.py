@@ -0,0 +1,143 @@
+from loguru import logger
+
+from src import diagnostics
+from src.components import alu_control_unit, control_unit, control_unit_for_single_stage, imm_gen
+
+
+class DecodedInstruction(object):
+    """
+    DecodedInstruction holds everything the decode logic derives from one static instruction word.
+
+    The fields are exactly what the cores used to re-extract every cycle: register fields,
+    the ALU control function code, the immediate, the control signals of both control units
+    and the 4-bit ALU control code.
+    """
+
+    __slots__ = ("instr", "opcode", "rs1", "rs2", "rd", "func3", "alu_control_func", "bne_func", "imm",
+                 "control_signals", "single_stage_control_signals", "halt", "alu_control")
+
+    def __init__(self, instr: int):
+        """
+        Decode an instruction.
+
+        Args:
+            instr (int): The 32-bit instruction.
+        """
+        self.instr = instr
+        self.opcode = instr & 0x7F
+        # See comments in state.py to see more information
+        self.rs1 = (instr >> 15) & 0x1F  # bits [19:15]
+        self.rs2 = (instr >> 20) & 0x1F  # bits [24:20]
+        self.rd = (instr >> 7) & 0x1F  # bits [11:7]
+
+        # Instruction [30, 14-12] handling
+        func7_bit = (instr >> 30) & 0b1
+        self.func3 = (instr >> 12) & 0b111
+        alu_control_func = (func7_bit << 3) | self.func3
+        # special ALU handling, if I-type, omit the func7 bit
+        # I didn't find this in the book, without this, ALU cannot work on I-type
+        if self.opcode == 19:  # I-type
+            alu_control_func = alu_control_func & 0b111
+        self.alu_control_func = alu_control_func
+
+        # the function code to determine if the instruction is a BEQ or BNE
+        self.bne_func = alu_control_func & 0x1
+
+        self.imm = imm_gen(opcode=self.opcode, instr=instr)
+
+        self.control_signals, self.halt = control_unit(self.opcode)
+        self.single_stage_control_signals, _ = control_unit_for_single_stage(self.opcode)
+
+        # ALUOp is identical for both control units, so one ALU control code serves both cores
+        self.alu_control = alu_control_unit(self.control_signals["ALUOp"], alu_control_func)
+
+
+class ProgramTable(object):
+    """
+    ProgramTable decodes the instruction memory once and serves decoded instructions by PC.
+
+    Words are read from the instruction memory on construction; an instruction is decoded the
+    first time it is needed, so words that are never executed (data, garbage after HALT) are
+    never passed through the control unit.
+    """
+
+    def __init__(self, instruction_memory):
+        """
+        Initialize the ProgramTable.
+
+        Args:
+            instruction_memory (InstructionMemory): The instruction memory to decode.
+        """
+        self.instruction_memory = instruction_memory
+        self.words = [instruction_memory.read(pc) for pc in range(0, len(instruction_memory.i_mem), 4)]
+        self.table = [None] * len(self.words)
+        self.by_word = {}
+        """ Decoded instructions keyed by instruction word, for words not fetched from an aligned PC """
+
+    def fetch(self, pc: int) -> int:
+        """
+        Fetch an instruction word.
+
+        Args:
+            pc (int): The address to fetch from.
+
+        Returns:
+            int: The 32-bit instruction.
+        """
+        if pc & 0b11 == 0 and (pc >> 2) < len(self.words):
+            return self.words[pc >> 2]
+        return self.instruction_memory.read(pc)
+
+    def at(self, pc: int) -> DecodedInstruction:
+        """
+        Fetch and decode the instruction at a PC.
+
+        Args:
+            pc (int): The address to fetch from.
+
+        Returns:
+            DecodedInstruction: The decoded instruction.
+        """
+        index = pc >> 2
+        if pc & 0b11 == 0 and index < len(self.words):
+            decoded = self.table[index]
+            if decoded is None:
+                decoded = self.table[index] = self.decode_word(self.words[index])
+            return decoded
+        return self.decode_word(self.instruction_memory.read(pc))
+
+    def decode(self, pc: int, instr: int) -> DecodedInstruction:
+        """
+        Return the decoded form of the instruction held in the IF/ID pipeline register.
+
+        Args:
+            pc (int): The address the instruction was fetched from.
+            instr (int): The 32-bit instruction.
+
+        Returns:
+            DecodedInstruction: The decoded instruction.
+        """
+        index = pc >> 2
+        if pc & 0b11 == 0 and index < len(self.words) and self.words[index] == instr:
+            decoded = self.table[index]
+            if decoded is None:
+                decoded = self.table[index] = self.decode_word(instr)
+            return decoded
+        return self.decode_word(instr)
+
+    def decode_word(self, instr: int) -> DecodedInstruction:
+        """
+        Decode an instruction word, reusing a previous decode of the same word.
+
+        Args:
+            instr (int): The 32-bit instruction.
+
+        Returns:
+            DecodedInstruction: The decoded instruction.
+        """
+        decoded = self.by_word.get(instr)
+        if decoded is None:
+            if diagnostics.VERBOSE:
+                logger.debug(f"Decoding instruction: {instr:032b}")
+            decoded = self.by_word[instr] = DecodedInstruction(instr)
+        return decoded
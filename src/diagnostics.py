@@ -0,0 +1,22 @@
+"""
+Switch for the per-cycle diagnostic logging of the simulator.
+
+Every per-cycle `logger.debug/info/warning` call in the simulator sits behind
+`if diagnostics.VERBOSE:`, so its f-string is only built when the message is wanted.
+In fast mode the whole block is skipped and costs a single flag check.
+Errors are always logged.
+"""
+
+VERBOSE = True
+""" Verbose (the default): log every component invocation. Fast: skip all per-cycle messages. """
+
+
+def set_verbose(enabled: bool):
+    """
+    Select verbose or fast logging. Call it at startup, before the cores run.
+
+    Args:
+        enabled (bool): True for verbose, False for fast mode.
+    """
+    global VERBOSE
+    VERBOSE = enabled
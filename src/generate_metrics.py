@@ -1,5 +1,7 @@
 from pathlib import Path
 
+from src.counters import DualIssueCounters
+
 
 def generate_metrics(perm, head_cont, cycles, tot_ins, io_dir: Path):
     if cycles == 0:
@@ -14,3 +16,128 @@ def generate_metrics(perm, head_cont, cycles, tot_ins, io_dir: Path):
 
     with open(file_path, perm) as wf:
         wf.writelines(content)
+
+
+def _share(count, cycles):
+    return f"{count} ({100 * count / cycles:.2f}% of cycles)"
+
+
+def _accuracy(total, mispredicted):
+    return f"{(100 * (total - mispredicted) / total):.2f}%" if total else "n/a"
+
+
+def generate_counters(head_cont, cycles, retired, counters, predictor, io_dir: Path, perm="w"):
+    if cycles == 0:
+        return
+    file_path = io_dir / "PerformanceCounters_Result.txt"
+
+    content = [head_cont + "\n",
+               f"Number of cycles taken: {cycles}\n",
+               f"Retired instructions (HALT excluded): {retired}\n",
+               f"Load-use stall cycles: {_share(counters.load_use_stall_cycles, cycles)}\n",
+               f"Branch flush cycles: {_share(counters.branch_flush_cycles, cycles)}\n",
+               f"JAL flush cycles: {_share(counters.jal_flush_cycles, cycles)}\n",
+               f"Drain cycles after HALT: {_share(counters.drain_cycles, cycles)}\n",
+               f"Cache miss stall cycles: {_share(counters.memory_stall_cycles, cycles)}\n",
+               f"Branch predictor: {predictor.describe()}\n",
+               f"Conditional branches: {counters.branches}, mispredicted: {counters.branch_flush_cycles}, "
+               f"accuracy: {_accuracy(counters.branches, counters.branch_flush_cycles)}\n",
+               f"JALs: {counters.jals}, mispredicted: {counters.jal_flush_cycles}, "
+               f"accuracy: {_accuracy(counters.jals, counters.jal_flush_cycles)}\n",
+               f"Operands forwarded from EX/MEM to EX: {counters.ex_forward_ex_mem}\n",
+               f"Operands forwarded from MEM/WB to EX: {counters.ex_forward_mem_wb}\n",
+               f"Operands forwarded from EX/MEM to a branch in ID: {counters.branch_forward_ex_mem}\n",
+               f"Operands forwarded from MEM/WB to a branch in ID: {counters.branch_forward_mem_wb}\n"]
+    if isinstance(counters, DualIssueCounters):
+        content += [f"Dual issue cycles: {_share(counters.dual_issue_cycles, cycles)}\n",
+                    f"Pairs split by a data dependence: {counters.split_dependence}\n",
+                    f"Pairs split by the single data memory port: {counters.split_memory_port}\n",
+                    f"Pairs split by the single branch unit: {counters.split_branch_unit}\n"]
+    content.append("\n")
+
+    with open(file_path, perm) as wf:
+        wf.writelines(content)
+
+
+def generate_out_of_order_counters(head_cont, cycles, retired, counters, predictor, io_dir: Path, perm="w"):
+    if cycles == 0:
+        return
+    file_path = io_dir / "PerformanceCounters_Result.txt"
+
+    content = [head_cont + "\n",
+               f"Number of cycles taken: {cycles}\n",
+               f"Retired instructions (HALT excluded): {retired}\n",
+               f"Retired instructions per cycle: {(retired / cycles):.6}\n",
+               f"Average reorder buffer occupancy: {(counters.rob_occupancy / cycles):.2f}\n",
+               f"Average reservation station occupancy: {(counters.rs_occupancy / cycles):.2f}\n",
+               f"Dispatch stalled on a full reorder buffer: {_share(counters.rob_full_cycles, cycles)}\n",
+               f"Dispatch stalled on full reservation stations: {_share(counters.rs_full_cycles, cycles)}\n",
+               f"Cycles without a commit: {_share(counters.empty_commit_cycles, cycles)}\n",
+               f"Instruction cache miss stall cycles: {_share(counters.fetch_stall_cycles, cycles)}\n",
+               f"Store data cache miss stall cycles: {_share(counters.commit_stall_cycles, cycles)}\n",
+               f"Branch predictor: {predictor.describe()}\n",
+               f"Conditional branches: {counters.branches}, mispredicted: {counters.branch_mispredictions}, "
+               f"accuracy: {_accuracy(counters.branches, counters.branch_mispredictions)}\n",
+               f"JALs: {counters.jals}, mispredicted: {counters.jal_mispredictions}, "
+               f"accuracy: {_accuracy(counters.jals, counters.jal_mispredictions)}\n",
+               f"Squashed instructions: {counters.squashed}\n",
+               f"Loads forwarded from a store in flight: {counters.store_forwards}\n\n"]
+
+    with open(file_path, perm) as wf:
+        wf.writelines(content)
+
+
+def generate_cache_metrics(caches, io_dir: Path):
+    if not caches:
+        return
+    file_path = io_dir / "PerformanceMetrics_Result.txt"
+
+    content = []
+    for cache in caches:
+        hit_rate = f"{(100 * (cache.accesses - cache.misses) / cache.accesses):.2f}%" if cache.accesses else "n/a"
+        content += [f"{cache.name} ({cache.describe()})\n",
+                    f"Accesses: {cache.accesses} (reads: {cache.reads}, writes: {cache.writes})\n",
+                    f"Misses: {cache.misses} (read misses: {cache.read_misses}, "
+                    f"write misses: {cache.write_misses})\n",
+                    f"Hit rate: {hit_rate}\n",
+                    f"Writebacks: {cache.writebacks}, write-through stores: {cache.memory_writes}\n",
+                    f"Stall cycles: {cache.stall_cycles}\n\n"]
+
+    with open(file_path, "a") as wf:
+        wf.writelines(content)
+
+
+def generate_memory_port_metrics(arbiter, cycles, io_dir: Path):
+    if cycles == 0:
+        return
+    file_path = io_dir / "PerformanceMetrics_Result.txt"
+
+    content = [f"Shared Data Memory ({arbiter.ports} port(s), {arbiter.arbitration} arbitration)\n",
+               f"Cycles with a request waiting for a port: {arbiter.contended_cycles} "
+               f"({100 * arbiter.contended_cycles / cycles:.2f}% of cycles)\n"]
+    for core, (accesses, wait_cycles) in enumerate(zip(arbiter.accesses, arbiter.wait_cycles)):
+        content.append(f"Core {core}: accesses: {accesses}, cycles waiting for a port: {wait_cycles}\n")
+    content.append("\n")
+
+    with open(file_path, "a") as wf:
+        wf.writelines(content)
+
+
+def generate_batch_metrics(batch, io_dir: Path):
+    file_path = io_dir / "PerformanceMetrics_Result.txt"
+    instances = len(batch.instance_dirs)
+    instructions = sum(batch.instructions(index) for index in range(instances) if index not in batch.errors)
+
+    content = ["Batch Simulation Summary\n",
+               f"Instances: {instances} (halted: {instances - len(batch.errors)}, "
+               f"handed off to a functional core: {len(batch.handed_off)}, failed: {len(batch.errors)})\n",
+               f"Batch window: {batch.window_size} bytes per instance\n",
+               f"Total Number of Instructions: {instructions}\n",
+               f"Batch steps: {batch.steps}\n",
+               f"Instances per step: {(batch.lanes / batch.steps if batch.steps else 0):.2f}\n"]
+    for index in sorted(batch.errors):
+        content.append(f"Failed: {batch.instance_dirs[index].name}: {batch.errors[index]}\n")
+    content.append("\n")
+
+    with open(file_path, "w") as wf:
+        wf.writelines(content)
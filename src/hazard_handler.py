@@ -2,6 +2,7 @@ from typing import Tuple
 
 from loguru import logger
 
+from src import diagnostics
 from src.components import multiplexer
 from src.state import State
 
@@ -23,35 +24,36 @@ def forwarding_unit(state: State, next_state: State) -> (int, int):
     hint_b = "EX"
 
     # EX/MEM forwarding (highest priority)
-    if (next_state.MEM["wrt_enable"] and
-            next_state.MEM["Wrt_reg_addr"] != 0 and
-            next_state.MEM["Wrt_reg_addr"] == next_state.EX["Rs"]):
+    if (next_state.MEM.wrt_enable and
+            next_state.MEM.Wrt_reg_addr != 0 and
+            next_state.MEM.Wrt_reg_addr == next_state.EX.Rs):
         forward_a = 0b10
         hint_a = "MEM"
-    if (next_state.MEM["wrt_enable"] and
-            next_state.MEM["Wrt_reg_addr"] != 0 and
-            next_state.MEM["Wrt_reg_addr"] == next_state.EX["Rt"]):
+    if (next_state.MEM.wrt_enable and
+            next_state.MEM.Wrt_reg_addr != 0 and
+            next_state.MEM.Wrt_reg_addr == next_state.EX.Rt):
         forward_b = 0b10
         hint_b = "MEM"
 
     # MEM/WB forwarding (only if EX/MEM does not handle it)
-    if (state.WB["wrt_enable"] and
-            state.WB["Wrt_reg_addr"] != 0 and
-            not (next_state.MEM["wrt_enable"] and
-                 next_state.MEM["Wrt_reg_addr"] == next_state.EX["Rs"]) and
-            state.WB["Wrt_reg_addr"] == next_state.EX["Rs"]):
+    if (state.WB.wrt_enable and
+            state.WB.Wrt_reg_addr != 0 and
+            not (next_state.MEM.wrt_enable and
+                 next_state.MEM.Wrt_reg_addr == next_state.EX.Rs) and
+            state.WB.Wrt_reg_addr == next_state.EX.Rs):
         forward_a = 0b01
         hint_a = "WB"
 
-    if (state.WB["wrt_enable"] and
-            state.WB["Wrt_reg_addr"] != 0 and
-            not (next_state.MEM["wrt_enable"] and
-                 next_state.MEM["Wrt_reg_addr"] == next_state.EX["Rt"]) and
-            state.WB["Wrt_reg_addr"] == next_state.EX["Rt"]):
+    if (state.WB.wrt_enable and
+            state.WB.Wrt_reg_addr != 0 and
+            not (next_state.MEM.wrt_enable and
+                 next_state.MEM.Wrt_reg_addr == next_state.EX.Rt) and
+            state.WB.Wrt_reg_addr == next_state.EX.Rt):
         forward_b = 0b01
         hint_b = "WB"
 
-    logger.debug(f"Forwarding: {forward_a:#b} (Source:{hint_a}), {forward_b:#b} (Source:{hint_b})")
+    if diagnostics.VERBOSE:
+        logger.debug(f"Forwarding: {forward_a:#b} (Source:{hint_a}), {forward_b:#b} (Source:{hint_b})")
 
     return forward_a, forward_b
 
@@ -66,18 +68,21 @@ def hazard_detection_unit(state: State) -> Tuple[bool, bool, bool]:
     :return: A tuple (PCWrite, IDWrite, stall) indicating whether to write to the PC,
              whether to write to the ID stage, and whether a stall is needed.
     """
-    logger.debug(f"previous EX.rd_mem: {state.EX["rd_mem"]}, previous EX.Rd(Wrt_reg_addr): {state.EX["Wrt_reg_addr"]}")
-    logger.debug(f"current EX.Rs1: {state.EX["Rs"]}, current EX.Rs2(Rt): {state.EX["Rt"]}")
-
-    if (state.EX["rd_mem"] and
-            state.EX["Wrt_reg_addr"] != 0 and
-            (state.EX["Wrt_reg_addr"] == state.EX["Rs"] or
-             state.EX["Wrt_reg_addr"] == state.EX["Rt"])):
+    if diagnostics.VERBOSE:
+        logger.debug(f"previous EX.rd_mem: {state.EX.rd_mem}, previous EX.Rd(Wrt_reg_addr): {state.EX.Wrt_reg_addr}")
+        logger.debug(f"current EX.Rs1: {state.EX.Rs}, current EX.Rs2(Rt): {state.EX.Rt}")
+
+    if (state.EX.rd_mem and
+            state.EX.Wrt_reg_addr != 0 and
+            (state.EX.Wrt_reg_addr == state.EX.Rs or
+             state.EX.Wrt_reg_addr == state.EX.Rt)):
         stall = True
-        logger.warning("Hazard Detected.")
+        if diagnostics.VERBOSE:
+            logger.warning("Hazard Detected.")
     else:
         stall = False
-        logger.info("No Hazard Detected.")
+        if diagnostics.VERBOSE:
+            logger.info("No Hazard Detected.")
 
     PCWrite = not stall
     IDWrite = not stall
@@ -98,32 +103,74 @@ def forwarding_unit_for_branch(rs1: int, rs2: int, state: State, next_state: Sta
     forward_b = 0b00
 
     # EX/MEM forwarding (highest priority)
-    if (next_state.MEM["wrt_enable"] and
-            next_state.MEM["Wrt_reg_addr"] != 0 and
-            next_state.MEM["Wrt_reg_addr"] == rs1):
+    if (next_state.MEM.wrt_enable and
+            next_state.MEM.Wrt_reg_addr != 0 and
+            next_state.MEM.Wrt_reg_addr == rs1):
         forward_a = 0b10
-    if (next_state.MEM["wrt_enable"] and
-            next_state.MEM["Wrt_reg_addr"] != 0 and
-            next_state.MEM["Wrt_reg_addr"] == rs2):
+    if (next_state.MEM.wrt_enable and
+            next_state.MEM.Wrt_reg_addr != 0 and
+            next_state.MEM.Wrt_reg_addr == rs2):
         forward_b = 0b10
 
     # MEM/WB forwarding (only if EX/MEM does not handle it)
-    if (next_state.WB["wrt_enable"] and
-            next_state.WB["Wrt_reg_addr"] != 0 and
-            not (next_state.MEM["wrt_enable"] and
-                 next_state.MEM["Wrt_reg_addr"] == rs1) and
-            next_state.WB["Wrt_reg_addr"] == rs1):
+    if (next_state.WB.wrt_enable and
+            next_state.WB.Wrt_reg_addr != 0 and
+            not (next_state.MEM.wrt_enable and
+                 next_state.MEM.Wrt_reg_addr == rs1) and
+            next_state.WB.Wrt_reg_addr == rs1):
         forward_a = 0b01
-    if (next_state.WB["wrt_enable"] and
-            next_state.WB["Wrt_reg_addr"] != 0 and
-            not (next_state.MEM["wrt_enable"] and
-                 next_state.MEM["Wrt_reg_addr"] == rs2) and
-            next_state.WB["Wrt_reg_addr"] == rs2):
+    if (next_state.WB.wrt_enable and
+            next_state.WB.Wrt_reg_addr != 0 and
+            not (next_state.MEM.wrt_enable and
+                 next_state.MEM.Wrt_reg_addr == rs2) and
+            next_state.WB.Wrt_reg_addr == rs2):
         forward_b = 0b01
 
     return forward_a, forward_b
 
 
+def forwarding_unit_dual_issue(rs: int, ex_mem, mem_wb) -> Tuple[int, int]:
+    """
+    Determines the forwarding path of one source operand in the two-wide pipeline.
+
+    The widened forwarding_unit: both lanes of the EX/MEM and MEM/WB registers are compared with
+    the source register, and the newest result wins. EX/MEM has priority over MEM/WB and, within
+    a register, lane 1 (the younger instruction of its issue pair) over lane 0.
+
+    :param rs: The source register, 0 when the instruction has no such operand.
+    :param ex_mem: The EX/MEM pipeline registers of lane 0 and lane 1.
+    :param mem_wb: The MEM/WB pipeline registers of lane 0 and lane 1.
+    :return: A tuple (forward, lane): 0b10 from EX/MEM, 0b01 from MEM/WB or 0b00 from the register file,
+             and the lane the value comes from.
+    """
+    if rs != 0:
+        for forward, registers, field in ((0b10, ex_mem, "ALUresult"), (0b01, mem_wb, "Wrt_data")):
+            for lane in (1, 0):
+                if registers[lane].wrt_enable and registers[lane].Wrt_reg_addr == rs:
+                    if diagnostics.VERBOSE:
+                        logger.debug(f"Forwarding x{rs}: {forward:#b} (lane {lane} {field})")
+                    return forward, lane
+    return 0b00, 0
+
+
+def hazard_detection_unit_dual_issue(id_ex, rs1: int, rs2: int) -> bool:
+    """
+    Detects a load-use hazard between an instruction in ID and both lanes of the ID/EX register.
+
+    :param id_ex: The ID/EX pipeline registers of lane 0 and lane 1, the instructions in EX this cycle.
+    :param rs1: The first source register of the instruction in ID, 0 when it has none.
+    :param rs2: The second source register of the instruction in ID, 0 when it has none.
+    :return: True if the instruction must wait a cycle for the loaded value.
+    """
+    for register in id_ex:
+        if (not register.nop and register.rd_mem and register.Wrt_reg_addr != 0 and
+                register.Wrt_reg_addr in (rs1, rs2)):
+            if diagnostics.VERBOSE:
+                logger.warning("Hazard Detected.")
+            return True
+    return False
+
+
 # Simulate different states of the State class
 from unittest import TestCase
 
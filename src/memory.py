@@ -1,12 +1,61 @@
+import struct
 from pathlib import Path
 
 from loguru import logger
 
+from src import diagnostics
+
 # memory.py size, in reality, the memory.py size should be 2^32,
 # but for this lab, for the space resaon, we keep it as this large number,
 # but the memory.py is still 32-bit addressable.
+# DataMemory covers the full 2^32 bytes with sparse pages, MEM_SIZE is the window dumped to DMEMResult.txt.
 MEM_SIZE = 1000
 
+ADDRESS_SPACE = 1 << 32
+
+PAGE_BITS = 12
+PAGE_SIZE = 1 << PAGE_BITS  # 4 KiB
+PAGE_MASK = PAGE_SIZE - 1
+
+WORD = struct.Struct(">I")
+""" A 32-bit word, stored most significant byte first (the first line of a memory file is the MSB) """
+
+BYTE_LINES = [f"{byte:08b}\n" for byte in range(256)]
+""" The "one binary byte per line" text form of every byte value """
+
+
+def load_memory_file(file_path: Path, size: int = MEM_SIZE) -> bytearray:
+    """
+    Load a memory file with one 8-bit binary byte per line.
+
+    Args:
+        file_path (Path): The memory file.
+        size (int): The minimum size of the memory, the content is zero padded up to it.
+
+    Returns:
+        bytearray: The memory content.
+    """
+    with open(file_path) as mf:
+        mem = bytearray(int(data, 2) for data in mf.read().splitlines())
+    mem.extend(bytes(max(0, size - len(mem))))
+    return mem
+
+
+def read_word(mem: bytearray, address: int) -> int:
+    """
+    Load a 32-bit word from a byte memory.
+
+    Args:
+        mem (bytearray): The byte memory.
+        address (int): The address of the most significant byte.
+
+    Returns:
+        int: The word, truncated to the bytes that exist when it runs past the end of the memory.
+    """
+    if 0 <= address <= len(mem) - 4:
+        return WORD.unpack_from(mem, address)[0]
+    return int.from_bytes(mem[address: address + 4], "big")
+
 
 class InstructionMemory(object):
     """
@@ -24,9 +73,10 @@ class InstructionMemory(object):
         self.id = name
 
         # Each line in the files contain a byte of data
-        with open(io_dir / "imem.txt") as im:
-            self.i_mem = [data.replace("\n", "") for data in im.readlines()]
-            self.i_mem += ["0" * 8] * (MEM_SIZE - len(self.i_mem))
+        self.i_mem = load_memory_file(io_dir / "imem.txt")
+
+        self.program = None
+        """ Decoded view of this memory (see decoder.ProgramTable), built by the first core using it """
 
     def read(self, read_address: int) -> int:
         """
@@ -39,16 +89,16 @@ class InstructionMemory(object):
             int: The 32-bit instruction. can be print as hex: f'{address:#x}, bin: f'{address:#b}'
         """
 
-        # load 4 piece of data and concatenate them
-        bin_str = ''.join(self.i_mem[read_address: read_address + 4])
-        if bin_str == "":
-            return 0
-        return int(bin_str, 2)
+        # load 4 bytes as one big-endian word
+        return read_word(self.i_mem, read_address)
 
 
 class DataMemory(object):
     """
     DataMemory simulates the data memory in a processor.
+
+    The whole 32-bit address space is addressable. Memory is kept in 4 KiB pages that are
+    allocated the first time they are written, reading an untouched page returns 0.
     """
 
     def __init__(self, name, io_dir: Path):
@@ -61,9 +111,67 @@ class DataMemory(object):
         """
         self.id = name
         self.ioDir = io_dir
-        with open(io_dir / "dmem.txt") as dm:
-            self.d_mem = [data.replace("\n", "") for data in dm.readlines()]
-            self.d_mem += ["0" * 8] * (1000 - len(self.d_mem))
+        self.pages = {}
+        """ Allocated pages: {page number (address >> PAGE_BITS): bytearray(PAGE_SIZE)} """
+
+        init_data = load_memory_file(io_dir / "dmem.txt", size=0)
+        self.window_size = max(MEM_SIZE, len(init_data))
+        """ Number of bytes dumped by output_data_memory in the legacy format """
+        self.write_bytes(0, init_data)
+
+    def page(self, page_number: int) -> bytearray:
+        """
+        Return a page, allocating it on first touch.
+
+        Args:
+            page_number (int): The page number (address >> PAGE_BITS).
+
+        Returns:
+            bytearray: The page.
+        """
+        page = self.pages.get(page_number)
+        if page is None:
+            page = self.pages[page_number] = bytearray(PAGE_SIZE)
+        return page
+
+    def read_bytes(self, address: int, length: int) -> bytes:
+        """
+        Read a range of bytes, without allocating pages.
+
+        Args:
+            address (int): The address of the first byte.
+            length (int): The number of bytes.
+
+        Returns:
+            bytes: The data, untouched pages read as zeros.
+        """
+        data = bytearray()
+        while length > 0:
+            address &= ADDRESS_SPACE - 1
+            offset = address & PAGE_MASK
+            chunk = min(length, PAGE_SIZE - offset)
+            page = self.pages.get(address >> PAGE_BITS)
+            data += page[offset: offset + chunk] if page is not None else bytes(chunk)
+            address += chunk
+            length -= chunk
+        return bytes(data)
+
+    def write_bytes(self, address: int, data: bytes):
+        """
+        Write a range of bytes, allocating the pages it touches.
+
+        Args:
+            address (int): The address of the first byte.
+            data (bytes): The data to write.
+        """
+        position = 0
+        while position < len(data):
+            address &= ADDRESS_SPACE - 1
+            offset = address & PAGE_MASK
+            chunk = min(len(data) - position, PAGE_SIZE - offset)
+            self.page(address >> PAGE_BITS)[offset: offset + chunk] = data[position: position + chunk]
+            address += chunk
+            position += chunk
 
     def read(self, read_address):
         """
@@ -75,9 +183,16 @@ class DataMemory(object):
         Returns:
             int: The 32-bit binary data in integer format
         """
-        bin_str = ''.join(self.d_mem[read_address: read_address + 4])
-        logger.debug(f"Reading data {bin_str} from address {read_address:05b}")
-        return int(bin_str, 2)
+        offset = read_address & PAGE_MASK
+        if offset <= PAGE_SIZE - 4:
+            page = self.pages.get(read_address >> PAGE_BITS)
+            data = WORD.unpack_from(page, offset)[0] if page is not None else 0
+        else:
+            # The word crosses a page boundary
+            data = int.from_bytes(self.read_bytes(read_address, 4), "big")
+        if diagnostics.VERBOSE:
+            logger.debug(f"Reading data {data:032b} from address {read_address:05b}")
+        return data
 
     def write(self, address, data):
         """
@@ -87,34 +202,42 @@ class DataMemory(object):
             address (int): The address to write the data to.
             data (int): The 32-bit binary data to write in integer format.
         """
-        # Convert the integer write_data to a 32-bit binary string
-        if address < 0 or address >= MEM_SIZE:
+        if address < 0 or address >= ADDRESS_SPACE:
             logger.error(f"Invalid address: {address}")
             return
-        logger.debug(f"Writing data {data} to address {address}")
+        if diagnostics.VERBOSE:
+            logger.debug(f"Writing data {data} to address {address}")
 
         # Handle negative two's complement conversion
-        if data < 0:
-            data = (1 << 32) + data  # Convert to 2's complement 32-bit
-
         # Explain: say write_data = -2
-        # (1 << 32) generates 2^32
-        # 1 << 32 = 100000000000000000000000000000000 (33 bits)
-        #         = 4294967296
-        # When add -2
-        # 4294967296 + (-2) = 4294967294
-        #                   = 11111111111111111111111111111110 (32 bits)
-
-        binary_str = f"{data:032b}"
-
-        # Write each byte (8 bits) to the memory in order
-        for i in range(4):
-            self.d_mem[address + i] = binary_str[i * 8: (i + 1) * 8]
-
-    def output_data_memory(self):
+        # -2 & 0xFFFFFFFF = 4294967294
+        #                 = 11111111111111111111111111111110 (32 bits)
+        data &= 0xFFFFFFFF
+
+        # Write the 4 bytes, most significant byte first
+        offset = address & PAGE_MASK
+        if offset <= PAGE_SIZE - 4:
+            WORD.pack_into(self.page(address >> PAGE_BITS), offset, data)
+        else:
+            # The word crosses a page boundary
+            self.write_bytes(address, WORD.pack(data))
+
+    def output_data_memory(self, populated_pages_only=False):
         """
         Output the state of the data memory to a file.
+
+        The binary text form is only produced here, the memory itself holds raw bytes.
+
+        Args:
+            populated_pages_only (bool): False dumps the legacy window starting at address 0,
+                one byte per line. True dumps every allocated page instead, each preceded by an
+                `@<hex address>` line (the $readmemb address notation).
         """
         res_path = self.ioDir / f"{self.id}_DMEMResult.txt"
         with open(res_path, "w") as rp:
-            rp.writelines([str(data) + "\n" for data in self.d_mem])
+            if not populated_pages_only:
+                rp.write("".join(map(BYTE_LINES.__getitem__, self.read_bytes(0, self.window_size))))
+                return
+            for page_number in sorted(self.pages):
+                rp.write(f"@{page_number << PAGE_BITS:08x}\n")
+                rp.write("".join(map(BYTE_LINES.__getitem__, self.pages[page_number])))
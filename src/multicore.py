@@ -0,0 +1,259 @@
+"""
+Multi-core simulation: several FiveStageCores, each running its own program, share one DataMemory.
+
+Memory model:
+  - there are no private data caches, every load and store of every core goes to the shared
+    DataMemory, so a store is visible to all cores from the cycle it is performed and there is
+    nothing to keep coherent,
+  - every word load and store is atomic,
+  - the shared memory serves `ports` accesses per cycle; an access that finds every port taken
+    waits for the first free one, with its whole pipeline stalled as on a cache miss,
+  - each cycle the cores are stepped in arbitration order, the same order in which their
+    accesses are granted, so the order accesses take effect is the order they are granted.
+"""
+from pathlib import Path
+
+from loguru import logger
+
+from src import diagnostics
+from src.cache import INSTRUCTION_CACHE
+from src.core import FiveStageCore
+from src.memory import InstructionMemory, DataMemory
+from src.trace_writer import DEFAULT_FLUSH_INTERVAL
+
+ARBITRATIONS = ("round-robin", "fixed")
+""" round-robin starts each cycle with the core after the last one granted, fixed always with core 0 """
+
+CORE_ID_REGISTER = 10
+""" a0 holds the index of the core at reset, so cores sharing a program can split the work """
+
+
+class MultiCoreConfig(object):
+    """
+    MultiCoreConfig describes the cores of a multi-core run and the shared data memory port.
+    """
+
+    def __init__(self, cores: int = 2, arbitration: str = "round-robin", ports: int = 1):
+        """
+        Initialize the MultiCoreConfig.
+
+        Args:
+            cores (int): Number of five stage cores.
+            arbitration (str): Order in which the accesses of one cycle are granted, one of ARBITRATIONS.
+            ports (int): Accesses the shared data memory serves per cycle.
+        """
+        if cores < 1:
+            raise ValueError(f"The number of cores must be positive: {cores}")
+        if arbitration not in ARBITRATIONS:
+            raise ValueError(f"Unknown arbitration: {arbitration}")
+        if ports < 1:
+            raise ValueError(f"The number of memory ports must be positive: {ports}")
+        self.cores = cores
+        self.arbitration = arbitration
+        self.ports = ports
+
+    @classmethod
+    def parse(cls, spec: str):
+        """
+        Build a MultiCoreConfig from its command line form.
+
+        Comma separated `key=value` settings, any of `cores=2,arbitration=round-robin,ports=1`.
+        An empty spec or `default` keeps every default.
+
+        Args:
+            spec (str): The specification.
+
+        Returns:
+            MultiCoreConfig: The configuration.
+        """
+        parameters = {}
+        for setting in filter(None, spec.split(",")):
+            if setting == "default":
+                continue
+            key, _, value = setting.partition("=")
+            if key not in ("cores", "arbitration", "ports"):
+                raise ValueError(f"Unknown multi-core setting: {key}")
+            parameters[key] = value if key == "arbitration" else int(value)
+        return cls(**parameters)
+
+    def describe(self) -> str:
+        return f"{self.cores} cores, {self.arbitration} arbitration, {self.ports} memory port(s)"
+
+
+class MemoryArbiter(object):
+    """
+    MemoryArbiter hands out the ports of the shared data memory, one access per port per cycle.
+
+    A request takes the first cycle, from the current one on, with a free port. Requests that had
+    to wait keep the cycle they were given, so they are served before any later request.
+    """
+
+    def __init__(self, cores: int, arbitration: str = "round-robin", ports: int = 1):
+        """
+        Initialize the MemoryArbiter.
+
+        Args:
+            cores (int): Number of cores sharing the memory.
+            arbitration (str): One of ARBITRATIONS.
+            ports (int): Accesses served per cycle.
+        """
+        self.cores = cores
+        self.arbitration = arbitration
+        self.ports = ports
+        self.cycle = 0
+        self.granted = {}
+        """ Ports already handed out: {cycle: count}, for the current and later cycles """
+        self.priority = 0
+        """ The core stepped first in the current cycle """
+        self.last_granted = None
+        """ The last core granted a port in the current cycle """
+        self.contended = False
+        """ A request of the current cycle had to wait """
+
+        self.accesses = [0] * cores
+        self.wait_cycles = [0] * cores
+        """ Cycles each core waited for a port """
+        self.contended_cycles = 0
+        """ Cycles in which a request had to wait for a port """
+
+    def order(self) -> list:
+        """The cores in the order they are stepped, and granted, in the current cycle."""
+        return [(self.priority + offset) % self.cores for offset in range(self.cores)]
+
+    def request(self, core: int) -> int:
+        """
+        Grant a port to an access of a core.
+
+        Args:
+            core (int): The index of the core.
+
+        Returns:
+            int: Number of cycles the core waits for the port.
+        """
+        cycle = self.cycle
+        while self.granted.get(cycle, 0) == self.ports:
+            cycle += 1
+        self.granted[cycle] = self.granted.get(cycle, 0) + 1
+        if cycle == self.cycle:
+            self.last_granted = core
+        else:
+            self.contended = True
+        self.accesses[core] += 1
+        self.wait_cycles[core] += cycle - self.cycle
+        return cycle - self.cycle
+
+    def next_cycle(self):
+        """
+        Move on to the next cycle and choose which core goes first in it.
+        """
+        self.granted.pop(self.cycle, None)
+        self.contended_cycles += self.contended
+        self.contended = False
+        if self.arbitration == "round-robin" and self.last_granted is not None:
+            self.priority = (self.last_granted + 1) % self.cores
+        self.last_granted = None
+        self.cycle += 1
+
+
+class MemoryPort(object):
+    """
+    MemoryPort connects one core to the MemoryArbiter, in place of its data cache.
+
+    The core calls it like a Cache after each load and store, the returned stall is the wait for a port.
+    """
+
+    def __init__(self, arbiter: MemoryArbiter, core: int):
+        """
+        Initialize the MemoryPort.
+
+        Args:
+            arbiter (MemoryArbiter): The arbiter of the shared data memory.
+            core (int): The index of the core.
+        """
+        self.arbiter = arbiter
+        self.core = core
+
+    def access(self, address: int, write: bool = False) -> int:
+        """
+        Request a port for a load or a store.
+
+        Args:
+            address (int): The byte address.
+            write (bool): True for a store.
+
+        Returns:
+            int: Number of cycles the core stalls, 0 when a port was free.
+        """
+        return self.arbiter.request(self.core)
+
+
+def program_directory(io_dir: Path, index: int) -> Path:
+    """The directory holding core `index`'s imem.txt and results, core0, core1, ..."""
+    return io_dir / f"core{index}"
+
+
+def build_multicore(io_dir: Path, config: MultiCoreConfig, flush_interval: int = DEFAULT_FLUSH_INTERVAL,
+                    trace_policy=None, predictor=None, icache=None):
+    """
+    Build the cores of a multi-core run and the shared data memory.
+
+    Core i runs core{i}/imem.txt, or the shared imem.txt of `io_dir` if it has no program of its
+    own, and writes its results into core{i}/. The data memory is loaded from dmem.txt of `io_dir`.
+
+    Args:
+        io_dir (Path): Directory holding dmem.txt, imem.txt and the core{i} directories.
+        config (MultiCoreConfig): The cores and the shared data memory port.
+        flush_interval (int): Number of cycles buffered by the trace writers before writing.
+        trace_policy (TracePolicy): Which cycles are dumped, None dumps every cycle.
+        predictor (PredictorConfig): The branch predictor of each core, None predicts not taken.
+        icache (CacheConfig): The private L1 instruction cache of each core, None for an ideal memory.
+
+    Returns:
+        tuple[list[FiveStageCore], DataMemory, MemoryArbiter]: The cores, the shared data memory and its arbiter.
+    """
+    data_memory = DataMemory("MC", io_dir)
+    arbiter = MemoryArbiter(config.cores, config.arbitration, config.ports)
+    shared_program = None
+    cores = []
+    for index in range(config.cores):
+        core_dir = program_directory(io_dir, index)
+        if (core_dir / "imem.txt").exists():
+            instruction_memory = InstructionMemory(f"Imem{index}", core_dir)
+        else:
+            if shared_program is None:
+                shared_program = InstructionMemory("Imem", io_dir)
+            instruction_memory = shared_program
+        core = FiveStageCore(core_dir, instruction_memory, data_memory, flush_interval, trace_policy,
+                             predictor.build() if predictor is not None else None,
+                             icache.build(f"Core {index} {INSTRUCTION_CACHE}") if icache is not None else None,
+                             MemoryPort(arbiter, index))
+        core.register_file.Registers[CORE_ID_REGISTER] = index
+        cores.append(core)
+    return cores, data_memory, arbiter
+
+
+def run_multicore(cores, arbiter: MemoryArbiter) -> int:
+    """
+    Step the cores together until all of them halted.
+
+    Args:
+        cores (list[FiveStageCore]): The cores, indexed like the arbiter's.
+        arbiter (MemoryArbiter): The arbiter of their shared data memory.
+
+    Returns:
+        int: Number of cycles until the last core halted.
+    """
+    cycles = 0
+    try:
+        while not all(core.halted for core in cores):
+            for index in arbiter.order():
+                if not cores[index].halted:
+                    cores[index].step()
+            arbiter.next_cycle()
+            cycles += 1
+    finally:
+        for core in cores:
+            core.close()
+    if diagnostics.VERBOSE:
+        logger.info(f"All {len(cores)} cores halted after {cycles} cycles")
+    return cycles
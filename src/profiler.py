@@ -0,0 +1,178 @@
+"""
+Optional per-stage and per-component profiling of the single stage, five stage and dual issue cores.
+
+A Profiler is attached to one core. It replaces the core's stage methods, its register file
+and data memory accessors and the component functions the cores call with timing wrappers,
+and accumulates the call count and wall time of each. Nothing is wrapped unless a profiler is
+attached, so a run without profiling executes exactly the code it always did.
+
+Times are inclusive: `id_stage` includes the `hazard_detection_unit` calls it makes.
+"""
+import time
+from functools import reduce
+
+from loguru import logger
+
+from src import core as core_module
+
+COMPONENTS = ("arithmetic_logic_unit", "adder", "multiplexer", "and_gate", "xor_gate", "or_gate",
+              "forwarding_unit", "forwarding_unit_for_branch", "hazard_detection_unit",
+              "forwarding_unit_dual_issue", "hazard_detection_unit_dual_issue")
+""" Component functions, looked up in src.core by the cores at call time """
+
+CORE_METHODS = ("if_stage", "id_stage", "ex_stage", "mem_stage", "wb_stage", "fetch_stage", "dispatch_stage",
+                "issue_stage", "complete_stage", "commit_stage", "printState", "print_state")
+""" Stage and trace methods, wrapped when the core has them """
+
+MEMBER_METHODS = (("register_file", "read"), ("register_file", "write"), ("register_file", "output"),
+                  ("ext_data_memory", "read"), ("ext_data_memory", "write"),
+                  ("register_file.trace", "flush"), ("state_trace", "flush"))
+""" (core attribute path, method) pairs, reported as `RegisterFile.read`, `TraceWriter.flush`, ... """
+
+
+class Profiler(object):
+    """
+    Profiler accumulates call counts and wall time per stage method and per component of one core.
+    """
+
+    current = None
+    """ The profiler of the core whose step is running, component calls are charged to it """
+
+    _component_originals = {}
+    _component_users = 0
+
+    def __init__(self):
+        self.stats = {}
+        """ {name: [calls, seconds]} """
+        self.core = None
+        self.reported = False
+
+    def add(self, name, seconds):
+        entry = self.stats.get(name)
+        if entry is None:
+            self.stats[name] = [1, seconds]
+        else:
+            entry[0] += 1
+            entry[1] += seconds
+
+    def timed(self, name, function):
+        """
+        Wrap a function so that its calls are charged to this profiler.
+
+        Args:
+            name (str): The name in the report.
+            function (callable): The function.
+
+        Returns:
+            callable: The wrapper.
+        """
+        add = self.add
+        perf_counter = time.perf_counter
+
+        def wrapper(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                add(name, perf_counter() - start)
+
+        return wrapper
+
+    def attach(self, core):
+        """
+        Instrument a core. The report is logged and written to `<core io dir>/Profile.txt` when it halts.
+
+        Args:
+            core (Core): A SingleStageCore, FiveStageCore or DualIssueCore.
+        """
+        self.core = core
+        step = self.timed("step", core.step)
+
+        def profiled_step():
+            previous, Profiler.current = Profiler.current, self
+            try:
+                step()
+            finally:
+                Profiler.current = previous
+            if core.halted and not self.reported:
+                self.reported = True
+                self.report()
+
+        core.step = profiled_step
+        for name in CORE_METHODS:
+            if hasattr(core, name):
+                setattr(core, name, self.timed(name, getattr(core, name)))
+        for member, name in MEMBER_METHODS:
+            owner = reduce(getattr, member.split("."), core)
+            setattr(owner, name, self.timed(f"{type(owner).__name__}.{name}", getattr(owner, name)))
+        Profiler._wrap_components()
+
+    def detach(self):
+        """
+        Remove the instrumentation from the core.
+        """
+        core = self.core
+        for name in ("step",) + CORE_METHODS:
+            core.__dict__.pop(name, None)
+        for member, name in MEMBER_METHODS:
+            reduce(getattr, member.split("."), core).__dict__.pop(name, None)
+        Profiler._unwrap_components()
+        self.core = None
+
+    @classmethod
+    def _wrap_components(cls):
+        if cls._component_users == 0:
+            for name in COMPONENTS:
+                function = getattr(core_module, name)
+                cls._component_originals[name] = function
+                setattr(core_module, name, cls._charged_to_current(name, function))
+        cls._component_users += 1
+
+    @classmethod
+    def _unwrap_components(cls):
+        cls._component_users -= 1
+        if cls._component_users == 0:
+            for name, function in cls._component_originals.items():
+                setattr(core_module, name, function)
+            cls._component_originals.clear()
+
+    @staticmethod
+    def _charged_to_current(name, function):
+        perf_counter = time.perf_counter
+
+        def wrapper(*args, **kwargs):
+            profiler = Profiler.current
+            if profiler is None:
+                return function(*args, **kwargs)
+            start = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                profiler.add(name, perf_counter() - start)
+
+        return wrapper
+
+    def format(self) -> str:
+        """
+        The report: one line per profiled name, the slowest first.
+
+        Returns:
+            str: The report.
+        """
+        step_seconds = self.stats.get("step", [0, 0.0])[1] or 1e-12
+        lines = [f"Profile of {type(self.core).__name__}: {self.core.cycle} cycles, "
+                 f"{step_seconds:.6f} s in step\n",
+                 f"{'name':<32} {'calls':>10} {'total (s)':>12} {'per call (us)':>14} {'% of step':>10}\n"]
+        for name, (calls, seconds) in sorted(self.stats.items(), key=lambda item: -item[1][1]):
+            lines.append(f"{name:<32} {calls:>10} {seconds:>12.6f} {seconds / calls * 1e6:>14.3f} "
+                         f"{100 * seconds / step_seconds:>9.1f}%\n")
+        return "".join(lines)
+
+    def report(self):
+        """
+        Log the report and write it to `<core io dir>/Profile.txt`.
+        """
+        text = self.format()
+        logger.info(f"\n{text}")
+        with open(self.core.ioDir / "Profile.txt", "w") as pf:
+            pf.write(text)
@@ -2,22 +2,27 @@ from pathlib import Path
 
 from loguru import logger
 
+from src import diagnostics
+from src.trace_writer import TraceWriter, DEFAULT_FLUSH_INTERVAL
+
 
 class RegisterFile(object):
     """
     RegisterFile simulates a register file in a processor.
     """
 
-    def __init__(self, io_dir: Path):
+    def __init__(self, io_dir: Path, flush_interval: int = DEFAULT_FLUSH_INTERVAL):
         """
         Initialize the RegisterFile.
 
         Args:
             io_dir (Path): Directory for input/output files.
+            flush_interval (int): Number of cycles buffered by the trace writer before writing.
         """
         self.outputFile = io_dir / "RFResult.txt"
         self.Registers = [0x0 for i in range(32)]
         Path(io_dir).mkdir(parents=True, exist_ok=True)
+        self.trace = TraceWriter(self.outputFile, flush_interval)
 
     def read(self, reg_addr):
         """
@@ -32,7 +37,8 @@ class RegisterFile(object):
         data = self.Registers[reg_addr]
         if data is None:
             data = 0
-        logger.debug(f"Read register {reg_addr:05b}: {data:032b} ({data})")
+        if diagnostics.VERBOSE:
+            logger.debug(f"Read register {reg_addr:05b}: {data:032b} ({data})")
         return data
 
     def write(self, reg_addr, write_reg_data):
@@ -51,8 +57,9 @@ class RegisterFile(object):
         if write_reg_data < 0:
             write_reg_data = (1 << 32) + write_reg_data  # Convert to 2's complement 32-bit
 
-        logger.debug(f"Write Register Address: {reg_addr}")
-        logger.debug(f"Write Data: {write_reg_data:032b}")
+        if diagnostics.VERBOSE:
+            logger.debug(f"Write Register Address: {reg_addr}")
+            logger.debug(f"Write Data: {write_reg_data:032b}")
 
         self.Registers[reg_addr] = write_reg_data
 
@@ -64,11 +71,12 @@ class RegisterFile(object):
             cycle (int): The current cycle number.
         """
         op = ["-" * 70 + "\n", "State of RF after executing cycle:" + str(cycle) + "\n"]
-        op.extend([format(val, 'b').zfill(32) + "\n" for val in self.Registers])
-
-        if (cycle == 0):
-            perm = "w+"
-        else:
-            perm = "a+"
-        with open(self.outputFile, perm) as file:
-            file.writelines(op)
+        op.extend([f"{val:032b}\n" for val in self.Registers])
+
+        self.trace.write(op)
+
+    def close(self):
+        """
+        Flush and close the RFResult file.
+        """
+        self.trace.close()
@@ -0,0 +1,70 @@
+from loguru import logger
+
+from src.core import FunctionalCore, FiveStageCore
+from src.trace_writer import DEFAULT_FLUSH_INTERVAL
+
+
+def fast_forward(io_dir, instruction_memory, data_memory, instructions=None, stop_pc=None, window=None,
+                 flush_interval=DEFAULT_FLUSH_INTERVAL, trace_policy=None, branch_predictor=None,
+                 instruction_cache=None, data_cache=None):
+    """
+    Fast-forward a program on the FunctionalCore, then simulate a window of it on a FiveStageCore.
+
+    The FunctionalCore runs until `instructions` have retired or the PC reaches `stop_pc`. Its
+    architectural state (register file, data memory and PC) is then handed off to a freshly
+    initialized FiveStageCore, which runs cycle by cycle for `window` cycles or until HALT.
+    Both cores work on `data_memory`, so the hand-off of the data memory is free.
+
+    The window starts with an empty pipeline and cold caches, so its cycle count includes the
+    pipeline fill and the compulsory misses.
+
+    Args:
+        io_dir (Path): Directory for input/output files.
+        instruction_memory (InstructionMemory): The instruction memory.
+        data_memory (DataMemory): The data memory, updated by both cores.
+        instructions (int): Number of instructions to fast-forward, None to only use `stop_pc`.
+        stop_pc (int): Stop fast-forwarding when the PC first reaches this address, None to only use `instructions`.
+        window (int): Number of cycles simulated in detail, None runs to HALT.
+        flush_interval (int): Number of cycles buffered by the trace writers before writing.
+        trace_policy (TracePolicy): Which cycles of the window are dumped.
+        branch_predictor (BranchPredictor): Branch predictor of the detailed core, None predicts not taken.
+        instruction_cache (Cache): L1 instruction cache of the detailed core, None for an ideal memory.
+        data_cache (Cache): L1 data cache of the detailed core, None for an ideal memory.
+
+    Returns:
+        tuple[FunctionalCore, FiveStageCore]: The fast-forwarding core and the detailed core.
+    """
+    functional_core = FunctionalCore(io_dir, instruction_memory, data_memory, flush_interval)
+    try:
+        functional_core.run(max_instructions=instructions, stop_pc=stop_pc)
+    finally:
+        functional_core.close()
+    logger.info(f"Fast-forwarded {functional_core.retired} instructions, hand-off at PC {functional_core.pc}")
+
+    detailed_core = FiveStageCore(io_dir, instruction_memory, data_memory, flush_interval, trace_policy,
+                                  branch_predictor, instruction_cache, data_cache)
+    detailed_core.load_architectural_state(functional_core.register_file.Registers, functional_core.pc)
+    try:
+        while not detailed_core.halted and detailed_core.cycle != window:
+            detailed_core.step()
+        if not detailed_core.halted and not detailed_core.trace_policy.traces(detailed_core.cycle - 1):
+            # the window ended before HALT, dump the register file it ended with
+            detailed_core.register_file.output(detailed_core.cycle - 1)
+    finally:
+        detailed_core.close()
+    return functional_core, detailed_core
+
+
+def window_instructions(detailed_core: FiveStageCore) -> int:
+    """
+    Number of instructions completed in a detailed window.
+
+    HALT is counted when the window reached it, as in the full-run metrics.
+
+    Args:
+        detailed_core (FiveStageCore): The detailed core returned by `fast_forward`.
+
+    Returns:
+        int: The instruction count.
+    """
+    return detailed_core.retired + int(detailed_core.halted)
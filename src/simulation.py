@@ -0,0 +1,382 @@
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from src import diagnostics
+from src.cache import INSTRUCTION_CACHE, DATA_CACHE
+from src.checkpoint import AutoCheckpoint, CORE_KINDS, load_checkpoint
+from src.core import SingleStageCore, FiveStageCore, FunctionalCore, DualIssueCore, OutOfOrderCore
+from src.cosim import Cosimulation
+from src.generate_metrics import generate_metrics, generate_counters, generate_cache_metrics, \
+    generate_out_of_order_counters, generate_memory_port_metrics
+from src.memory import InstructionMemory, DataMemory
+from src.multicore import build_multicore, run_multicore
+from src.profiler import Profiler
+from src.counters import OutOfOrderCounters
+from src.trace_writer import DEFAULT_FLUSH_INTERVAL, TracePolicy
+from src.verifier import attach_verifier
+
+CORES = {"SS": SingleStageCore, "FS": FiveStageCore, "FN": FunctionalCore, "DI": DualIssueCore,
+         "OO": OutOfOrderCore}
+""" The cores run_cores_in_parallel can run, by the prefix of their result files """
+
+CORE_HEADINGS = {"SS": "Single Stage Core", "FS": "Five Stage Core", "DI": "Dual Issue Core",
+                 "OO": "Out-of-Order Core"}
+""" The sections of PerformanceMetrics_Result.txt and PerformanceCounters_Result.txt, in file order """
+
+
+def five_stage_core(io_dir: Path, imem, dmem, flush_interval=DEFAULT_FLUSH_INTERVAL, trace_policy=None,
+                    predictor=None, icache=None, dcache=None, core_class=FiveStageCore, **parameters):
+    """
+    Build a FiveStageCore, a DualIssueCore or an OutOfOrderCore with its own branch predictor and caches.
+
+    Args:
+        io_dir (Path): Directory for input/output files.
+        imem (InstructionMemory): The instruction memory.
+        dmem (DataMemory): The data memory.
+        flush_interval (int): Number of cycles buffered by the trace writers before writing.
+        trace_policy (TracePolicy): Which cycles are dumped, None dumps every cycle.
+        predictor (PredictorConfig): The branch predictor, None predicts not taken.
+        icache (CacheConfig): The L1 instruction cache, None for an ideal instruction memory.
+        dcache (CacheConfig): The L1 data cache, None for an ideal data memory.
+        core_class (type): FiveStageCore, DualIssueCore or OutOfOrderCore.
+        **parameters: Further arguments of the core class, the sizes of an OutOfOrderCore.
+
+    Returns:
+        FiveStageCore | DualIssueCore | OutOfOrderCore: The core.
+    """
+    return core_class(io_dir, imem, dmem, flush_interval, trace_policy,
+                      predictor.build() if predictor is not None else None,
+                      icache.build(INSTRUCTION_CACHE) if icache is not None else None,
+                      dcache.build(DATA_CACHE) if dcache is not None else None, **parameters)
+
+
+def core_caches(core):
+    """The caches of a core, instruction cache first."""
+    return [cache for cache in (getattr(core, "instruction_cache", None), getattr(core, "data_cache", None))
+            if cache is not None]
+
+
+def run_pipeline(io_dir: Path, flush_interval: int = DEFAULT_FLUSH_INTERVAL, trace_policy=None,
+                 populated_pages_only: bool = False, checkpoint_interval: int = 0, restore: bool = False,
+                 profile: bool = False, predictor=None, icache=None, dcache=None, expected=None,
+                 binary_trace: bool = False):
+    """
+    Run the single stage and five stage cores on a testcase and write every result file.
+
+    Writes SS_/RFResult.txt, FS_/RFResult.txt, StateResult_SS.txt, StateResult_FS.txt,
+    SS_DMEMResult.txt, FS_DMEMResult.txt, PerformanceMetrics_Result.txt and
+    PerformanceCounters_Result.txt into `io_dir`. The statistics of the five stage core's caches,
+    if it has any, are appended to the metrics.
+
+    Args:
+        io_dir (Path): Directory holding imem.txt and dmem.txt, the results are written next to them.
+        flush_interval (int): Number of cycles buffered by the trace writers before writing.
+        trace_policy (TracePolicy): Which cycles are dumped, None dumps every cycle.
+        populated_pages_only (bool): Dump the populated data memory pages instead of the legacy window.
+        checkpoint_interval (int): Save SS_checkpoint.bin / FS_checkpoint.bin every N cycles, 0 never does.
+        restore (bool): Resume the cores from the checkpoint files in `io_dir`, if they exist.
+        profile (bool): Profile both cores, the reports are written to SS_/Profile.txt and FS_/Profile.txt.
+        predictor (PredictorConfig): Branch predictor of the five stage core, None predicts not taken.
+        icache (CacheConfig): L1 instruction cache of the five stage core, None for an ideal memory.
+        dcache (CacheConfig): L1 data cache of the five stage core, None for an ideal memory.
+        expected (dict[str, tuple[Path | None, Path | None]]): Expected RFResult and StateResult files of
+            the SS and FS cores (see expected_traces), compared with the traces cycle by cycle as they are
+            written. The run stops with a TraceDivergence at the first difference. None verifies nothing.
+        binary_trace (bool): Write the traces as binary traces (RFResult.npy, StateResult_*.npy), see binary_trace.
+
+    Returns:
+        tuple[SingleStageCore, FiveStageCore]: The halted cores.
+    """
+    imem = InstructionMemory("Imem", io_dir)
+    dmem_ss = DataMemory("SS", io_dir)
+    dmem_fs = DataMemory("FS", io_dir)
+
+    ssCore = SingleStageCore(io_dir, imem, dmem_ss, flush_interval, trace_policy)
+    fsCore = five_stage_core(io_dir, imem, dmem_fs, flush_interval, trace_policy, predictor, icache, dcache)
+
+    checkpoints = []
+    expected_traces = []
+    for name, core in (("SS", ssCore), ("FS", fsCore)):
+        if binary_trace:
+            from src.binary_trace import attach_binary_trace  # NumPy is only needed by the binary traces
+
+            attach_binary_trace(core)
+        checkpoint_path = io_dir / f"{name}_checkpoint.bin"
+        if restore and checkpoint_path.exists():
+            load_checkpoint(core, checkpoint_path)
+        if expected is not None and name in expected:
+            expected_traces += attach_verifier(core, *expected[name])
+        if checkpoint_interval:
+            checkpoints.append(AutoCheckpoint(core, checkpoint_path, checkpoint_interval))
+        if profile:
+            Profiler().attach(core)
+
+    try:
+        while (True):
+            if not ssCore.halted:
+                ssCore.step()
+
+            if not fsCore.halted:
+                fsCore.step()
+
+            for checkpoint in checkpoints:
+                checkpoint.after_step()
+
+            if ssCore.halted and fsCore.halted:
+                break
+
+            # if ssCore.halted or fsCore.halted:
+            #     break
+
+            # test only
+            # if fsCore.cycle > 100:
+            #     logger.error("Five Stage Core is taking too long to execute. Exiting...")
+            #     break
+    finally:
+        # keep whatever was traced so far if the run is interrupted
+        ssCore.close()
+        fsCore.close()
+    for trace in expected_traces:
+        trace.finish()
+
+    # dump SS and FS data mem.
+    dmem_ss.output_data_memory(populated_pages_only=populated_pages_only)
+    dmem_fs.output_data_memory(populated_pages_only=populated_pages_only)
+
+    generate_metrics("w", "Single Stage Core Performance Metrics", ssCore.cycle, ssCore.cycle - 1, io_dir)
+    # HALT is counted by the single stage core, the five stage core never issues it
+    generate_metrics("a", "Five Stage Core Performance Metrics", fsCore.cycle, fsCore.retired + 1, io_dir)
+    generate_cache_metrics(core_caches(fsCore), io_dir)
+    generate_counters("Five Stage Core Performance Counters", fsCore.cycle, fsCore.retired, fsCore.counters,
+                      fsCore.predictor, io_dir)
+    return ssCore, fsCore
+
+
+def run_core(name: str, io_dir: Path, flush_interval: int = DEFAULT_FLUSH_INTERVAL, trace_policy=None,
+             populated_pages_only: bool = False, checkpoint_interval: int = 0, restore: bool = False,
+             profile: bool = False, predictor=None, icache=None, dcache=None, ooo=None, expected=None,
+             binary_trace: bool = False):
+    """
+    Run one core to HALT on its own instruction and data memory and write its result files.
+
+    The metrics and counters files are shared by the cores, the caller writes them from the returned report.
+
+    Args:
+        name (str): The core, a key of CORES.
+        io_dir (Path): Directory holding imem.txt and dmem.txt, the results are written next to them.
+        flush_interval (int): Number of cycles buffered by the trace writers before writing.
+        trace_policy (TracePolicy): Which cycles are dumped, None dumps every cycle.
+        populated_pages_only (bool): Dump the populated data memory pages instead of the legacy window.
+        checkpoint_interval (int): Save {name}_checkpoint.bin every N cycles, 0 never does. Ignored by the
+            out-of-order core, which does not support checkpoints.
+        restore (bool): Resume the core from {name}_checkpoint.bin in `io_dir`, if it exists.
+        profile (bool): Profile the core (not the functional core), the report is written to {name}_/Profile.txt.
+        predictor (PredictorConfig): Branch predictor of the five stage and dual issue cores, None predicts not taken.
+        icache (CacheConfig): L1 instruction cache of the five stage and dual issue cores, None for an ideal memory.
+        dcache (CacheConfig): L1 data cache of the five stage and dual issue cores, None for an ideal memory.
+        ooo (OutOfOrderConfig): Sizes of the out-of-order core, None keeps its defaults.
+        expected (tuple[Path | None, Path | None]): Expected RFResult and StateResult files of the core (see
+            expected_traces), compared with its traces as they are written. The run stops with a
+            TraceDivergence at the first difference. None verifies nothing.
+        binary_trace (bool): Write the traces as binary traces, see run_pipeline.
+
+    Returns:
+        tuple[str, int, int, list[Cache], tuple | None]: The core name, its cycle count, its instruction
+            count (HALT included), its caches and, for the five stage, dual issue and out-of-order
+            cores, the retired count, performance counters and branch predictor.
+    """
+    imem = InstructionMemory("Imem", io_dir)
+    dmem = DataMemory(name, io_dir)
+    if CORES[name] in (FiveStageCore, DualIssueCore, OutOfOrderCore):
+        parameters = ooo.parameters if CORES[name] is OutOfOrderCore and ooo is not None else {}
+        core = five_stage_core(io_dir, imem, dmem, flush_interval, trace_policy, predictor, icache, dcache,
+                               CORES[name], **parameters)
+    else:
+        core = CORES[name](io_dir, imem, dmem, flush_interval, trace_policy)
+    if binary_trace:
+        from src.binary_trace import attach_binary_trace  # NumPy is only needed by the binary traces
+
+        attach_binary_trace(core)
+
+    checkpoint_path = io_dir / f"{name}_checkpoint.bin"
+    checkpointed = type(core) in CORE_KINDS  # the out-of-order core has no checkpoints
+    if restore and checkpointed and checkpoint_path.exists():
+        load_checkpoint(core, checkpoint_path)
+    expected_traces = attach_verifier(core, *expected) if expected is not None else []
+    checkpoint = AutoCheckpoint(core, checkpoint_path, checkpoint_interval) \
+        if checkpoint_interval and checkpointed else None
+    if profile and not isinstance(core, FunctionalCore):
+        Profiler().attach(core)
+
+    try:
+        if isinstance(core, FunctionalCore) and checkpoint is None:
+            core.run()
+        while isinstance(core, FunctionalCore) and not core.halted:
+            # one instruction per cycle, the blocks only run up to the next checkpoint
+            core.run(max_instructions=(core.cycle // checkpoint_interval + 1) * checkpoint_interval)
+            checkpoint.after_step()
+        while not core.halted:
+            core.step()
+            if checkpoint is not None:
+                checkpoint.after_step()
+    finally:
+        core.close()
+    for trace in expected_traces:
+        trace.finish()
+    dmem.output_data_memory(populated_pages_only=populated_pages_only)
+    counters = (core.retired, core.counters, core.predictor) if hasattr(core, "counters") else None
+
+    if isinstance(core, SingleStageCore):
+        instructions = core.cycle - 1
+    else:
+        # HALT is counted by the single stage core, the pipelined cores never issue it
+        instructions = core.retired + (not isinstance(core, FunctionalCore))
+    return name, core.cycle, instructions, core_caches(core), counters
+
+
+def run_cores_in_parallel(io_dir: Path, cores=("SS", "FS"), flush_interval: int = DEFAULT_FLUSH_INTERVAL,
+                          trace_policy=None, populated_pages_only: bool = False, checkpoint_interval: int = 0,
+                          restore: bool = False, profile: bool = False, predictor=None, icache=None, dcache=None,
+                          ooo=None, expected=None, binary_trace: bool = False):
+    """
+    Run each core in its own worker process, then write PerformanceMetrics_Result.txt and
+    PerformanceCounters_Result.txt.
+
+    The cores only share the read-only input files, every core writes its own result files,
+    so the outputs are those of run_pipeline. The metrics file has the single stage and five
+    stage sections of run_pipeline, then the dual issue and out-of-order sections, for the cores that were run;
+    the statistics of a core's caches follow its section.
+
+    Args:
+        io_dir (Path): Directory holding imem.txt and dmem.txt, the results are written next to them.
+        cores (tuple[str]): The cores to run, keys of CORES.
+        flush_interval (int): Number of cycles buffered by the trace writers before writing.
+        trace_policy (TracePolicy): Which cycles are dumped, None dumps every cycle.
+        populated_pages_only (bool): Dump the populated data memory pages instead of the legacy window.
+        checkpoint_interval (int): Save {name}_checkpoint.bin every N cycles, 0 never does.
+        restore (bool): Resume the cores from their checkpoint files in `io_dir`, if they exist.
+        profile (bool): Profile the single stage and five stage cores, see run_core.
+        predictor (PredictorConfig): Branch predictor of the five stage and dual issue cores, None predicts not taken.
+        icache (CacheConfig): L1 instruction cache of the five stage and dual issue cores, None for an ideal memory.
+        dcache (CacheConfig): L1 data cache of the five stage and dual issue cores, None for an ideal memory.
+        ooo (OutOfOrderConfig): Sizes of the out-of-order core, None keeps its defaults.
+        expected (dict[str, tuple[Path | None, Path | None]]): Expected RFResult and StateResult files of
+            the cores, by name (see expected_traces), compared with their traces as they are written. A core
+            stops at its first difference, its TraceDivergence is raised once the other cores finished.
+            None verifies nothing.
+        binary_trace (bool): Write the traces as binary traces, see run_pipeline.
+
+    Returns:
+        dict[str, tuple[int, int]]: The cycle and instruction count of each core.
+    """
+    # the workers log like this process does
+    with ProcessPoolExecutor(max_workers=len(cores), initializer=diagnostics.set_verbose,
+                             initargs=(diagnostics.VERBOSE,)) as pool:
+        futures = [pool.submit(run_core, name, io_dir, flush_interval, trace_policy, populated_pages_only,
+                               checkpoint_interval, restore, profile, predictor, icache, dcache, ooo,
+                               expected.get(name) if expected is not None else None, binary_trace)
+                   for name in cores]
+        reports = {report[0]: report[1:] for report in (future.result() for future in futures)}
+
+    metrics_perm = counters_perm = "w"
+    for name, heading in CORE_HEADINGS.items():
+        if name not in reports:
+            continue
+        cycles, instructions, caches, counters = reports[name]
+        generate_metrics(metrics_perm, f"{heading} Performance Metrics", cycles, instructions, io_dir)
+        metrics_perm = "a"
+        generate_cache_metrics(caches, io_dir)
+        if counters is not None:
+            retired, performance_counters, branch_predictor = counters
+            report = generate_out_of_order_counters if isinstance(performance_counters, OutOfOrderCounters) \
+                else generate_counters
+            report(f"{heading} Performance Counters", cycles, retired, performance_counters, branch_predictor,
+                   io_dir, counters_perm)
+            counters_perm = "a"
+    return {name: (cycles, instructions) for name, (cycles, instructions, _, _) in reports.items()}
+
+
+def run_multi_core(io_dir: Path, config, flush_interval: int = DEFAULT_FLUSH_INTERVAL, trace_policy=None,
+                   populated_pages_only: bool = False, predictor=None, icache=None, binary_trace: bool = False):
+    """
+    Run several five stage cores on one shared data memory and write every result file.
+
+    Core i writes core{i}/FS_/RFResult.txt and core{i}/StateResult_FS.txt, the shared data memory
+    is dumped to MC_DMEMResult.txt. PerformanceMetrics_Result.txt has a section per core, the
+    aggregate over all cores (every instruction over the cycles until the last core halted) and
+    the use of the shared memory ports; PerformanceCounters_Result.txt has the counters of each core.
+
+    Args:
+        io_dir (Path): Directory holding dmem.txt, imem.txt and the core{i} directories, see build_multicore.
+        config (MultiCoreConfig): The cores and the shared data memory port.
+        flush_interval (int): Number of cycles buffered by the trace writers before writing.
+        trace_policy (TracePolicy): Which cycles are dumped, None dumps every cycle.
+        populated_pages_only (bool): Dump the populated data memory pages instead of the legacy window.
+        predictor (PredictorConfig): The branch predictor of each core, None predicts not taken.
+        icache (CacheConfig): The private L1 instruction cache of each core, None for an ideal memory.
+        binary_trace (bool): Write the traces as binary traces, see run_pipeline.
+
+    Returns:
+        list[FiveStageCore]: The halted cores.
+    """
+    cores, dmem, arbiter = build_multicore(io_dir, config, flush_interval, trace_policy, predictor, icache)
+    if binary_trace:
+        from src.binary_trace import attach_binary_trace  # NumPy is only needed by the binary traces
+
+        for core in cores:
+            attach_binary_trace(core)
+    cycles = run_multicore(cores, arbiter)
+    dmem.output_data_memory(populated_pages_only=populated_pages_only)
+
+    perm = "w"
+    for index, core in enumerate(cores):
+        heading = f"Core {index} Five Stage Core"
+        generate_metrics(perm, f"{heading} Performance Metrics", core.cycle, core.retired + 1, io_dir)
+        if core.instruction_cache is not None:
+            generate_cache_metrics([core.instruction_cache], io_dir)
+        generate_counters(f"{heading} Performance Counters", core.cycle, core.retired, core.counters,
+                          core.predictor, io_dir, perm)
+        perm = "a"
+    generate_metrics("a", f"Aggregate Performance Metrics ({config.describe()})", cycles,
+                     sum(core.retired + 1 for core in cores), io_dir)
+    generate_memory_port_metrics(arbiter, cycles, io_dir)
+    return cores
+
+
+def run_cosimulation(io_dir: Path, dut: str = "FS", reference: str = "FN", flush_interval: int = DEFAULT_FLUSH_INTERVAL,
+                     predictor=None, icache=None, dcache=None, ooo=None) -> Cosimulation:
+    """
+    Run a pipelined core in lockstep with an architectural reference and stop at the first difference.
+
+    No trace is written, only the final register file of each core ({dut}_/RFResult.txt and
+    {reference}_/RFResult.txt) once both halted with the same state.
+
+    Args:
+        io_dir (Path): Directory holding imem.txt and dmem.txt.
+        dut (str): The core under test, FS, DI or OO.
+        reference (str): The reference, FN or SS.
+        flush_interval (int): Number of cycles buffered by the trace writers before writing.
+        predictor (PredictorConfig): Branch predictor of the core under test, None predicts not taken.
+        icache (CacheConfig): L1 instruction cache of the core under test, None for an ideal memory.
+        dcache (CacheConfig): L1 data cache of the core under test, None for an ideal memory.
+        ooo (OutOfOrderConfig): Sizes of the out-of-order core, None keeps its defaults.
+
+    Returns:
+        Cosimulation: The finished co-simulation.
+
+    Raises:
+        CosimMismatch: At the first register write or store of the core under test that differs from the reference.
+    """
+    imem = InstructionMemory("Imem", io_dir)
+    no_trace = TracePolicy("none")
+    parameters = ooo.parameters if CORES[dut] is OutOfOrderCore and ooo is not None else {}
+    dut_core = five_stage_core(io_dir, imem, DataMemory(dut, io_dir), flush_interval, no_trace, predictor, icache,
+                               dcache, CORES[dut], **parameters)
+    if CORES[reference] is FunctionalCore:
+        reference_core = FunctionalCore(io_dir, imem, DataMemory(reference, io_dir), flush_interval, no_trace,
+                                        block_cache=False)  # stepped one instruction at a time
+    else:
+        reference_core = CORES[reference](io_dir, imem, DataMemory(reference, io_dir), flush_interval, no_trace)
+    cosimulation = Cosimulation(dut_core, reference_core)
+    cosimulation.run()
+    return cosimulation
@@ -1,6 +1,116 @@
+class PipelineRegister(object):
+    """
+    PipelineRegister is a fixed set of named fields stored in __slots__.
+
+    Subclasses list their fields and reset values in `fields`. Fields are read and written as
+    attributes (`state.EX.Rs`); item access (`state.EX["Rs"]`) and `get` are kept for callers
+    that treat a pipeline register like the dict it used to be.
+    """
+
+    __slots__ = ()
+    fields = {}
+
+    def __init__(self):
+        for name, value in self.fields.items():
+            setattr(self, name, value)
+
+    def latch(self, other):
+        """
+        Copy every field of another register of the same kind into this one, without allocating.
+
+        Args:
+            other (PipelineRegister): The register to copy from.
+        """
+        for name in self.__slots__:
+            setattr(self, name, getattr(other, name))
+
+    def clear(self):
+        """
+        Zero out every field (a bubble).
+        """
+        for name in self.__slots__:
+            setattr(self, name, 0)
+
+    def get(self, name, default=None):
+        return getattr(self, name, default)
+
+    def keys(self):
+        return self.__slots__
+
+    def __getitem__(self, name):
+        return getattr(self, name)
+
+    def __setitem__(self, name, value):
+        setattr(self, name, value)
+
+    def __repr__(self):
+        return repr({name: getattr(self, name) for name in self.__slots__})
+
+
+class IFRegister(PipelineRegister):
+    fields = {"nop": False, "PC": 0, "PCWrite": 0, "IFIDWrite": 0, "Flush": False, "PCSrc": 0, "BranchPC": 0}
+    __slots__ = tuple(fields)
+
+
+class IDRegister(PipelineRegister):
+    fields = {"nop": False, "Instr": 0, "PC": 0, "PredictedPC": 0}
+    __slots__ = tuple(fields)
+
+
+class EXRegister(PipelineRegister):
+    fields = {"nop": False, "Read_data1": 0, "Read_data2": 0, "Imm": 0, "Rs": 0, "Rt": 0, "Wrt_reg_addr": 0,
+              "is_I_type": False, "rd_mem": 0,
+              "wrt_mem": 0, "alu_op": 0, "wrt_enable": 0, "mem_to_reg": 0, "PC": 0, "alu_control_func": 0,
+              "alu_control": 0, "branch": 0, "jal": 0, "instr": 0, "valid": 0}
+    __slots__ = tuple(fields)
+
+
+class MEMRegister(PipelineRegister):
+    fields = {"nop": False, "ALUresult": 0, "Store_data": 0, "Rs": 0, "Rt": 0, "Wrt_reg_addr": 0, "rd_mem": 0,
+              "wrt_mem": 0, "wrt_enable": 0, "mem_to_reg": 0, "PC": 0, "ALUZero": 0, "bne": 0, "branch": 0,
+              "jal": 0, "valid": 0}
+    __slots__ = tuple(fields)
+
+
+class WBRegister(PipelineRegister):
+    fields = {"nop": False, "Wrt_data": 0, "Rs": 0, "Rt": 0, "Wrt_reg_addr": 0, "wrt_enable": 0, "mem_to_reg": 0,
+              "ALUresult": 0, "read_data": 0, "valid": 0}
+    __slots__ = tuple(fields)
+
+
+class SingleStageIFRegister(PipelineRegister):
+    fields = {"nop": False, "PC": 0}
+    __slots__ = tuple(fields)
+
+
+class SingleStageIDRegister(PipelineRegister):
+    fields = {"nop": False, "Instr": 0}
+    __slots__ = tuple(fields)
+
+
+class SingleStageEXRegister(PipelineRegister):
+    fields = {"nop": False, "Read_data1": 0, "Read_data2": 0, "Imm": 0, "Rs": 0, "Rt": 0, "Wrt_reg_addr": 0,
+              "is_I_type": False, "rd_mem": 0,
+              "wrt_mem": 0, "alu_op": 0, "wrt_enable": 0}
+    __slots__ = tuple(fields)
+
+
+class SingleStageMEMRegister(PipelineRegister):
+    fields = {"nop": False, "ALUresult": 0, "Store_data": 0, "Rs": 0, "Rt": 0, "Wrt_reg_addr": 0, "rd_mem": 0,
+              "wrt_mem": 0, "wrt_enable": 0}
+    __slots__ = tuple(fields)
+
+
+class SingleStageWBRegister(PipelineRegister):
+    fields = {"nop": False, "Wrt_data": 0, "Rs": 0, "Rt": 0, "Wrt_reg_addr": 0, "wrt_enable": 0}
+    __slots__ = tuple(fields)
+
+
 class State(object):
+    __slots__ = ("IF", "ID", "EX", "MEM", "WB")
+
     def __init__(self):
-        self.IF = {"nop": False, "PC": 0, "PCWrite": 0, "IFIDWrite": 0, "Flush": False, "PCSrc": 0, "BranchPC": 0}
+        self.IF = IFRegister()
         """ Instruction Fetch. Read 4 lines of the IMEM file 
         
         { nop: No Operation, 
@@ -16,21 +126,19 @@ class State(object):
         "Instruction fetch: The control signals to read instruction memory and to write the PC are always asserted, so there is nothing special to control in this pipeline stage." Comp.Org P.331
         """
 
-        self.ID = {"nop": False, "Instr": 0, "PC": 0}
+        self.ID = IDRegister()
         """ Corresponding IF/ID Pipeline register
                  
         { nop: No Operation, 
         Instr: 32 bit binary Instruction stores in int,
         * PC: Program Counter,
+        * PredictedPC: Where IF fetched the next instruction from, checked by ID when it resolves the instruction,
 }
         
         "Instruction decode/register file read: The two source registers are always in the same location in the RISC-V instruction formats, so there is nothing special to control in this pipeline stage."  Comp.Org P.331
         """
 
-        self.EX = {"nop": False, "Read_data1": 0, "Read_data2": 0, "Imm": 0, "Rs": 0, "Rt": 0, "Wrt_reg_addr": 0,
-                   "is_I_type": False, "rd_mem": 0,
-                   "wrt_mem": 0, "alu_op": 0, "wrt_enable": 0, "mem_to_reg": 0, "PC": 0, "alu_control_func": 0,
-                   "branch": 0, "jal": 0, "instr": 0}
+        self.EX = EXRegister()
         """ ID/EX Pipeline register
         
         "Execution/address calculation: The signals to be set are ALUOp and ALUSrc (see Figures 4.49 and 4.50). The signals select the ALU operation and either Read data 2 or a sign-extended immediate as inputs to the ALU."  Comp.Org P.331
@@ -50,6 +158,7 @@ class State(object):
           Wrt_reg_addr: ID Register input: Write register (rd),
           
           * alu_control_func: 4 bits ALU Control opcode,
+          * alu_control: 4 bits ALU Control output, decoded from alu_op and alu_control_func,
 
           alu_op: 2 bits EX Control: ALUOp (connect to ALU control),
           is_I_type: 2 bits EX Control: ALUSrc, 
@@ -60,13 +169,13 @@ class State(object):
           * jal: 1 bit MEM Control: Jump and Link Instruction flag,
           
           wrt_enable: 1 bit WB Control: RegWrite,
-          * mem_to_reg: 1 bit WB Control: MemtoReg
+          * mem_to_reg: 1 bit WB Control: MemtoReg,
+
+          * valid: 1 if the register holds an instruction issued by ID, 0 for a bubble (used to count retired instructions)
 
         }"""
 
-        self.MEM = {"nop": False, "ALUresult": 0, "Store_data": 0, "Rs": 0, "Rt": 0, "Wrt_reg_addr": 0, "rd_mem": 0,
-                    "wrt_mem": 0, "wrt_enable": 0, "mem_to_reg": 0, "PC": 0, "ALUZero": 0, "bne": 0, "branch": 0,
-                    "jal": 0}
+        self.MEM = MEMRegister()
         """ EX/MEM Pipeline register
         
         "Memory access: The control lines set in this stage are Branch, MemRead, and MemWrite. The branch if equal, load, and store instructions set these signals, respectively. Recall that PCSrc in Figure 4.50 selects the next sequential address unless control asserts Branch and the ALU result was 0." Comp.Org P.331
@@ -90,10 +199,11 @@ class State(object):
           * jal: 1 bit MEM Control: Jump and Link Instruction flag
           
           wrt_enable: 1 bit WB Control: RegWrite,
-          * mem_to_reg: 1 bit WB Control: MemtoReg}"""
+          * mem_to_reg: 1 bit WB Control: MemtoReg,
 
-        self.WB = {"nop": False, "Wrt_data": 0, "Rs": 0, "Rt": 0, "Wrt_reg_addr": 0, "wrt_enable": 0, "mem_to_reg": 0,
-                   "ALUresult": 0, "read_data": 0}
+          * valid: 1 if the register holds an issued instruction, 0 for a bubble}"""
+
+        self.WB = WBRegister()
         """ MEM/WB Pipeline register
          
          "Write-back: The two control lines are MemtoReg, which decides between sending the ALU result or the memory value to the register file, and RegWrite, which writes the chosen value." Comp.Org P.331
@@ -109,13 +219,68 @@ class State(object):
           Wrt_reg_addr: ID Register input: Write register,
           
           wrt_enable: 1 bit Control unit output: RegWrite, 
-          * mem_to_reg: 1 bit Control unit output: MemtoReg
+          * mem_to_reg: 1 bit Control unit output: MemtoReg,
+
+          * valid: 1 if the register holds an issued instruction, 0 for a bubble
         }"""
 
 
+    def latch(self, other):
+        """
+        End of cycle: copy every pipeline register of `other` (the next state) into this state.
+
+        The copy is field by field into the registers this state already owns, nothing is allocated.
+
+        Args:
+            other (State): The state to copy from.
+        """
+        self.IF.latch(other.IF)
+        self.ID.latch(other.ID)
+        self.EX.latch(other.EX)
+        self.MEM.latch(other.MEM)
+        self.WB.latch(other.WB)
+
+
+class DualIssueState(object):
+    """
+    DualIssueState holds the pipeline registers of the two-wide DualIssueCore.
+
+    IF holds the fetch PC. Every other stage holds two registers of the five stage kinds, lane 0
+    for the older instruction of an issue pair and lane 1 for the younger one. The two ID registers
+    are the fetch buffer: ID issues from lane 0 first, and an entry it holds back moves to lane 0.
+    """
+    __slots__ = ("IF", "ID", "EX", "MEM", "WB")
+
+    def __init__(self):
+        self.IF = IFRegister()
+        """ { nop, PC: next fetch address, * PCSrc / BranchPC: ID resolved a misprediction and redirects the fetch } """
+        self.ID = (IDRegister(), IDRegister())
+        self.EX = (EXRegister(), EXRegister())
+        self.MEM = (MEMRegister(), MEMRegister())
+        self.WB = (WBRegister(), WBRegister())
+        for lanes in (self.ID, self.EX, self.MEM, self.WB):
+            for register in lanes:
+                register.nop = True
+
+    def latch(self, other):
+        """
+        End of cycle: copy every pipeline register of `other` (the next state) into this state.
+
+        Args:
+            other (DualIssueState): The state to copy from.
+        """
+        self.IF.latch(other.IF)
+        for lanes, other_lanes in ((self.ID, other.ID), (self.EX, other.EX), (self.MEM, other.MEM),
+                                   (self.WB, other.WB)):
+            lanes[0].latch(other_lanes[0])
+            lanes[1].latch(other_lanes[1])
+
+
 class SingleStageState(object):
+    __slots__ = ("IF", "ID", "EX", "MEM", "WB")
+
     def __init__(self):
-        self.IF = {"nop": False, "PC": 0}
+        self.IF = SingleStageIFRegister()
         """ Instruction Fetch. Read 4 lines of the IMEM file 
 
         { nop: No Operation, PC: Program Counter }
@@ -124,7 +289,7 @@ class SingleStageState(object):
         "Instruction fetch: The control signals to read instruction memory and to write the PC are always asserted, so there is nothing special to control in this pipeline stage." Comp.Org P.331
         """
 
-        self.ID = {"nop": False, "Instr": 0}
+        self.ID = SingleStageIDRegister()
         """ Corresponding IF/ID Pipeline register
 
         { nop: No Operation, Instr: 32 bit binary Instruction stores in int}
@@ -132,9 +297,7 @@ class SingleStageState(object):
         "Instruction decode/register file read: The two source registers are always in the same location in the RISC-V instruction formats, so there is nothing special to control in this pipeline stage."  Comp.Org P.331
         """
 
-        self.EX = {"nop": False, "Read_data1": 0, "Read_data2": 0, "Imm": 0, "Rs": 0, "Rt": 0, "Wrt_reg_addr": 0,
-                   "is_I_type": False, "rd_mem": 0,
-                   "wrt_mem": 0, "alu_op": 0, "wrt_enable": 0}
+        self.EX = SingleStageEXRegister()
         """ Execute the instruction
 
         "Execution/address calculation: The signals to be set are ALUOp and ALUSrc (see Figures 4.49 and 4.50). The signals select the ALU operation and either Read data 2 or a sign-extended immediate as inputs to the ALU."  Comp.Org P.331
@@ -160,8 +323,7 @@ class SingleStageState(object):
 
         }"""
 
-        self.MEM = {"nop": False, "ALUresult": 0, "Store_data": 0, "Rs": 0, "Rt": 0, "Wrt_reg_addr": 0, "rd_mem": 0,
-                    "wrt_mem": 0, "wrt_enable": 0}
+        self.MEM = SingleStageMEMRegister()
         """ Make sure to access memory.py in this stage.
         LOAD and STORE instructions
 
@@ -186,7 +348,7 @@ class SingleStageState(object):
 
           wrt_enable: 1 bit Control unit output: RegWrite }"""
 
-        self.WB = {"nop": False, "Wrt_data": 0, "Rs": 0, "Rt": 0, "Wrt_reg_addr": 0, "wrt_enable": 0}
+        self.WB = SingleStageWBRegister()
         """ Update the values of registers in this stage.
          Eg. loading a value into a register, arithmetic result to be written into register
 
@@ -0,0 +1,156 @@
+"""
+The bookkeeping structures of the out-of-order OutOfOrderCore: reorder buffer entries, reservation
+station entries, fetch queue entries and the configuration of their sizes.
+"""
+
+
+class ReorderBufferEntry(object):
+    """
+    ReorderBufferEntry is one instruction in flight, from dispatch until it commits or is squashed.
+
+    The entry is also the rename tag of its result: the register alias table and the reservation
+    stations refer to the entry that will produce a register value.
+    """
+
+    __slots__ = ("seq", "pc", "instr", "decoded", "dest", "value", "done", "predicted_pc", "next_pc",
+                 "address", "store_data", "halt", "error", "squashed")
+
+    def __init__(self, seq, pc, instr, decoded, predicted_pc):
+        """
+        Initialize the ReorderBufferEntry.
+
+        Args:
+            seq (int): Dispatch sequence number, a smaller one is an older instruction.
+            pc (int): The address of the instruction.
+            instr (int): The 32-bit instruction.
+            decoded (DecodedInstruction): The decoded instruction, None when it could not be decoded.
+            predicted_pc (int): Where the fetch stage continued after this instruction.
+        """
+        self.seq = seq
+        self.pc = pc
+        self.instr = instr
+        self.decoded = decoded
+        self.dest = 0
+        """ Destination register, 0 when the instruction writes no register """
+        self.value = 0
+        """ The result, valid once `done` """
+        self.done = False
+        """ The result was broadcast on the common data bus, the entry may commit """
+        self.predicted_pc = predicted_pc
+        self.next_pc = None
+        """ The resolved address of the next instruction """
+        self.address = None
+        """ Load and store address, known once the address is computed """
+        self.store_data = 0
+        self.halt = False
+        self.error = None
+        """ The ValueError raised decoding the instruction, raised again if it commits """
+        self.squashed = False
+
+
+class ReservationStationEntry(object):
+    """
+    ReservationStationEntry holds a dispatched instruction until its operands are available and it issues.
+
+    Each operand is either a value or the ReorderBufferEntry producing it, the producer is
+    replaced by its value when the result is broadcast.
+    """
+
+    __slots__ = ("entry", "value1", "value2", "source1", "source2")
+
+    def __init__(self, entry, value1, value2, source1, source2):
+        """
+        Initialize the ReservationStationEntry.
+
+        Args:
+            entry (ReorderBufferEntry): The instruction.
+            value1 (int): The first operand, when `source1` is None.
+            value2 (int): The second operand, when `source2` is None.
+            source1 (ReorderBufferEntry): The producer of the first operand, None when it is available.
+            source2 (ReorderBufferEntry): The producer of the second operand, None when it is available.
+        """
+        self.entry = entry
+        self.value1 = value1
+        self.value2 = value2
+        self.source1 = source1
+        self.source2 = source2
+
+    def ready(self) -> bool:
+        return self.source1 is None and self.source2 is None
+
+    def wake_up(self, producer):
+        """
+        Capture a result broadcast on the common data bus.
+
+        Args:
+            producer (ReorderBufferEntry): The entry whose result is now available.
+        """
+        if self.source1 is producer:
+            self.value1 = producer.value
+            self.source1 = None
+        if self.source2 is producer:
+            self.value2 = producer.value
+            self.source2 = None
+
+
+class FetchQueueEntry(object):
+    """
+    FetchQueueEntry is a fetched instruction waiting for dispatch.
+    """
+
+    __slots__ = ("pc", "instr", "predicted_pc", "ready_cycle")
+
+    def __init__(self, pc, instr, predicted_pc, ready_cycle):
+        self.pc = pc
+        self.instr = instr
+        self.predicted_pc = predicted_pc
+        self.ready_cycle = ready_cycle
+        """ First cycle the instruction may be dispatched, later than the fetch on an instruction cache miss """
+
+
+class OutOfOrderConfig(object):
+    """
+    OutOfOrderConfig holds the sizes of an OutOfOrderCore, each core is built with them.
+    """
+
+    KEYS = {"rob": "rob_entries", "rs": "rs_entries", "width": "width"}
+    """ Command line key -> OutOfOrderCore argument """
+
+    def __init__(self, **parameters):
+        """
+        Initialize the OutOfOrderConfig.
+
+        Args:
+            **parameters (int): OutOfOrderCore sizes, the others keep their defaults.
+        """
+        for name, value in parameters.items():
+            if name not in self.KEYS.values():
+                raise ValueError(f"Unknown out-of-order core size: {name}")
+            if value < 1:
+                raise ValueError(f"The out-of-order core {name} must be positive: {value}")
+        self.parameters = parameters
+
+    @classmethod
+    def parse(cls, spec: str):
+        """
+        Build an OutOfOrderConfig from its command line form.
+
+        Comma separated `key=value` settings, any of `rob=16,rs=8,width=1`: reorder buffer entries,
+        reservation station entries, and the number of instructions fetched, dispatched, executed
+        on the ALUs and committed per cycle. An empty spec or `default` keeps every default.
+
+        Args:
+            spec (str): The specification.
+
+        Returns:
+            OutOfOrderConfig: The configuration.
+        """
+        parameters = {}
+        for setting in filter(None, spec.split(",")):
+            if setting == "default":
+                continue
+            key, _, value = setting.partition("=")
+            if key not in cls.KEYS:
+                raise ValueError(f"Unknown out-of-order core setting: {key}")
+            parameters[cls.KEYS[key]] = int(value)
+        return cls(**parameters)
@@ -0,0 +1,154 @@
+from pathlib import Path
+
+# Number of records (one record = the lines dumped for one cycle) buffered before they are written out
+DEFAULT_FLUSH_INTERVAL = 1024
+
+
+class TraceWriter(object):
+    """
+    TraceWriter writes the per-cycle trace files (RFResult.txt, StateResult_*.txt).
+
+    The file is opened once, on the first record, and kept open. The first record of a run
+    starts the file over. Records are buffered and written every `flush_interval` records,
+    on `flush` and on `close`.
+    """
+
+    def __init__(self, file_path: Path, flush_interval: int = DEFAULT_FLUSH_INTERVAL):
+        """
+        Initialize the TraceWriter.
+
+        Args:
+            file_path (Path): The trace file.
+            flush_interval (int): Number of records buffered before writing, 1 writes every record.
+        """
+        self.file_path = file_path
+        self.flush_interval = max(1, flush_interval)
+        self.file = None
+        self.buffer = []
+        self.started = False
+        """ Whether a record was written in this run, the first one truncates the file """
+
+    def write(self, lines):
+        """
+        Add one record to the trace.
+
+        Args:
+            lines (list[str]): The lines of the record, each ending with a newline.
+        """
+        if not self.started:
+            self.started = True
+            self.file = open(self.file_path, "w")
+        self.buffer.append("".join(lines))
+        if len(self.buffer) >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """
+        Write the buffered records to the file.
+        """
+        if not self.buffer:
+            return
+        if self.file is None:
+            self.file = open(self.file_path, "a")
+        self.file.write("".join(self.buffer))
+        self.file.flush()
+        self.buffer.clear()
+
+    def close(self):
+        """
+        Flush and close the file. Writing again afterwards reopens it in append mode.
+        """
+        self.flush()
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class TracePolicy(object):
+    """
+    TracePolicy decides which cycles are dumped to RFResult.txt and StateResult_*.txt.
+
+    Modes:
+        full: every cycle (the default, what the grading scripts expect).
+        none: no per-cycle dump, only the register file after the final cycle.
+        every: every `interval`-th cycle, starting at cycle 0.
+        cycles: the cycles inside `windows`, a list of inclusive (first, last) ranges.
+
+    The register file after the final cycle is dumped in every mode except full, where it already is.
+    """
+
+    MODES = ("full", "none", "every", "cycles")
+
+    def __init__(self, mode="full", interval=1, windows=()):
+        """
+        Initialize the TracePolicy.
+
+        Args:
+            mode (str): One of MODES.
+            interval (int): Sampling interval of the `every` mode.
+            windows (list[tuple[int, int]]): Inclusive cycle ranges of the `cycles` mode.
+        """
+        if mode not in self.MODES:
+            raise ValueError(f"Unsupported trace mode: {mode}")
+        if interval < 1:
+            raise ValueError(f"Trace interval must be positive: {interval}")
+        self.mode = mode
+        self.interval = interval
+        self.windows = list(windows)
+
+    @classmethod
+    def parse(cls, spec: str):
+        """
+        Build a TracePolicy from its command line form.
+
+        `full`, `none`, `every:N` or `cycles:A-B,C-D,...` (a single cycle is written `A`).
+
+        Args:
+            spec (str): The trace specification.
+
+        Returns:
+            TracePolicy: The policy.
+        """
+        mode, _, argument = spec.partition(":")
+        if mode == "every":
+            return cls(mode, interval=int(argument))
+        if mode == "cycles":
+            windows = []
+            for window in argument.split(","):
+                first, _, last = window.partition("-")
+                windows.append((int(first), int(last or first)))
+            return cls(mode, windows=windows)
+        if argument:
+            raise ValueError(f"Trace mode {mode} takes no argument")
+        return cls(mode)
+
+    def traces(self, cycle: int) -> bool:
+        """
+        Whether the pipeline state and register file are dumped after a cycle.
+
+        Args:
+            cycle (int): The cycle number.
+
+        Returns:
+            bool: True to dump the cycle.
+        """
+        if self.mode == "full":
+            return True
+        if self.mode == "every":
+            return cycle % self.interval == 0
+        if self.mode == "cycles":
+            return any(first <= cycle <= last for first, last in self.windows)
+        return False
+
+    def traces_register_file(self, cycle: int, halted: bool) -> bool:
+        """
+        Whether the register file is dumped after a cycle, the final cycle always is.
+
+        Args:
+            cycle (int): The cycle number.
+            halted (bool): Whether the core halted in this cycle.
+
+        Returns:
+            bool: True to dump the register file.
+        """
+        return halted or self.traces(cycle)
@@ -0,0 +1,167 @@
+from loguru import logger
+
+from src import diagnostics
+from src.memory import read_word
+
+MAX_BLOCK_LENGTH = 64
+""" Straight-line runs longer than this are split into several blocks """
+
+CONTROL_FLOW_OPCODES = (0b1100011, 0b1101111)
+""" BEQ/BNE and JAL end a basic block, so does HALT """
+
+ALU_EXPRESSIONS = {
+    0b0000: "({a} & {b})",
+    0b0001: "({a} | {b})",
+    0b0010: "({a} + {b})",
+    0b0110: "({a} - {b})",
+    0b0111: "({a} ^ {b})",
+    0b1100: "~({a} | {b})",
+}
+""" ALU control code -> Python expression, the same operations as arithmetic_logic_unit (undefined codes give 0) """
+
+
+def alu_expression(alu_control: int, a: str, b: str) -> str:
+    """
+    Python source of an ALU operation, masked to 32 bits.
+
+    Args:
+        alu_control (int): The 4-bit ALU control code.
+        a (str): Source of the first operand.
+        b (str): Source of the second operand.
+
+    Returns:
+        str: The expression.
+    """
+    expression = ALU_EXPRESSIONS.get(alu_control)
+    if expression is None:
+        return "0"
+    return f"{expression.format(a=a, b=b)} & 0xFFFFFFFF"
+
+
+class BasicBlock(object):
+    """
+    BasicBlock is a straight-line run of instructions translated into one Python function.
+
+    The block starts at `start` and ends with the first branch, JAL or HALT (or after
+    MAX_BLOCK_LENGTH instructions). `function(regs, read, write)` executes the whole block on
+    the register list and the data memory read/write methods, and returns `(next_pc, halted)`.
+    """
+
+    __slots__ = ("start", "end", "length", "source", "function")
+
+    def __init__(self, start, end, length, source, function):
+        self.start = start
+        self.end = end
+        """ Address after the last instruction of the block """
+        self.length = length
+        """ Number of instructions, the terminating branch / JAL / HALT included """
+        self.source = source
+        """ The instruction memory bytes the block was translated from """
+        self.function = function
+
+    def contains(self, pc) -> bool:
+        """
+        Whether an address lies inside the block, after its first instruction.
+
+        Args:
+            pc (int): The address, None is never contained.
+
+        Returns:
+            bool: True if the block would run past `pc`.
+        """
+        return pc is not None and self.start < pc < self.end
+
+
+class BlockCache(object):
+    """
+    BlockCache translates basic blocks on first execution and serves them by start address.
+
+    A cached block is retranslated when the instruction memory bytes it was built from change.
+    """
+
+    def __init__(self, instruction_memory, program):
+        """
+        Initialize the BlockCache.
+
+        Args:
+            instruction_memory (InstructionMemory): The instruction memory.
+            program (ProgramTable): Decodes the instruction words.
+        """
+        self.instruction_memory = instruction_memory
+        self.program = program
+        self.blocks = {}
+        """ Translated blocks: {start address: BasicBlock} """
+
+    def lookup(self, pc: int) -> BasicBlock:
+        """
+        Return the block starting at an address, translating it if it is missing or stale.
+
+        Args:
+            pc (int): The start address.
+
+        Returns:
+            BasicBlock: The block.
+        """
+        block = self.blocks.get(pc)
+        if block is None or self.instruction_memory.i_mem[block.start: block.end] != block.source:
+            block = self.blocks[pc] = self.translate(pc)
+        return block
+
+    def translate(self, start: int) -> BasicBlock:
+        """
+        Translate the basic block starting at an address.
+
+        Args:
+            start (int): The start address.
+
+        Returns:
+            BasicBlock: The block.
+        """
+        i_mem = self.instruction_memory.i_mem
+        lines = ["def block(r, read, write):"]
+        pc = start
+        length = 0
+        while True:
+            decoded = self.program.decode_word(read_word(i_mem, pc))
+            opcode = decoded.opcode
+            length += 1
+            next_pc = (pc + 4) & 0xFFFFFFFF
+
+            if opcode == 0b0110011:  # R-type
+                if decoded.rd:
+                    lines.append(f"    r[{decoded.rd}] = "
+                                 f"{alu_expression(decoded.alu_control, f'r[{decoded.rs1}]', f'r[{decoded.rs2}]')}")
+            elif opcode == 0b0010011:  # I-type
+                if decoded.rd:
+                    lines.append(f"    r[{decoded.rd}] = "
+                                 f"{alu_expression(decoded.alu_control, f'r[{decoded.rs1}]', f'({decoded.imm})')}")
+            elif opcode == 0b0000011:  # Load
+                target = f"r[{decoded.rd}] = " if decoded.rd else ""
+                lines.append(f"    {target}read((r[{decoded.rs1}] + ({decoded.imm})) & 0xFFFFFFFF)")
+            elif opcode == 0b0100011:  # Store
+                lines.append(f"    write((r[{decoded.rs1}] + ({decoded.imm})) & 0xFFFFFFFF, r[{decoded.rs2}])")
+            elif opcode == 0b1100011:  # Branch, BEQ / BNE
+                taken = (pc + decoded.imm) & 0xFFFFFFFF
+                zero = f"((r[{decoded.rs1}] - r[{decoded.rs2}]) & 0xFFFFFFFF) == 0"
+                lines.append(f"    return ({taken} if ({zero}) ^ {decoded.bne_func} else {next_pc}), False")
+            elif opcode == 0b1101111:  # JAL, the link value goes through the ALU as PC op 4
+                if decoded.rd:
+                    lines.append(f"    r[{decoded.rd}] = {alu_expression(decoded.alu_control, str(pc), '4')}")
+                lines.append(f"    return {(pc + decoded.imm) & 0xFFFFFFFF}, False")
+            elif decoded.halt:
+                lines.append(f"    return {pc}, True")
+
+            pc = next_pc
+            if opcode in CONTROL_FLOW_OPCODES or decoded.halt:
+                break
+            if length == MAX_BLOCK_LENGTH:
+                lines.append(f"    return {pc}, False")
+                break
+
+        source = "\n".join(lines)
+        if diagnostics.VERBOSE:
+            logger.debug(f"Translated block {start:#x}:\n{source}")
+        namespace = {}
+        exec(compile(source, f"<block {start:#x}>", "exec"), namespace)
+        end = start + 4 * length
+        return BasicBlock(start, end, length, bytes(i_mem[start: end]), namespace["block"])
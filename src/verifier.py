@@ -0,0 +1,249 @@
+"""
+Golden-trace verification: compare the RFResult.txt and StateResult_*.txt records of a running core
+with the expected files, cycle by cycle as they are written, and stop at the first divergence.
+"""
+from pathlib import Path
+
+from src.trace_writer import TraceWriter, DEFAULT_FLUSH_INTERVAL
+
+SEPARATOR = "-" * 70
+""" The line every trace record starts with """
+
+
+class TraceDivergence(ValueError):
+    """
+    TraceDivergence is raised at the first record of a trace that differs from the expected one.
+    """
+
+    def __init__(self, path: Path, cycle, stage: str, field: str, expected, actual):
+        """
+        Initialize the TraceDivergence.
+
+        Args:
+            path (Path): The expected trace file.
+            cycle (int): The cycle of the record, or of the last record if the run ended before the expected trace.
+            stage (str): `RF`, or the pipeline register of the field (`IF`, `EX`, ...), empty if it has none.
+            field (str): The register (`x5`) or the field (`Read_data1`), or what is missing.
+            expected (str): The expected value, None if the expected record has no such line.
+            actual (str): The value the core wrote, None if its record has no such line.
+        """
+        self.path = path
+        self.cycle = cycle
+        self.stage = stage
+        self.field = field
+        self.expected = expected
+        self.actual = actual
+        where = f"{stage}.{field}" if stage else field
+        super(TraceDivergence, self).__init__(
+            f"{path.name}: first divergence at cycle {cycle}, {where}: expected {expected}, got {actual}")
+
+    def __reduce__(self):
+        # raised in the worker processes of run_cores_in_parallel, rebuilt from the fields rather than the message
+        return TraceDivergence, (self.path, self.cycle, self.stage, self.field, self.expected, self.actual)
+
+
+def record_cycle(header: str) -> int:
+    """The cycle of a record, from its `State ... after executing cycle: N` line."""
+    return int(header.rsplit(":", 1)[1])
+
+
+def read_records(path: Path):
+    """
+    Stream the records of a trace file.
+
+    Args:
+        path (Path): The trace file.
+
+    Yields:
+        list[str]: The lines of each record without line ends, the separator line excluded.
+    """
+    record = None
+    with open(path) as trace:
+        for line in trace:
+            line = line.rstrip("\n")
+            if line == SEPARATOR:
+                if record is not None:
+                    yield record
+                record = []
+            elif record is not None:
+                record.append(line)
+    if record is not None:
+        yield record
+
+
+class ExpectedTrace(object):
+    """
+    ExpectedTrace walks through an expected trace file, one record per cycle the core dumps.
+
+    A core that dumps only some cycles (a trace policy other than full) is compared on those
+    cycles, the expected records of the cycles in between are skipped.
+    """
+
+    def __init__(self, path: Path, complete: bool = True):
+        """
+        Initialize the ExpectedTrace.
+
+        Args:
+            path (Path): The expected trace file.
+            complete (bool): The core dumps every cycle, so it must also dump the last expected one.
+        """
+        self.path = path
+        self.complete = complete
+        self.records = read_records(path)
+        self.pending = None
+        """ A record read ahead of the cycle being compared """
+        self.last_cycle = None
+        """ The cycle of the last record compared """
+
+    def next_record(self):
+        if self.pending is not None:
+            record, self.pending = self.pending, None
+            return record
+        return next(self.records, None)
+
+    def check(self, lines):
+        """
+        Compare the record of one cycle with the expected one.
+
+        Args:
+            lines (list[str]): The lines of the record, as given to TraceWriter.write.
+
+        Raises:
+            TraceDivergence: The record differs from the expected one, or the expected trace has no such cycle.
+        """
+        actual = "".join(lines).splitlines()[1:]
+        cycle = record_cycle(actual[0])
+        expected = self.next_record()
+        while expected is not None and record_cycle(expected[0]) < cycle:
+            expected = self.next_record()
+        if expected is None:
+            raise TraceDivergence(self.path, cycle, "", "record", "the end of the trace", "a record")
+        expected_cycle = record_cycle(expected[0])
+        if expected_cycle != cycle:
+            self.pending = expected
+            raise TraceDivergence(self.path, cycle, "", "cycle", f"cycle {expected_cycle}", f"cycle {cycle}")
+        self.last_cycle = cycle
+        if actual == expected:
+            return
+
+        register_file = actual[0].startswith("State of RF")
+        for index in range(1, max(len(actual), len(expected))):
+            actual_line = actual[index] if index < len(actual) else None
+            expected_line = expected[index] if index < len(expected) else None
+            if actual_line == expected_line:
+                continue
+            if register_file:
+                stage, field = "RF", f"x{index - 1}"
+                expected_value, actual_value = expected_line, actual_line
+            else:
+                name = (actual_line if actual_line is not None else expected_line).partition(":")[0]
+                stage, _, field = name.rpartition(".")
+                expected_value = expected_line.partition(":")[2].strip() if expected_line is not None else None
+                actual_value = actual_line.partition(":")[2].strip() if actual_line is not None else None
+                if expected_line is not None and actual_line is not None and \
+                        expected_line.partition(":")[0] != name:
+                    field, expected_value, actual_value = "line", expected_line, actual_line
+            raise TraceDivergence(self.path, cycle, stage, field, expected_value, actual_value)
+
+    def finish(self):
+        """
+        Check that the expected trace has no cycle after the last one a core dumping every cycle dumped.
+
+        Raises:
+            TraceDivergence: The expected trace goes on after the run ended.
+        """
+        expected = self.next_record()
+        if self.complete and expected is not None:
+            raise TraceDivergence(self.path, self.last_cycle, "", "record", f"cycle {record_cycle(expected[0])}",
+                                  "the end of the run")
+
+
+class VerifyingTraceWriter(TraceWriter):
+    """
+    VerifyingTraceWriter writes a trace file like TraceWriter, comparing each record with an
+    expected trace before it is buffered, so a run stops in the cycle it diverges.
+    """
+
+    def __init__(self, file_path: Path, expected: ExpectedTrace, flush_interval: int = DEFAULT_FLUSH_INTERVAL):
+        """
+        Initialize the VerifyingTraceWriter.
+
+        Args:
+            file_path (Path): The trace file.
+            expected (ExpectedTrace): The expected trace.
+            flush_interval (int): Number of records buffered before writing, 1 writes every record.
+        """
+        super(VerifyingTraceWriter, self).__init__(file_path, flush_interval)
+        self.expected = expected
+
+    def write(self, lines):
+        self.expected.check(lines)
+        super(VerifyingTraceWriter, self).write(lines)
+
+
+def verifying_writer(trace: TraceWriter, expected: ExpectedTrace) -> VerifyingTraceWriter:
+    """
+    Replace a trace writer with a VerifyingTraceWriter of the same file.
+
+    A trace restored from a checkpoint is continued rather than started over, and the records it
+    kept from before the checkpoint are compared first, so the whole trace is verified.
+
+    Args:
+        trace (TraceWriter): The writer of the core, nothing written yet in this run unless restored.
+        expected (ExpectedTrace): The expected trace.
+
+    Returns:
+        VerifyingTraceWriter: The writer to give the core.
+
+    Raises:
+        TraceDivergence: A record kept from before the checkpoint differs from the expected one.
+    """
+    writer = VerifyingTraceWriter(trace.file_path, expected, trace.flush_interval)
+    writer.started = trace.started
+    if trace.started:
+        for record in read_records(trace.file_path):
+            expected.check([SEPARATOR + "\n"] + [line + "\n" for line in record])
+    return writer
+
+
+def expected_traces(expected_dir: Path, prefix: str, filenames=None) -> tuple:
+    """
+    The expected traces of a core in a directory of expected results.
+
+    Args:
+        expected_dir (Path): The directory, holding {prefix}_RFResult.txt and StateResult_{prefix}.txt.
+        prefix (str): The prefix of the core's result files, SS or FS.
+        filenames (list[str]): Only verify these files, None verifies both.
+
+    Returns:
+        tuple[Path | None, Path | None]: The expected RFResult and StateResult files, None for those
+            that do not exist or are not verified.
+    """
+    paths = (expected_dir / f"{prefix}_RFResult.txt", expected_dir / f"StateResult_{prefix}.txt")
+    return tuple(path if path.exists() and (filenames is None or path.name in filenames) else None
+                 for path in paths)
+
+
+def attach_verifier(core, expected_register_file: Path = None, expected_state: Path = None) -> list:
+    """
+    Compare the traces of a core with expected ones while it runs. Must be called before the first step,
+    after the core is restored from a checkpoint.
+
+    Args:
+        core (Core): The core.
+        expected_register_file (Path): The expected RFResult.txt, None does not verify it.
+        expected_state (Path): The expected StateResult_*.txt, None does not verify it.
+
+    Returns:
+        list[ExpectedTrace]: The expected traces, whose `finish` checks them once the core halted.
+    """
+    complete = core.trace_policy.mode == "full"
+    traces = []
+    if expected_register_file is not None:
+        register_file = core.register_file
+        traces.append(ExpectedTrace(expected_register_file, complete))
+        register_file.trace = verifying_writer(register_file.trace, traces[-1])
+    if expected_state is not None:
+        traces.append(ExpectedTrace(expected_state, complete))
+        core.state_trace = verifying_writer(core.state_trace, traces[-1])
+    return traces
@@ -0,0 +1,248 @@
+from pathlib import Path
+
+from src.memory import BYTE_LINES, WORD
+
+HALT = 0xFFFFFFFF
+
+R_TYPE = {"add": (0b000, 0b0000000), "sub": (0b000, 0b0100000), "xor": (0b100, 0b0000000),
+          "or": (0b110, 0b0000000), "and": (0b111, 0b0000000)}
+""" R-type mnemonic -> (funct3, funct7) """
+
+I_TYPE = {"addi": 0b000, "xori": 0b100, "ori": 0b110, "andi": 0b111}
+""" I-type mnemonic -> funct3 """
+
+
+def encode(op: str, *operands) -> int:
+    """
+    Encode one instruction of the subset the cores implement.
+
+    Operands are given in assembly order: `add rd, rs1, rs2`, `addi rd, rs1, imm`,
+    `lw rd, imm(rs1)` as ("lw", rd, rs1, imm), `sw rs2, imm(rs1)` as ("sw", rs2, rs1, imm),
+    `beq rs1, rs2, offset`, `jal rd, offset`, and `halt`.
+
+    Args:
+        op (str): The mnemonic.
+        *operands (int): Register numbers and immediates.
+
+    Returns:
+        int: The 32-bit instruction.
+    """
+    if op in R_TYPE:
+        rd, rs1, rs2 = operands
+        func3, func7 = R_TYPE[op]
+        return func7 << 25 | rs2 << 20 | rs1 << 15 | func3 << 12 | rd << 7 | 0b0110011
+    if op in I_TYPE:
+        rd, rs1, imm = operands
+        return (imm & 0xFFF) << 20 | rs1 << 15 | I_TYPE[op] << 12 | rd << 7 | 0b0010011
+    if op == "lw":
+        rd, rs1, imm = operands
+        return (imm & 0xFFF) << 20 | rs1 << 15 | 0b010 << 12 | rd << 7 | 0b0000011
+    if op == "sw":
+        rs2, rs1, imm = operands
+        imm &= 0xFFF
+        return (imm >> 5) << 25 | rs2 << 20 | rs1 << 15 | 0b010 << 12 | (imm & 0x1F) << 7 | 0b0100011
+    if op in ("beq", "bne"):
+        rs1, rs2, offset = operands
+        offset &= 0x1FFF
+        func3 = 0b000 if op == "beq" else 0b001
+        return ((offset >> 12) & 1) << 31 | ((offset >> 5) & 0x3F) << 25 | rs2 << 20 | rs1 << 15 | func3 << 12 \
+            | ((offset >> 1) & 0xF) << 8 | ((offset >> 11) & 1) << 7 | 0b1100011
+    if op == "jal":
+        rd, offset = operands
+        offset &= 0x1FFFFF
+        return ((offset >> 20) & 1) << 31 | ((offset >> 1) & 0x3FF) << 21 | ((offset >> 11) & 1) << 20 \
+            | ((offset >> 12) & 0xFF) << 12 | rd << 7 | 0b1101111
+    if op == "halt":
+        return HALT
+    raise ValueError(f"Unsupported instruction: {op}")
+
+
+def assemble(program) -> list:
+    """
+    Encode a program, resolving branch and jump labels.
+
+    Args:
+        program (list): Instructions as tuples `(op, *operands)` and labels as plain strings.
+            The last operand of a branch or JAL may be a label, it becomes the PC-relative offset.
+
+    Returns:
+        list[int]: The instruction words.
+    """
+    labels = {}
+    instructions = []
+    for item in program:
+        if isinstance(item, str):
+            labels[item] = 4 * len(instructions)
+        else:
+            instructions.append(item)
+
+    words = []
+    for index, (op, *operands) in enumerate(instructions):
+        if operands and isinstance(operands[-1], str):
+            operands[-1] = labels[operands[-1]] - 4 * index
+        words.append(encode(op, *operands))
+    return words
+
+
+def write_memory_file(file_path: Path, words):
+    """
+    Write words to a memory file, one 8-bit binary byte per line, most significant byte first.
+
+    Args:
+        file_path (Path): The memory file.
+        words (list[int]): The 32-bit words.
+    """
+    with open(file_path, "w") as mf:
+        for word in words:
+            mf.write("".join(map(BYTE_LINES.__getitem__, WORD.pack(word & 0xFFFFFFFF))))
+
+
+class Workload(object):
+    """
+    Workload is a generated program with its initial data memory.
+    """
+
+    def __init__(self, name, parameters, program, data):
+        """
+        Initialize the Workload.
+
+        Args:
+            name (str): The workload kind.
+            parameters (dict): The generator parameters.
+            program (list): The program, as taken by `assemble`.
+            data (list[int]): The initial data memory words, from address 0.
+        """
+        self.name = name
+        self.parameters = parameters
+        self.program = program
+        self.data = data
+
+    def write(self, io_dir: Path):
+        """
+        Write imem.txt and dmem.txt.
+
+        Args:
+            io_dir (Path): The directory, created if needed.
+        """
+        io_dir.mkdir(parents=True, exist_ok=True)
+        write_memory_file(io_dir / "imem.txt", assemble(self.program))
+        write_memory_file(io_dir / "dmem.txt", self.data)
+
+
+def alu_loop(iterations=1000, unroll=4):
+    """
+    A tight loop of dependent R-type operations.
+
+    Args:
+        iterations (int): Loop trip count.
+        unroll (int): Copies of the 5-instruction ALU body per iteration.
+    """
+    body = []
+    for _ in range(unroll):
+        body += [("add", 4, 4, 2), ("xor", 5, 4, 1), ("or", 6, 5, 2), ("and", 7, 6, 4), ("sub", 8, 7, 5)]
+    program = [("lw", 1, 0, 0),  # x1 = iterations
+               ("addi", 2, 0, 0),
+               "loop",
+               *body,
+               ("addi", 2, 2, 1),
+               ("add", 9, 9, 8),
+               ("bne", 2, 1, "loop"),
+               ("sw", 4, 0, 4),
+               ("sw", 9, 0, 8),
+               ("halt",)]
+    return Workload("alu_loop", {"iterations": iterations, "unroll": unroll}, program, [iterations, 0, 0])
+
+
+def load_store_stream(length=64, passes=16):
+    """
+    Read-modify-write passes over an array.
+
+    Args:
+        length (int): Number of array words.
+        passes (int): Number of passes over the array.
+    """
+    base = 16
+    program = [("lw", 1, 0, 0),  # x1 = length
+               ("lw", 5, 0, 4),  # x5 = passes
+               ("addi", 6, 0, 0),
+               "pass",
+               ("addi", 2, 0, base),
+               ("addi", 3, 0, 0),
+               "element",
+               ("lw", 4, 2, 0),
+               ("addi", 3, 3, 1),
+               ("addi", 4, 4, 3),
+               ("sw", 4, 2, 0),
+               ("addi", 2, 2, 4),
+               ("bne", 3, 1, "element"),
+               ("addi", 6, 6, 1),
+               ("bne", 6, 5, "pass"),
+               ("halt",)]
+    data = [length, passes, 0, 0] + list(range(length))
+    return Workload("load_store_stream", {"length": length, "passes": passes}, program, data)
+
+
+def branch_heavy(iterations=1000):
+    """
+    A loop dominated by data-dependent branches: one alternating every iteration, one every
+    other iteration, plus the loop branch and a JAL.
+
+    Args:
+        iterations (int): Loop trip count.
+    """
+    program = [("lw", 1, 0, 0),  # x1 = iterations
+               ("addi", 2, 0, 0),
+               "loop",
+               ("andi", 3, 2, 1),
+               ("andi", 6, 2, 2),
+               ("beq", 3, 0, "even"),
+               ("addi", 4, 4, 1),
+               ("jal", 0, "join"),
+               "even",
+               ("addi", 5, 5, 1),
+               "join",
+               ("bne", 6, 0, "skip"),
+               ("addi", 7, 7, 1),
+               "skip",
+               ("addi", 2, 2, 1),
+               ("add", 8, 8, 2),
+               ("bne", 2, 1, "loop"),
+               ("sw", 4, 0, 4),
+               ("sw", 5, 0, 8),
+               ("sw", 7, 0, 12),
+               ("halt",)]
+    return Workload("branch_heavy", {"iterations": iterations}, program, [iterations, 0, 0, 0])
+
+
+def load_use_chain(length=32, steps=1000, stride=5):
+    """
+    Pointer chasing through a circular linked list, every load feeds the next instruction.
+
+    Args:
+        length (int): Number of list nodes.
+        steps (int): Number of nodes visited.
+        stride (int): Distance, in nodes, between a node and the next one.
+    """
+    base = 16
+    program = [("lw", 1, 0, 0),  # x1 = steps
+               ("addi", 2, 0, base),
+               ("addi", 3, 0, 0),
+               "loop",
+               ("lw", 2, 2, 0),  # p = *p
+               ("add", 4, 4, 2),  # load-use
+               ("addi", 3, 3, 1),
+               ("bne", 3, 1, "loop"),
+               ("sw", 4, 0, 4),
+               ("halt",)]
+    nodes = [base + 4 * ((index + stride) % length) for index in range(length)]
+    data = [steps, 0, 0, 0] + nodes
+    return Workload("load_use_chain", {"length": length, "steps": steps, "stride": stride}, program, data)
+
+
+WORKLOADS = {
+    "alu_loop": alu_loop,
+    "load_store_stream": load_store_stream,
+    "branch_heavy": branch_heavy,
+    "load_use_chain": load_use_chain,
+}
+""" Workload generators by name, each takes its parameters as keyword arguments """
@@ -1,93 +1,221 @@
+import argparse
 import difflib
 import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 from typing import Literal
 
 from loguru import logger
 
-project_root = Path()
-
+from src import diagnostics
+from src.simulation import run_pipeline
+from src.verifier import TraceDivergence, expected_traces
 
-def compare_files(testcases, filenames, stage_text: Literal["FS", "SS"]):
-    for testcase in testcases:
-        # Rename: Move SS_/RFResult.txt to testcase0 and rename SS_RFResult.txt
-        old_path = project_root / f'Sample_Testcases_FS' / 'input' / testcase / f'{stage_text}_' / 'RFResult.txt'
-        new_path = project_root / f'Sample_Testcases_FS' / 'input' / testcase / f'{stage_text}_RFResult.txt'
-
-        if old_path.exists():
-            new_path.parent.mkdir(parents=True, exist_ok=True)
-            old_path.rename(new_path)
-
-        # Run tests
-        # batch run result would be stored in input folder (as it is seen as io_dir)
-        # and the expected result is stored in output folder
-        input_path = project_root / f'Sample_Testcases_FS' / 'input' / testcase
-        output_path = project_root / f'Sample_Testcases_FS' / 'output' / testcase
-
-        for filename in filenames:
-            input_file = input_path / filename
-            output_file = output_path / filename
-
-            # Compare files
-            if input_file.exists() and output_file.exists():
-                input_content = input_file.read_text().splitlines()
-                output_content = output_file.read_text().splitlines()
-
-                if input_content == output_content:
-                    logger.info(f"{testcase}/{filename}: file is identical")
-                else:
-                    logger.warning(f"{testcase}/{filename}: difference detected")
-                    print_diff_with_context(input_content, output_content, testcase, filename)
+project_root = Path()
+testcases_root = project_root / 'Sample_Testcases_FS'
+
+# The results compared for each core, named as in the expected output folder
+STAGE_FILENAMES = {
+    "FS": ['FS_DMEMResult.txt',
+           'FS_RFResult.txt',
+           # 'StateResult_FS.txt'
+           ],
+    "SS": ['SS_DMEMResult.txt',
+           'SS_RFResult.txt',
+           'StateResult_SS.txt'],
+}
+
+
+def discover_testcases():
+    """Every directory under Sample_Testcases_FS/input holding an imem.txt, in name order."""
+    input_root = testcases_root / 'input'
+    return sorted(path.name for path in input_root.iterdir() if (path / 'imem.txt').exists())
+
+
+def result_path(input_path: Path, filename: str, stage_text: Literal["FS", "SS"]) -> Path:
+    """Where the simulator wrote a result: {stage}_RFResult.txt lives in the {stage}_ folder."""
+    if filename == f'{stage_text}_RFResult.txt':
+        return input_path / f'{stage_text}_' / 'RFResult.txt'
+    return input_path / filename
+
+
+def compare_files(testcase, filenames, stage_text: Literal["FS", "SS"]):
+    """
+    Compare the results of one testcase with the expected outputs.
+
+    The batch run results are stored in the input folder (as it is seen as io_dir),
+    the expected results are stored in the output folder.
+
+    Returns a list of (filename, status, diff) with status one of
+    identical, different, no expected output, no result.
+    """
+    input_path = testcases_root / 'input' / testcase
+    output_path = testcases_root / 'output' / testcase
+
+    results = []
+    for filename in filenames:
+        input_file = result_path(input_path, filename, stage_text)
+        output_file = output_path / filename
+
+        if not input_file.exists():
+            results.append((filename, "no result", ""))
+        elif not output_file.exists():
+            results.append((filename, "no expected output", ""))
+        else:
+            input_content = input_file.read_text().splitlines()
+            output_content = output_file.read_text().splitlines()
+            if input_content == output_content:
+                results.append((filename, "identical", ""))
             else:
-                logger.error(f"{testcase}/{filename}: file not found")
+                results.append((filename, "different",
+                                diff_with_context(input_content, output_content, testcase, filename)))
+    return results
 
 
-def print_diff_with_context(input_content, output_content, testcase, filename):
-    """Print the differences with context (10 lines before and 5 lines after)."""
+def diff_with_context(input_content, output_content, testcase, filename):
+    """The differences with context (15 lines around each change)."""
     diff = difflib.unified_diff(
         output_content, input_content,
         fromfile=f"{testcase}/expected/{filename}",
         tofile=f"{testcase}/actual/{filename}",
         lineterm='',
-        n=15  # Shows context of 15 lines (10 before + 5 after)
+        n=15
     )
-
-    logger.info(f"\nDiff for {testcase}/{filename}:\n" + "\n".join(diff))
-
-
-def batch_run():
-    # os.system("python3 main.py --iodir './Sample_Testcases_SS/input/testcase0'")
-    # os.system("python3 main.py --iodir './Sample_Testcases_SS/input/testcase1'")
-    # os.system("python3 main.py --iodir './Sample_Testcases_SS/input/testcase2'")
-    os.system("python3 main.py --iodir './Sample_Testcases_FS/input/testcase0'")
-    os.system("python3 main.py --iodir './Sample_Testcases_FS/input/testcase1'")
-    os.system("python3 main.py --iodir './Sample_Testcases_FS/input/testcase2'")
-    # os.system("python3 main.py --iodir './Sample_Testcases_FS/input/testcase3'")
+    return "\n".join(diff)
+
+
+def init_worker():
+    # per-cycle logging would dominate the run time and interleave between workers
+    diagnostics.set_verbose(False)
+
+
+def run_testcase(testcase, verify=False):
+    """
+    Simulate one testcase in this process and compare its results.
+
+    With `verify`, the traces (RFResult.txt, StateResult_*.txt) are compared with the expected ones
+    cycle by cycle during the run, which stops at the first divergence, reported with status diverged.
+
+    Returns (testcase, wall time in seconds, comparison results, error traceback or None).
+    """
+    output_path = testcases_root / 'output' / testcase
+    expected = None
+    if verify:
+        expected = {stage_text: expected_traces(output_path, stage_text, filenames)
+                    for stage_text, filenames in STAGE_FILENAMES.items()}
+    start = time.perf_counter()
+    try:
+        run_pipeline(testcases_root / 'input' / testcase, expected=expected)
+    except TraceDivergence as divergence:
+        return testcase, time.perf_counter() - start, [(divergence.path.name, "diverged", str(divergence))], None
+    except Exception:
+        return testcase, time.perf_counter() - start, [], traceback.format_exc()
+    elapsed = time.perf_counter() - start
+
+    results = []
+    for stage_text, filenames in STAGE_FILENAMES.items():
+        if expected is not None:
+            # the traces were verified during the run
+            verified = [path.name for path in expected[stage_text] if path is not None]
+            results.extend((filename, "identical", "") for filename in verified)
+            filenames = [filename for filename in filenames if filename not in verified]
+        results.extend(compare_files(testcase, filenames, stage_text))
+    return testcase, elapsed, results, None
+
+
+def batch_run(testcases, jobs, verify=False):
+    """
+    Simulate the testcases on a pool of `jobs` worker processes, each testcase runs in-process
+    in a worker (no interpreter start per testcase). jobs=1 runs them here, one after the other.
+    """
+    reports = []
+    if jobs == 1:
+        init_worker()
+        for testcase in testcases:
+            reports.append(run_testcase(testcase, verify))
+            report_testcase(*reports[-1])
+        return reports
+
+    with ProcessPoolExecutor(max_workers=jobs, initializer=init_worker) as pool:
+        futures = [pool.submit(run_testcase, testcase, verify) for testcase in testcases]
+        for future in as_completed(futures):
+            reports.append(future.result())
+            report_testcase(*reports[-1])
+    return reports
+
+
+def compared(results):
+    """Whether any result file was compared with an expected one."""
+    return any(status in ("identical", "different", "diverged") for _, status, _ in results)
+
+
+def passed(results, error):
+    """At least one file was compared, and none differed or is missing from the results."""
+    return error is None and compared(results) and \
+        all(status in ("identical", "no expected output") for _, status, _ in results)
+
+
+def outcome(results, error) -> str:
+    """PASS, FAIL, or UNTESTED for a testcase that ran but had no expected output to compare with."""
+    if passed(results, error):
+        return "PASS"
+    if error is None and not compared(results) and \
+            all(status == "no expected output" for _, status, _ in results):
+        return "UNTESTED"
+    return "FAIL"
+
+
+def report_testcase(testcase, elapsed, results, error):
+    if error is not None:
+        logger.error(f"{testcase}: simulation failed\n{error}")
+        return
+    for filename, status, diff in results:
+        if status == "identical":
+            logger.info(f"{testcase}/{filename}: file is identical")
+        elif status == "different":
+            logger.warning(f"{testcase}/{filename}: difference detected")
+            logger.info(f"\nDiff for {testcase}/{filename}:\n{diff}")
+        elif status == "diverged":
+            logger.error(f"{testcase}: {diff}")
+        elif status == "no expected output":
+            logger.warning(f"{testcase}/{filename}: {status}")
+        else:
+            logger.error(f"{testcase}/{filename}: {status}")
+
+
+def print_summary(reports):
+    print(f"\n{'testcase':<24} {'result':<8} {'time (s)':>9}  files")
+    for testcase, elapsed, results, error in sorted(reports):
+        counts = {}
+        for _, status, _ in results:
+            counts[status] = counts.get(status, 0) + 1
+        files = "simulation failed" if error is not None else ", ".join(
+            f"{count} {status}" for status, count in sorted(counts.items()))
+        print(f"{testcase:<24} {outcome(results, error):<8} {elapsed:>9.3f}  {files}")
+    failures = sum(not passed(results, error) for _, _, results, error in reports)
+    untested = sum(outcome(results, error) == "UNTESTED" for _, _, results, error in reports)
+    total_time = sum(elapsed for _, elapsed, _, _ in reports)
+    print(f"\n{len(reports) - failures}/{len(reports)} testcases passed"
+          + (f" ({untested} without any expected output)" if untested else "")
+          + f", {total_time:.3f}s of simulation")
+    return failures
 
 
 if __name__ == '__main__':
-    batch_run()
-
-    stage_text = "FS"
-    testcase_dirs = ['testcase0',
-                     'testcase1',
-                     'testcase2'
-                     ]  # Add more test cases as needed
-    filenames = [
-        f'{stage_text}_DMEMResult.txt',
-        f'{stage_text}_RFResult.txt',
-        # f'StateResult_{stage_text}.txt'
-    ]  # Add more filenames if necessary
-    compare_files(testcase_dirs, filenames, stage_text)
-
-    stage_text = "SS"
-    testcase_dirs = ['testcase0',
-                     'testcase1',
-                     'testcase2'
-                     ]  # Add more test cases as needed
-    filenames = [
-        f'{stage_text}_DMEMResult.txt',
-        f'{stage_text}_RFResult.txt',
-        f'StateResult_{stage_text}.txt'
-    ]  # Add more filenames if necessary
-    compare_files(testcase_dirs, filenames, stage_text)
+    parser = argparse.ArgumentParser(description='Run the Sample_Testcases_FS regression set')
+    parser.add_argument('testcases', nargs='*',
+                        help='Testcase folder names under Sample_Testcases_FS/input (default: all of them).')
+    parser.add_argument('--jobs', default=os.cpu_count(), type=int,
+                        help='Number of worker processes (default: one per CPU), 1 runs in this process.')
+    parser.add_argument('--verify', action='store_true',
+                        help='Compare the traces with the expected ones while simulating and stop each testcase '
+                             'at its first divergence, reporting the cycle, stage and field.')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    reports = batch_run(args.testcases or discover_testcases(), max(1, args.jobs), args.verify)
+    failures = print_summary(reports)
+    print(f"Wall time: {time.perf_counter() - start:.3f}s")
+    raise SystemExit(1 if failures else 0)